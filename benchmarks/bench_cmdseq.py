@@ -0,0 +1,99 @@
+"""
+Benchmark of the CmdSeq.wc transformation on generated files with thousands of configs and commands.
+
+Usage: python benchmarks/bench_cmdseq.py [--configs N] [--commands N]
+"""
+
+import argparse
+import gc
+import io
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from srctools import cmdseq
+
+from cmdseqedit import InsertAfterRule, transformCmdSeq
+from fakesteam import makeCmdSeq
+
+
+POSTCOMPILER_EXE = "C:/Steam/steamapps/common/Portal 2/bin/postcompiler/postcompiler.exe"
+POSTCOMPILER_ARGS = "--propcombine $path\\$file"
+VERBOSE = False
+
+
+def vLog(message: str):
+	"""Like the installer's `vLog()` without `--verbose`: the message is built, but not written."""
+
+	if VERBOSE:
+		print(message)
+
+
+def oldTransform(data: dict) -> int:
+	"""The algorithm used before, for comparison, with its logging. Modifies `data` in place."""
+
+	cmdsAdded = 0
+	for config in data:
+		foundBsp = False
+		commands = data[config]
+
+		vLog(f"\n\tConfig: '{config}'")
+
+		for index, cmd in enumerate(commands):
+			exeValue = str(cmd.exe).lower()
+			argValue = str(cmd.args).lower()
+
+			vLog(f"\t\tL Command:\n\t\t\tExe:      '{exeValue}'\n\t\t\tArgument: '{argValue}'")
+
+			if foundBsp:
+				if "postcompiler" not in exeValue:
+					commands.insert(index, cmdseq.Command(POSTCOMPILER_EXE, POSTCOMPILER_ARGS))
+					cmdsAdded += 1
+				elif POSTCOMPILER_ARGS != argValue:
+					commands.pop(index)
+					commands.insert(index, cmdseq.Command(POSTCOMPILER_EXE, POSTCOMPILER_ARGS))
+					cmdsAdded += 1
+				break
+			if exeValue == "$bsp_exe":
+				foundBsp = True
+				continue
+	return cmdsAdded
+
+
+def newTransform(data: dict) -> int:
+	rules = [
+		InsertAfterRule("$bsp_exe", cmdseq.Command(POSTCOMPILER_EXE, POSTCOMPILER_ARGS), "postcompiler"),
+	]
+	changed = 0
+	for result in transformCmdSeq(data, rules):
+		vLog(f"\n\tConfig: '{result.name}': {', '.join(result.results)}")
+		changed += result.changed
+	return changed
+
+
+def main():
+	argparser = argparse.ArgumentParser()
+	argparser.add_argument("--configs", type=int, default=2000)
+	argparser.add_argument("--commands", type=int, default=50)
+	argparser.add_argument("--repeat", type=int, default=3)
+	args = argparser.parse_args()
+
+	raw = makeCmdSeq(args.configs, args.commands, POSTCOMPILER_EXE)
+	print(f"CmdSeq.wc: {args.configs} configs x {args.commands + 1}+ commands, {len(raw) / 1024:.0f} KiB")
+
+	for name, transform in (("old", oldTransform), ("new", newTransform)):
+		best = float("inf")
+		for _ in range(args.repeat):
+			data = cmdseq.parse(io.BytesIO(raw))
+			# The objects made by the parser would be scanned by the first collections during the transform otherwise
+			gc.collect()
+			start = perf_counter()
+			changed = transform(data)
+			best = min(best, perf_counter() - start)
+		print(f"{name}: {changed} configs changed, best of {args.repeat}: {best * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,291 @@
+"""
+End to end benchmark of the installer. It runs `main()` against a fake Steam installation and a local stand-in
+for GitHub, and reports the wall time and peak memory of every phase, and the bytes transferred.
+
+Every run happens in its own process, so imports and memory usage are measured from scratch. The results are
+stored as JSON in `benchmarks/results/`, and can be compared with an older result file with `--compare`.
+
+Usage: python benchmarks/bench_install.py [--games N] [--latency MS] [--bandwidth KIB/S] [--compare FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+from statistics import median
+from time import perf_counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "../src"))
+
+import shims
+from fakegithub import FakeGitHub, makeAddonsZip
+from fakesteam import makeSteamTree
+
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+VDF_PATH = os.path.join(BENCH_DIR, "../resources/srctools.vdf")
+
+# Only the cold scenario starts with an empty cache. The warm one reuses the cache of the previous run.
+SCENARIOS = ("cold", "warm")
+
+
+def runChild(config: dict):
+	"""Run the installer in this process with the shims installed, and write the phase timings to a JSON file."""
+
+	shims.installWinreg(config["steamPath"])
+	shims.installProcessQuery(config["processes"])
+
+	if config["tracemalloc"]:
+		tracemalloc.start()
+
+	start = perf_counter()
+	import HAInstaller
+	from output import JsonRenderer
+
+	importTime = perf_counter() - start
+
+	phases: list[dict] = []
+	errors: list[str] = []
+
+	class PhaseRecorder(JsonRenderer):
+		"""JSON renderer which records when every phase starts, and the memory used until then."""
+
+		@property
+		def phase(self) -> str:
+			return self._phase
+
+		@phase.setter
+		def phase(self, value: str):
+			now = perf_counter()
+			if phases:
+				last = phases[-1]
+				last["seconds"] = now - last.pop("_start")
+				last["maxRssKiB"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+				if config["tracemalloc"]:
+					last["pyPeakKiB"] = tracemalloc.get_traced_memory()[1] // 1024
+					tracemalloc.reset_peak()
+			if value is not None:
+				phases.append({"name": value, "_start": now})
+			self._phase = value
+
+		def event(self, event: str, **values):
+			if values.get("level") == "error":
+				errors.append(values["message"])
+			super().event(event, **values)
+
+	renderer = PhaseRecorder(open(os.devnull, "w"))
+	HAInstaller.getRenderer = lambda mode, progressBar: renderer
+	HAInstaller.RELEASES_URL = config["releasesUrl"]
+	HAInstaller.VDF_URL = config["vdfUrl"]
+
+	sys.argv = ["HAInstaller.py", *config["argv"]]
+	exitCode = 0
+	start = perf_counter()
+	try:
+		HAInstaller.main()
+	except SystemExit as error:
+		exitCode = error.code or 0
+	total = perf_counter() - start
+	renderer.phase = None
+
+	with open(config["resultPath"], "w") as file:
+		json.dump(
+			{
+				"exitCode": exitCode,
+				"errors": errors,
+				"importSeconds": importTime,
+				"totalSeconds": total,
+				"maxRssKiB": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+				"phases": phases,
+			},
+			file,
+		)
+
+
+def runOnce(args, server: FakeGitHub, root: str, games: dict, cacheDir: str, scenario: str) -> dict:
+	"""Build a new Steam tree, and run the installer on it in a new process."""
+
+	shutil.rmtree(os.path.join(root, "steam"), ignore_errors=True)
+	for number in range(1, args.libraries):
+		shutil.rmtree(os.path.join(root, f"library{number}"), ignore_errors=True)
+	steamPath, _ = makeSteamTree(root, games, args.libraries, args.otherGames)
+
+	if scenario == "cold":
+		shutil.rmtree(cacheDir, ignore_errors=True)
+
+	argv = ["--output", "json", "--noPbar", "--cacheDir", cacheDir, "--jobs", str(args.jobs)]
+	argv += ["-g", *games] if len(games) == 1 else ["--games", ",".join(games)]
+	argv += args.extra
+
+	resultPath = os.path.join(root, "result.json")
+	config = {
+		"steamPath": steamPath,
+		"processes": [],
+		"tracemalloc": args.tracemalloc,
+		"releasesUrl": server.releasesUrl,
+		"vdfUrl": f"{server.url}/srctools.vdf",
+		"argv": argv,
+		"resultPath": resultPath,
+	}
+
+	server.resetCounters()
+	subprocess.run(
+		[sys.executable, __file__, "--child", json.dumps(config)],
+		cwd=root,
+		check=True,
+	)
+
+	with open(resultPath) as file:
+		result = json.load(file)
+	result |= {"scenario": scenario, "requests": server.requests, "bytesTransferred": server.bytesSent}
+	return result
+
+
+def summarize(runs: list[dict]) -> dict[str, dict]:
+	"""Return the median of every measure of the runs, by scenario."""
+
+	summary = {}
+	for scenario in SCENARIOS:
+		results = [run for run in runs if run["scenario"] == scenario]
+		if not results:
+			continue
+
+		phaseNames = list(dict.fromkeys(phase["name"] for run in results for phase in run["phases"]))
+		summary[scenario] = {
+			"totalSeconds": median(run["totalSeconds"] for run in results),
+			"importSeconds": median(run["importSeconds"] for run in results),
+			"bytesTransferred": median(run["bytesTransferred"] for run in results),
+			"requests": median(run["requests"] for run in results),
+			"maxRssKiB": median(run["maxRssKiB"] for run in results),
+			"phases": {
+				name: median(
+					sum(phase["seconds"] for phase in run["phases"] if phase["name"] == name) for run in results
+				)
+				for name in phaseNames
+			},
+		}
+	return summary
+
+
+def printSummary(summary: dict[str, dict], previous: dict[str, dict] = None):
+	def change(new: float, old: float) -> str:
+		if not old:
+			return ""
+		return f" ({(new - old) / old * 100:+.0f}%)"
+
+	for scenario, values in summary.items():
+		old = (previous or {}).get(scenario, {})
+		print(
+			f"{scenario}: total {values['totalSeconds'] * 1000:.0f}ms"
+			f"{change(values['totalSeconds'], old.get('totalSeconds'))},"
+			f" import {values['importSeconds'] * 1000:.0f}ms,"
+			f" {values['bytesTransferred'] / 1024:.0f} KiB in {values['requests']:.0f} requests"
+			f"{change(values['bytesTransferred'], old.get('bytesTransferred'))},"
+			f" peak RSS {values['maxRssKiB'] / 1024:.1f} MiB"
+		)
+		for name, seconds in values["phases"].items():
+			oldSeconds = old.get("phases", {}).get(name)
+			print(f"\t{name:10} {seconds * 1000:8.1f}ms{change(seconds, oldSeconds)}")
+
+
+def gitCommit() -> str:
+	try:
+		return subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True
+		).stdout.strip()
+	except OSError:
+		return ""
+
+
+def main():
+	argparser = argparse.ArgumentParser()
+	argparser.add_argument("--child", help=argparse.SUPPRESS)
+	argparser.add_argument("--games", type=int, default=1, help="Number of games to install the addons in.")
+	argparser.add_argument("--libraries", type=int, default=2)
+	argparser.add_argument("--otherGames", type=int, default=50, help="Unsupported games in every library.")
+	argparser.add_argument("--assetFiles", type=int, default=400, help="Files per folder of the release zip.")
+	argparser.add_argument("--assetFileSize", type=int, default=16, help="Size of every file of the zip, in KiB.")
+	argparser.add_argument("--latency", type=float, default=50, help="Latency of every request, in ms.")
+	argparser.add_argument("--bandwidth", type=int, default=0, help="Bandwidth in KiB/s. 0 means no limit.")
+	argparser.add_argument("--jobs", type=int, default=4)
+	argparser.add_argument("--runs", type=int, default=3, help="Runs of every scenario.")
+	argparser.add_argument("--tracemalloc", action="store_true", help="Also record the peak Python memory of every phase.")
+	argparser.add_argument("--results", default=RESULTS_DIR, help="Folder where the results are stored.")
+	argparser.add_argument("--compare", help="Result file of a previous run to compare with.")
+	argparser.add_argument("extra", nargs="*", help="Extra arguments for the installer, after '--'.")
+	args = argparser.parse_args()
+
+	if args.child:
+		runChild(json.loads(args.child))
+		return
+
+	shims.installWinreg("")
+	from HAInstaller import AVAILABLE_GAMES
+
+	names = list(AVAILABLE_GAMES)[: args.games]
+	games = {name: (AVAILABLE_GAMES[name][0], AVAILABLE_GAMES[name][2]) for name in names}
+	asset = makeAddonsZip(
+		[values[1] for values in AVAILABLE_GAMES.values()],
+		[values[0] for values in AVAILABLE_GAMES.values()],
+		args.assetFiles,
+		args.assetFileSize * 1024,
+	)
+
+	root = tempfile.mkdtemp(prefix="hainstaller-bench-")
+	runs = []
+	with FakeGitHub(args.latency / 1000, args.bandwidth * 1024 or None) as server:
+		server.addRelease("2.6.0", asset)
+		server.addRelease("2.5.0", asset)
+		with open(VDF_PATH, "rb") as file:
+			server.addFile("/srctools.vdf", file.read())
+
+		try:
+			for _ in range(args.runs):
+				for scenario in SCENARIOS:
+					runs.append(runOnce(args, server, root, games, os.path.join(root, "cache"), scenario))
+		finally:
+			shutil.rmtree(root, ignore_errors=True)
+
+	failed = [run for run in runs if run["exitCode"] != 0]
+	for run in failed:
+		print(f"{run['scenario']} run failed with code {run['exitCode']}: {run['errors']}", file=sys.stderr)
+
+	summary = summarize(runs)
+	previous = None
+	if args.compare:
+		with open(args.compare) as file:
+			previous = json.load(file)["summary"]
+	printSummary(summary, previous)
+
+	os.makedirs(args.results, exist_ok=True)
+	resultPath = os.path.join(args.results, f"install-{datetime.now():%Y%m%d-%H%M%S}.json")
+	with open(resultPath, "w") as file:
+		json.dump(
+			{
+				"timestamp": datetime.now().isoformat(),
+				"commit": gitCommit(),
+				"python": platform.python_version(),
+				"platform": platform.platform(),
+				"params": {key: value for key, value in vars(args).items() if key != "child"},
+				"summary": summary,
+				"runs": runs,
+			},
+			file,
+			indent="\t",
+		)
+	print(f"Results stored in '{resultPath}'")
+
+	if failed:
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
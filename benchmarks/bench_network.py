@@ -0,0 +1,149 @@
+"""
+Benchmark of the HTTP client against a local stand-in for GitHub. It compares fetching the pages of the release
+list with a new `urlopen()` connection every time and with the pooled client, and checks that the release
+download survives every kind of injected fault. Then it downloads a large file over a limited bandwidth in a
+single stream and in parallel ranges, and resumes a download which was interrupted.
+
+Usage: python benchmarks/bench_network.py [--pages N] [--latency MS] [--connectLatency MS] [--sizeMiB N] [--bandwidthMiB N]
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+from http.client import HTTPException
+from time import perf_counter
+from urllib import request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from download import downloadFile
+from fakegithub import FAULTS, FakeGitHub, makeAddonsZip
+from network import HttpClient
+
+
+def fetchPagesUrlopen(server: FakeGitHub, pages: int, perPage: int):
+	for page in range(1, pages + 1):
+		with request.urlopen(f"{server.releasesUrl}?per_page={perPage}&page={page}") as response:
+			response.read()
+
+
+def fetchPagesClient(client: HttpClient, server: FakeGitHub, pages: int, perPage: int):
+	for page in range(1, pages + 1):
+		client.get(f"{server.releasesUrl}?per_page={perPage}&page={page}")
+
+
+def benchRangedDownload(server: FakeGitHub, size: int, bandwidth: float) -> bool:
+	"""Download a file with 1 and 4 connections, then interrupt a download and resume it. Returns whether all matched."""
+
+	data = os.urandom(size)
+	digest = hashlib.sha256(data).hexdigest()
+	server.addFile("/large.zip", data)
+	url = f"{server.url}/large.zip"
+	server.bandwidth = bandwidth
+	folder = tempfile.mkdtemp()
+	ok = True
+
+	try:
+		for connections in (1, 4):
+			server.resetCounters()
+			filePath = os.path.join(folder, f"{connections}.zip")
+			start = perf_counter()
+			downloadFile(HttpClient(), url, filePath, connections, size, digest)
+			seconds = perf_counter() - start
+			print(
+				f"ranged:  {size / 1024 / 1024:.0f} MiB with {connections} connections in {seconds * 1000:.0f}ms,"
+				f" {server.requests} requests"
+			)
+
+		# Cut the second segment in half, without retries, so the download stops there
+		filePath = os.path.join(folder, "resumed.zip")
+		server.resetCounters()
+		server.injectFaults(None, "truncate")
+		try:
+			downloadFile(HttpClient(retries=0), url, filePath, 4, size, digest)
+			print("resume:  the download wasn't interrupted", file=sys.stderr)
+			ok = False
+		except (OSError, HTTPException):
+			interrupted = server.bytesSent
+			server.resetCounters()
+			downloadFile(HttpClient(), url, filePath, 4, size, digest)
+			print(
+				f"resume:  {interrupted / 1024:.0f} KiB before the interruption,"
+				f" {server.bytesSent / 1024:.0f} KiB to finish"
+			)
+			ok = server.bytesSent < size
+	finally:
+		server.bandwidth = None
+		shutil.rmtree(folder, ignore_errors=True)
+	return ok
+
+
+def main():
+	argparser = argparse.ArgumentParser()
+	argparser.add_argument("--pages", type=int, default=10, help="Pages of the release list fetched.")
+	argparser.add_argument("--latency", type=float, default=20, help="Latency of every request, in ms.")
+	argparser.add_argument(
+		"--connectLatency", type=float, default=60, help="Time to open every connection, in ms."
+	)
+	argparser.add_argument("--sizeMiB", type=int, default=8, help="Size of the file downloaded in ranges.")
+	argparser.add_argument(
+		"--bandwidthMiB", type=float, default=4, help="Bandwidth of every response of the ranged download, in MiB/s."
+	)
+	args = argparser.parse_args()
+
+	perPage = 30
+	asset = makeAddonsZip(["portal2"], ["portal2"], files=200)
+	server = FakeGitHub(args.latency / 1000, connectLatency=args.connectLatency / 1000, stallSeconds=2)
+	for number in range(args.pages * perPage, 0, -1):
+		server.addRelease(f"2.{number}.0", asset if number == 1 else b"")
+
+	failed = []
+	with server:
+		start = perf_counter()
+		fetchPagesUrlopen(server, args.pages, perPage)
+		seconds = perf_counter() - start
+		print(
+			f"urlopen: {args.pages} pages in {seconds * 1000:.0f}ms, {server.connections} connections,"
+			f" {server.bytesSent / 1024:.1f} KiB"
+		)
+
+		server.resetCounters()
+		client = HttpClient()
+		start = perf_counter()
+		fetchPagesClient(client, server, args.pages, perPage)
+		seconds = perf_counter() - start
+		print(
+			f"client:  {args.pages} pages in {seconds * 1000:.0f}ms, {server.connections} connections,"
+			f" {server.bytesSent / 1024:.1f} KiB (gzip)"
+		)
+
+		# The download has to finish with the right data, whatever fails on the way
+		for fault in FAULTS:
+			client = HttpClient(readTimeout=0.5, backoff=0.05)
+			server.injectFaults(fault)
+			start = perf_counter()
+			try:
+				with client.open(f"{server.url}/assets/2.1.0.zip") as response:
+					ok = response.read() == asset
+			except OSError as error:
+				ok = False
+				print(f"\t{fault}: {error}", file=sys.stderr)
+			seconds = perf_counter() - start
+			print(f"fault {fault:9} {'ok' if ok else 'FAILED':6} {seconds * 1000:6.0f}ms  {client.summary()}")
+			if not ok:
+				failed.append(fault)
+
+		ok = benchRangedDownload(server, args.sizeMiB * 1024 * 1024, args.bandwidthMiB * 1024 * 1024)
+		if not ok:
+			failed.append("ranged download")
+
+	if failed:
+		print(f"The download failed with the faults: {', '.join(failed)}", file=sys.stderr)
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of the file placement stage on a synthetic release with a few thousand small files.
+
+Usage: python benchmarks/bench_placement.py [--files N] [--size BYTES]
+"""
+
+import argparse
+import os
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from zipfile import ZipFile, ZIP_DEFLATED
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from extraction import LINK_MODES, getPlacementRules, planExtraction, mergePlans, extractPlan
+
+
+def makeRelease(zipPath: str, files: int, size: int):
+	"""Write a zip with the layout of a HammerAddons release, with `files` files inside the hammer folder."""
+
+	with ZipFile(zipPath, "w", ZIP_DEFLATED) as zipfile:
+		zipfile.writestr("win64/postcompiler/postcompiler.exe", os.urandom(size))
+		zipfile.writestr("portal2.fgd", os.urandom(size))
+		for number in range(files):
+			zipfile.writestr(f"hammer/folder{number // 100}/file{number}.txt", os.urandom(size))
+
+
+def main():
+	argparser = argparse.ArgumentParser()
+	argparser.add_argument("--files", type=int, default=3000)
+	argparser.add_argument("--size", type=int, default=2048)
+	args = argparser.parse_args()
+
+	with TemporaryDirectory() as tempdir:
+		zipPath = os.path.join(tempdir, "release.zip")
+		makeRelease(zipPath, args.files, args.size)
+
+		with ZipFile(zipPath) as zipfile:
+			for linkMode in LINK_MODES:
+				for workers in (1, 4, 8):
+					gamePath = os.path.join(tempdir, f"game_{linkMode}_{workers}")
+					stagingDir = os.path.join(tempdir, f"staging_{linkMode}_{workers}")
+					plan = mergePlans(
+						planExtraction(
+							zipfile.infolist(),
+							getPlacementRules(gamePath, "portal2", "portal2", True),
+						)
+					)
+
+					start = perf_counter()
+					written = extractPlan(zipfile, plan, workers=workers, linkMode=linkMode, stagingDir=stagingDir)
+					elapsed = perf_counter() - start
+
+					# Placing again from an already populated staging folder is the usual case when linking
+					start = perf_counter()
+					extractPlan(zipfile, plan, workers=workers, linkMode=linkMode, stagingDir=stagingDir)
+					again = perf_counter() - start
+
+					print(
+						f"{linkMode:8} workers={workers}: {len(plan)} files, {written} bytes written,"
+						f" first {elapsed:.3f}s, again {again:.3f}s"
+					)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,98 @@
+"""
+Benchmark of the Steam library scanner on synthetic libraries with hundreds of game folders each.
+
+Usage: python benchmarks/bench_scan.py [--libs N] [--games N]
+"""
+
+import argparse
+import os
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from discovery import scanLibraries
+
+
+SUPPORTED = {
+	"Portal 2": ("portal2", 620),
+	"Team Fortress 2": ("tf", 440),
+	"Half-Life 2": ("hl2", 220),
+}
+
+MANIFEST = """\
+"AppState"
+{{
+	"appid"		"{appId}"
+	"name"		"{name}"
+	"installdir"		"{name}"
+	"SizeOnDisk"		"{size}"
+}}
+"""
+
+
+def makeLibrary(lib: str, games: int, withManifests: bool):
+	"""Create a library with `games` game folders, and the supported games in it."""
+
+	common = os.path.join(lib, "steamapps/common")
+	os.makedirs(common)
+
+	folders = [(f"Game {number}", 100000 + number, None) for number in range(games)]
+	folders += [(name, appId, folder) for name, (folder, appId) in SUPPORTED.items()]
+
+	for name, appId, folder in folders:
+		os.makedirs(os.path.join(common, name, folder or "game"))
+		with open(os.path.join(common, name, folder or "game", "gameinfo.txt"), "w") as file:
+			file.write('"GameInfo" {}\n')
+
+		if withManifests:
+			with open(os.path.join(lib, "steamapps", f"appmanifest_{appId}.acf"), "w") as file:
+				file.write(MANIFEST.format(appId=appId, name=name, size=1024**3))
+
+
+def sequentialScan(libs: list[str]) -> list[tuple[str, str]]:
+	"""The scanner used before, for comparison."""
+
+	found = []
+	for lib in libs:
+		common = os.path.join(lib, "steamapps/common")
+		found.extend(
+			(game, lib)
+			for game in os.listdir(common)
+			if game in SUPPORTED
+			and os.path.exists(os.path.join(common, game, SUPPORTED[game][0], "gameinfo.txt"))
+		)
+	return found
+
+
+def main():
+	argparser = argparse.ArgumentParser()
+	argparser.add_argument("--libs", type=int, default=12)
+	argparser.add_argument("--games", type=int, default=300)
+	args = argparser.parse_args()
+
+	with TemporaryDirectory() as tempdir:
+		for withManifests in (True, False):
+			libs = [os.path.join(tempdir, f"{withManifests}_lib{number}") for number in range(args.libs)]
+			for lib in libs:
+				makeLibrary(lib, args.games, withManifests)
+
+			start = perf_counter()
+			old = sequentialScan(libs)
+			oldTime = perf_counter() - start
+
+			start = perf_counter()
+			new = [game for games in scanLibraries(tuple(libs), SUPPORTED).values() for game in games]
+			newTime = perf_counter() - start
+
+			assert len(old) == len(new), (len(old), len(new))
+			kind = "app manifests" if withManifests else "folder listing"
+			print(
+				f"{kind:15}: {args.libs} libraries x {args.games} games, {len(new)} found,"
+				f" sequential {oldTime * 1000:.1f}ms, concurrent {newTime * 1000:.1f}ms"
+			)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of the sparse download of the release. It compares the bytes and requests needed to download the whole
+zip with the ones needed to read only the members planned for some games with range requests, against a local
+stand-in for GitHub. The times of the sparse downloads include reading the members.
+
+Usage: python benchmarks/bench_sparse.py [--assetFiles N] [--latency MS] [--bandwidth KIB/S]
+"""
+
+import argparse
+import os
+import sys
+from time import perf_counter
+from zipfile import ZipFile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+import shims
+
+shims.installWinreg("")
+
+from extraction import getPlacementRules, mergePlans, planExtraction
+from fakegithub import FakeGitHub, makeAddonsZip
+from HAInstaller import AVAILABLE_GAMES
+from network import HttpClient
+from remotezip import RemoteFile
+
+
+def main():
+	argparser = argparse.ArgumentParser()
+	argparser.add_argument("--assetFiles", type=int, default=400, help="Files per folder of the release zip.")
+	argparser.add_argument("--latency", type=float, default=20, help="Latency of every request, in ms.")
+	argparser.add_argument("--bandwidth", type=int, default=0, help="Bandwidth in KiB/s. 0 means no limit.")
+	args = argparser.parse_args()
+
+	games = list(AVAILABLE_GAMES.values())
+	asset = makeAddonsZip([game[1] for game in games], [game[0] for game in games], args.assetFiles)
+
+	with FakeGitHub(args.latency / 1000, args.bandwidth * 1024 or None) as server:
+		server.addFile("/asset.zip", asset)
+		url = f"{server.url}/asset.zip"
+
+		server.resetCounters()
+		start = perf_counter()
+		with HttpClient().open(url) as response:
+			response.read()
+		seconds = perf_counter() - start
+		print(f"full:    {server.bytesSent / 1024:7.0f} KiB in {server.requests:2} requests, {seconds * 1000:5.0f}ms")
+
+		for count in (1, 2, 4, len(games)):
+			server.resetCounters()
+			start = perf_counter()
+			remote = RemoteFile(HttpClient(), url, len(asset))
+			with ZipFile(remote) as zipfile:
+				members = zipfile.infolist()
+				plan = mergePlans(
+					*(
+						planExtraction(members, getPlacementRules("game", folder, fgdName, True))
+						for folder, fgdName, _ in games[:count]
+					)
+				)
+				remote.prefetchMembers(zipfile, [info for info, _ in plan])
+				for info, _ in plan:
+					zipfile.read(info)
+			seconds = perf_counter() - start
+			print(
+				f"{count:2} game/s: {server.bytesSent / 1024:6.0f} KiB in {server.requests:2} requests,"
+				f" {seconds * 1000:5.0f}ms ({server.bytesSent / len(asset) * 100:.0f}% of the zip, {len(plan)} members)"
+			)
+
+
+if __name__ == "__main__":
+	main()
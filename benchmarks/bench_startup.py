@@ -0,0 +1,133 @@
+"""
+Startup benchmark of the installer. It runs `--help` and `--chkup` in new processes with `-X importtime`, and
+reports their wall time, the time spent importing, and the slowest imports.
+
+It fails if the median wall time of a command goes over its threshold, or if a module that should only be
+imported when it's used (like srctools) gets imported by a command that doesn't need it.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--maxHelp MS] [--maxChkup MS]
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from statistics import median
+from time import perf_counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "../src"))
+
+from fakegithub import FakeGitHub
+
+
+# Modules which are slow to import, and the commands that must not import them. shutil isn't checked, since
+# argparse imports it to print the help.
+LAZY_MODULES = {
+	"srctools": ("help", "chkup"),
+	"urllib.request": ("help",),
+	"zipfile": ("help", "chkup"),
+}
+
+_IMPORT_LINE = re.compile(r"import time:\s*(\d+) \|\s*(\d+) \|( *)(\S+)")
+
+
+# Runs the installer in the new process. It is passed with `-c`, so only the modules the installer uses get
+# imported, and not the ones of this script.
+CHILD_CODE = """
+import sys
+sys.path[:0] = [{benchDir!r}, {srcDir!r}]
+import shims
+shims.installWinreg("")
+import HAInstaller
+HAInstaller.UPDATES_URL = {updatesUrl!r}
+sys.argv = ["HAInstaller.py", *{argv!r}]
+HAInstaller.main()
+"""
+
+
+def parseImportTime(output: str) -> list[tuple[str, int, int]]:
+	"""Return the `(module, self µs, cumulative µs)` of every import in the output of `-X importtime`."""
+
+	return [
+		(match[4], int(match[1]), int(match[2]))
+		for match in _IMPORT_LINE.finditer(output)
+	]
+
+
+def runOnce(server: FakeGitHub, command: str) -> dict:
+	cacheDir = tempfile.mkdtemp(prefix="hainstaller-startup-")
+	argv = ["--help"] if command == "help" else ["--chkup", "--noPbar", "--cacheDir", cacheDir]
+	code = CHILD_CODE.format(
+		benchDir=BENCH_DIR,
+		srcDir=os.path.join(BENCH_DIR, "../src"),
+		updatesUrl=f"{server.url}/latest",
+		argv=argv,
+	)
+
+	try:
+		start = perf_counter()
+		process = subprocess.run(
+			[sys.executable, "-X", "importtime", "-c", code],
+			stdout=subprocess.DEVNULL,
+			stderr=subprocess.PIPE,
+			text=True,
+		)
+		seconds = perf_counter() - start
+	finally:
+		shutil.rmtree(cacheDir, ignore_errors=True)
+
+	imports = parseImportTime(process.stderr)
+	installer = next((cumulative for name, _, cumulative in imports if name == "HAInstaller"), 0)
+	return {
+		"seconds": seconds,
+		"importSeconds": sum(own for _, own, _ in imports) / 1e6,
+		"installerImportSeconds": installer / 1e6,
+		"modules": [name for name, _, _ in imports],
+		"slowest": sorted(imports, key=lambda item: item[1], reverse=True)[:5],
+	}
+
+
+def main():
+	argparser = argparse.ArgumentParser()
+	argparser.add_argument("--runs", type=int, default=10)
+	argparser.add_argument("--maxHelp", type=float, default=200, help="Maximum median time of --help, in ms.")
+	argparser.add_argument("--maxChkup", type=float, default=250, help="Maximum median time of --chkup, in ms.")
+	args = argparser.parse_args()
+
+	thresholds = {"help": args.maxHelp, "chkup": args.maxChkup}
+	failures = []
+
+	with FakeGitHub() as server:
+		server.addFile("/latest", json.dumps({"tag_name": "1.0.0"}).encode())
+
+		for command, threshold in thresholds.items():
+			runs = [runOnce(server, command) for _ in range(args.runs)]
+			seconds = median(run["seconds"] for run in runs)
+
+			print(
+				f"--{command}: {seconds * 1000:.0f}ms (threshold {threshold:.0f}ms),"
+				f" imports {median(run['importSeconds'] for run in runs) * 1000:.0f}ms,"
+				f" HAInstaller {median(run['installerImportSeconds'] for run in runs) * 1000:.0f}ms"
+			)
+			for name, own, _ in runs[-1]["slowest"]:
+				print(f"\t{name:30} {own / 1000:6.1f}ms")
+
+			if seconds * 1000 > threshold:
+				failures.append(f"--{command} took {seconds * 1000:.0f}ms, over the {threshold:.0f}ms threshold")
+			for module, commands in LAZY_MODULES.items():
+				if command in commands and module in runs[-1]["modules"]:
+					failures.append(f"--{command} imported '{module}'")
+
+	for failure in failures:
+		print(failure, file=sys.stderr)
+	if failures:
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,123 @@
+"""
+Micro-benchmark of sorting and querying thousands of release tags, comparing the old `Version` class, which
+parsed lists and compared them field by field, with the current one and the release index.
+
+Usage: python benchmarks/bench_version.py [--tags N]
+"""
+
+import argparse
+import os
+import random
+import sys
+from timeit import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from releases import ReleaseIndex
+from utils import Version
+
+
+class OldVersion:
+	"""The Version class used before, for comparison."""
+
+	def __init__(self, version: str, seps: tuple = (".", "-")) -> None:
+		self._seps = seps
+		self._stripped = self._strip(version)
+		self._splitted = self._split(self._stripped)
+
+	def _strip(self, string: str) -> str:
+		endStr = "".join(char for char in string if char.isdigit() or char in ".-")
+		return "0" if not endStr or ".." in endStr else endStr
+
+	def _split(self, ver: str) -> list:
+		split = ver.split(self._seps[1])
+		main = [int(hoho) for hoho in split[0].split(self._seps[0])]
+		for number, item in reversed(list(enumerate(main))):
+			if item == 0:
+				main.pop(number)
+			else:
+				break
+		sub = int(split[1]) if len(split) > 1 and split[1] != "" else 0
+		return [main, sub]
+
+	def _compare(self, first: object, second: object):
+		ver1 = first._splitted
+		ver2 = second._splitted
+		if ver1[0] == ver2[0]:
+			return ver1[1] > ver2[1]
+		ver2Main = ver2[0]
+		for number, item in enumerate(ver1[0]):
+			if len(ver2Main) == number or item > ver2Main[number]:
+				return True
+			elif item < ver2Main[number]:
+				return False
+		return False
+
+	def __gt__(self, other) -> bool:
+		return self._compare(self, other)
+
+	def __ge__(self, other) -> bool:
+		return self.__gt__(other) or self.__eq__(other)
+
+	def __lt__(self, other) -> bool:
+		return self._compare(other, self)
+
+	def __le__(self, other) -> bool:
+		return self.__lt__(other) or self.__eq__(other)
+
+	def __eq__(self, other) -> bool:
+		return self._splitted == other._splitted
+
+	def __hash__(self) -> int:
+		return hash(self._stripped)
+
+
+def makeTags(count: int, seed: int = 0) -> list[str]:
+	rand = random.Random(seed)
+	tags = set()
+	while len(tags) < count:
+		tag = f"{rand.randrange(4)}.{rand.randrange(20)}.{rand.randrange(20)}"
+		if rand.random() < 0.2:
+			tag += f"-{rand.randrange(5)}"
+		tags.add(tag)
+	return list(tags)
+
+
+def main():
+	argparser = argparse.ArgumentParser()
+	argparser.add_argument("--tags", type=int, default=5000)
+	argparser.add_argument("--repeat", type=int, default=10)
+	args = argparser.parse_args()
+
+	tags = makeTags(args.tags)
+	oldVersions = [OldVersion(tag) for tag in tags]
+	newVersions = [Version(tag) for tag in tags]
+	repeat = args.repeat
+
+	def ms(seconds: float) -> str:
+		return f"{seconds / repeat * 1000:.2f}ms"
+
+	print(f"{args.tags} tags")
+	print(
+		f"parse: old {ms(timeit(lambda: [OldVersion(tag) for tag in tags], number=repeat))},"
+		f" new {ms(timeit(lambda: [Version(tag) for tag in tags], number=repeat))}"
+	)
+	print(
+		f"sort:  old {ms(timeit(lambda: sorted(oldVersions), number=repeat))},"
+		f" new {ms(timeit(lambda: sorted(newVersions), number=repeat))}"
+	)
+
+	# Query the newest version in a range, scanning every version like before, or with the index
+	low, high = OldVersion("1.5"), OldVersion("2.10")
+	index = ReleaseIndex((version, None) for version in newVersions)
+	print(
+		f"query: old {ms(timeit(lambda: max(v for v in oldVersions if low <= v < high), number=repeat))},"
+		f" index build {ms(timeit(lambda: ReleaseIndex((v, None) for v in newVersions), number=repeat))},"
+		f" index query {ms(timeit(lambda: index.best('>=1.5,<2.10'), number=repeat))}"
+	)
+
+	assert [str(v) for v in sorted(newVersions)] == [v._stripped for v in sorted(oldVersions)]
+
+
+if __name__ == "__main__":
+	main()
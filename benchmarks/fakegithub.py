@@ -0,0 +1,288 @@
+"""
+Local HTTP server standing in for the GitHub releases API, the release downloads and the raw file host,
+with configurable latency and bandwidth. Used by the benchmarks.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import random
+import re
+import socket
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, sleep
+from urllib.parse import parse_qs, urlsplit
+
+
+__all__ = ["FAULTS", "makeAddonsZip", "FakeGitHub"]
+
+
+# Failures which can be injected in the responses:
+# - "503": Reply with a 503 status and `Retry-After: 0`.
+# - "reset": Close the connection without replying.
+# - "truncate": Send half of the body, and close the connection.
+# - "stall": Wait `stallSeconds` before replying.
+FAULTS = ("503", "reset", "truncate", "stall")
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def makeAddonsZip(
+	fgdNames: list[str], gameFolders: list[str], files: int = 200, fileSize: int = 16 * 1024, seed: int = 0
+) -> bytes:
+	"""
+	Return a zip with the same layout as a HammerAddons release: postcompiler builds, Hammer files,
+	instances for every game folder and an fgd for every game. The files are half random data and half
+	repeated text, so they compress a bit, like the real ones.
+	"""
+
+	rand = random.Random(seed)
+
+	def content() -> bytes:
+		half = fileSize // 2
+		return rand.randbytes(half) + b"// HammerAddons benchmark file\n" * ((fileSize - half) // 31 + 1)
+
+	names = [f"{arch}/postcompiler/postcompiler.exe" for arch in ("win32", "win64")]
+	names += [
+		f"{arch}/postcompiler/bin/lib{number}.pyd" for arch in ("win32", "win64") for number in range(files // 8)
+	]
+	names += [f"hammer/materials/tool{number}.vmt" for number in range(files // 4)]
+	names += [
+		f"instances/{folder}/instance{number}.vmf" for folder in gameFolders for number in range(files // 4)
+	]
+	names += [f"{fgd}.fgd" for fgd in fgdNames]
+
+	file = io.BytesIO()
+	with zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED) as archive:
+		for name in names:
+			archive.writestr(name, content())
+	return file.getvalue()
+
+
+class FakeGitHub:
+	"""
+	Serves a list of releases at `/releases`, their assets at `/assets/<tag>.zip`, and any other file added
+	with `addFile()` at its own path.
+
+	- `latency` is the number of seconds waited before answering every request.
+	- `connectLatency` is the number of seconds waited when a connection is opened, like a TCP and TLS handshake.
+	- `bandwidth` is the maximum number of bytes per second sent in every response, or `None`.
+	- `perPage` is the default number of releases in every page of the list, which can be changed with the
+	`per_page` query parameter up to 100. Other pages are linked with a `Link` header, like the real API.
+	- `ranges` is whether the files support `Range` requests. Without them, the whole file is always sent.
+
+	Connections are kept alive. The number of requests, connections and bytes sent are counted in `requests`,
+	`connections` and `bytesSent`, and can be cleared with `resetCounters()`. The release list supports `ETag`
+	revalidation and gzip, and the files support `Range` requests unless `ranges` is off.
+
+	Failures can be injected with `injectFaults()`, one for each of the next requests.
+	"""
+
+	def __init__(
+		self,
+		latency: float = 0.0,
+		bandwidth: int = None,
+		perPage: int = 30,
+		stallSeconds: float = 5.0,
+		connectLatency: float = 0.0,
+		ranges: bool = True,
+	) -> None:
+		self.latency = latency
+		self.connectLatency = connectLatency
+		self.bandwidth = bandwidth
+		self.perPage = perPage
+		self.stallSeconds = stallSeconds
+		self.ranges = ranges
+		self.releases: list[dict] = []
+		self.files: dict[str, bytes] = {}
+		self.faults: list[str] = []
+		self._lock = threading.Lock()
+		self.resetCounters()
+
+		server = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = "HTTP/1.1"
+
+			def setup(self):
+				super().setup()
+				# The headers and the body are sent apart, which would wait for a delayed ACK otherwise
+				self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+				with server._lock:
+					server.connections += 1
+				if server.connectLatency:
+					sleep(server.connectLatency)
+
+			def do_GET(self):
+				server._handle(self)
+
+			def log_message(self, *args):
+				pass
+
+		self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		self._server.daemon_threads = True
+		self._thread = threading.Thread(target=self._server.serve_forever, name="fakegithub", daemon=True)
+
+	@property
+	def url(self) -> str:
+		return f"http://127.0.0.1:{self._server.server_port}"
+
+	@property
+	def releasesUrl(self) -> str:
+		return f"{self.url}/releases"
+
+	def addRelease(self, tag: str, asset: bytes):
+		"""Add a release with a single asset. The newest release must be added first, like the API sorts them."""
+
+		self.files[f"/assets/{tag}.zip"] = asset
+		self.releases.append(
+			{
+				"tag_name": tag,
+				"assets": [
+					{
+						"name": f"{tag}.zip",
+						"size": len(asset),
+						"digest": f"sha256:{hashlib.sha256(asset).hexdigest()}",
+						"browser_download_url": f"{self.url}/assets/{tag}.zip",
+					}
+				],
+			}
+		)
+
+	def addFile(self, urlPath: str, data: bytes):
+		self.files[urlPath] = data
+
+	def injectFaults(self, *faults: str):
+		"""Make the next requests fail, one with each of the `FAULTS` given, in order. `None` lets a request succeed."""
+
+		for fault in faults:
+			if fault is not None and fault not in FAULTS:
+				raise ValueError(f"unknown fault '{fault}'")
+		with self._lock:
+			self.faults.extend(faults)
+
+	def resetCounters(self):
+		with self._lock:
+			self.requests = 0
+			self.connections = 0
+			self.bytesSent = 0
+
+	def _count(self, sent: int):
+		with self._lock:
+			self.bytesSent += sent
+
+	def _handle(self, handler: BaseHTTPRequestHandler):
+		with self._lock:
+			self.requests += 1
+			fault = self.faults.pop(0) if self.faults else None
+
+		if self.latency:
+			sleep(self.latency)
+
+		if fault == "reset":
+			handler.close_connection = True
+			return
+		if fault == "stall":
+			sleep(self.stallSeconds)
+		if fault == "503":
+			handler.send_response(503)
+			handler.send_header("Retry-After", "0")
+			handler.send_header("Content-Length", "0")
+			handler.end_headers()
+			return
+
+		status = 200
+
+		url = urlsplit(handler.path)
+		urlPath = url.path
+		if urlPath == "/releases":
+			query = parse_qs(url.query)
+			perPage = min(int(query.get("per_page", [self.perPage])[0]), 100)
+			page = int(query.get("page", [1])[0])
+
+			body = json.dumps(self.releases[(page - 1) * perPage : page * perPage]).encode()
+			etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+			if handler.headers.get("If-None-Match") == etag:
+				handler.send_response(304)
+				handler.send_header("ETag", etag)
+				handler.end_headers()
+				return
+			headers = {"Content-Type": "application/json", "ETag": etag}
+			if page * perPage < len(self.releases):
+				headers["Link"] = f'<{self.releasesUrl}?per_page={perPage}&page={page + 1}>; rel="next"'
+			if "gzip" in handler.headers.get("Accept-Encoding", ""):
+				body = gzip.compress(body)
+				headers["Content-Encoding"] = "gzip"
+		elif urlPath in self.files:
+			body = self.files[urlPath]
+			etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+			headers = {"Content-Type": "application/octet-stream", "ETag": etag}
+			if self.ranges:
+				headers["Accept-Ranges"] = "bytes"
+
+			match = _RANGE.match(handler.headers.get("Range", ""))
+			if self.ranges and match and (match[1] or match[2]) and handler.headers.get("If-Range", etag) == etag:
+				if match[1]:
+					start = int(match[1])
+					end = min(int(match[2]) if match[2] else len(body) - 1, len(body) - 1)
+				else:
+					# A suffix range, with the last bytes of the file
+					start, end = max(0, len(body) - int(match[2])), len(body) - 1
+				if start > end:
+					handler.send_response(416)
+					handler.send_header("Content-Range", f"bytes */{len(body)}")
+					handler.send_header("Content-Length", "0")
+					handler.end_headers()
+					return
+				status = 206
+				headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+				# A view of the range, so the server doesn't copy it
+				body = memoryview(body)[start : end + 1]
+		else:
+			handler.send_error(404)
+			return
+
+		handler.send_response(status)
+		for key, value in headers.items():
+			handler.send_header(key, value)
+		handler.send_header("Content-Length", str(len(body)))
+		handler.end_headers()
+		if fault == "truncate":
+			handler.close_connection = True
+			body = body[: len(body) // 2]
+		self._send(handler, body)
+
+	def _send(self, handler: BaseHTTPRequestHandler, body: bytes):
+		"""Write the body, throttled to the bandwidth limit."""
+
+		chunkSize = 64 * 1024
+		start = monotonic()
+		for offset in range(0, len(body), chunkSize):
+			chunk = body[offset : offset + chunkSize]
+			try:
+				handler.wfile.write(chunk)
+			except (BrokenPipeError, ConnectionResetError):
+				return
+			self._count(len(chunk))
+
+			if self.bandwidth:
+				ahead = (offset + len(chunk)) / self.bandwidth - (monotonic() - start)
+				if ahead > 0:
+					sleep(ahead)
+
+	def start(self) -> "FakeGitHub":
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+
+	def __enter__(self) -> "FakeGitHub":
+		return self.start()
+
+	def __exit__(self, *args):
+		self.stop()
@@ -0,0 +1,146 @@
+"""
+Generators for fake Steam installations: library trees, `libraryfolders.vdf`, app manifests, `gameinfo.txt`
+and `CmdSeq.wc` files. Used by the benchmarks.
+"""
+
+import io
+import os
+import random
+
+from srctools import cmdseq
+
+
+__all__ = [
+	"makeLibraryFolders",
+	"makeAppManifest",
+	"makeGameInfo",
+	"makeCmdSeq",
+	"makeGame",
+	"makeSteamTree",
+]
+
+
+GAMEINFO = """\
+"GameInfo"
+{{
+	game		"{name}"
+	title		"{name}"
+	type		singleplayer_only
+
+	FileSystem
+	{{
+		SteamAppId		{appId}
+
+		SearchPaths
+		{{
+			Game				|gameinfo_path|.
+{paths}
+		}}
+	}}
+}}
+"""
+
+
+def makeLibraryFolders(steamPath: str, libs: list[str]):
+	"""Write `steamapps/libraryfolders.vdf` in the main Steam folder, listing the libraries given."""
+
+	entries = "".join(
+		f'\t"{number}"\n\t{{\n\t\t"path"\t\t"{lib}"\n\t\t"label"\t\t""\n\t}}\n'
+		for number, lib in enumerate([steamPath, *libs])
+	)
+	os.makedirs(os.path.join(steamPath, "steamapps"), exist_ok=True)
+	with open(os.path.join(steamPath, "steamapps/libraryfolders.vdf"), "w") as file:
+		file.write(f'"libraryfolders"\n{{\n{entries}}}\n')
+
+
+def makeAppManifest(lib: str, name: str, appId: int, size: int = 1024**3):
+	"""Write the `appmanifest_<appId>.acf` file of a game in a library."""
+
+	with open(os.path.join(lib, "steamapps", f"appmanifest_{appId}.acf"), "w") as file:
+		file.write(
+			f'"AppState"\n{{\n\t"appid"\t\t"{appId}"\n\t"name"\t\t"{name}"\n'
+			f'\t"installdir"\t\t"{name}"\n\t"SizeOnDisk"\t\t"{size}"\n}}\n'
+		)
+
+
+def makeGameInfo(name: str, appId: int, searchPaths: int = 8) -> str:
+	"""Return the contents of a `gameinfo.txt` file with some extra search paths."""
+
+	paths = "".join(f"\t\t\tGame\t\t\t\tcustom/path{number}\n" for number in range(searchPaths))
+	return GAMEINFO.format(name=name, appId=appId, paths=paths)
+
+
+def makeCmdSeq(configs: int = 4, commands: int = 6, postcompiler: str = None, seed: int = 0) -> bytes:
+	"""
+	Return the contents of a `CmdSeq.wc` file. Every config has `commands` commands with the bsp command
+	somewhere in it. If `postcompiler` is given, some configs already have that postcompiler after the bsp
+	command, either with the default arguments or with old ones.
+	"""
+
+	rand = random.Random(seed)
+	data = {}
+	for number in range(configs):
+		cmds = [
+			cmdseq.Command(f"tool{index}.exe", f"-arg{index} $path\\$file") for index in range(commands)
+		]
+		bspIndex = rand.randrange(commands + 1)
+		cmds.insert(bspIndex, cmdseq.Command("$bsp_exe", "-game $gamedir $path\\$file"))
+
+		kind = rand.randrange(3) if postcompiler else 0
+		if kind == 1:
+			cmds.insert(bspIndex + 1, cmdseq.Command(postcompiler, "--old-args"))
+		elif kind == 2:
+			cmds.insert(bspIndex + 1, cmdseq.Command(postcompiler, "--propcombine $path\\$file"))
+		data[f"Config {number}"] = cmds
+
+	file = io.BytesIO()
+	cmdseq.write(data, file)
+	return file.getvalue()
+
+
+def makeGame(lib: str, name: str, folder: str, appId: int, withCmdSeq: bool = True):
+	"""Create a game with its `gameinfo.txt`, `CmdSeqDefault.wc` and app manifest in a library."""
+
+	gamePath = os.path.join(lib, "steamapps/common", name)
+	os.makedirs(os.path.join(gamePath, folder), exist_ok=True)
+	os.makedirs(os.path.join(gamePath, "bin"), exist_ok=True)
+
+	with open(os.path.join(gamePath, folder, "gameinfo.txt"), "w") as file:
+		file.write(makeGameInfo(name, appId))
+
+	if withCmdSeq:
+		with open(os.path.join(gamePath, "bin/CmdSeqDefault.wc"), "wb") as file:
+			file.write(makeCmdSeq(seed=appId))
+
+	makeAppManifest(lib, name, appId)
+
+
+def makeSteamTree(
+	root: str,
+	games: dict[str, tuple[str, int]],
+	libraries: int = 1,
+	otherGames: int = 0,
+) -> tuple[str, list[str]]:
+	"""
+	Create a fake Steam installation in `root` with `libraries` libraries. The games given, as
+	`name: (folder, appId)`, are spread over the libraries, and every library also gets `otherGames`
+	unsupported games.
+
+	Returns the main Steam folder and the list of all the libraries. `root` should be lowercase, since the
+	installer lowercases the library paths.
+	"""
+
+	steamPath = os.path.join(root, "steam")
+	libs = [steamPath] + [os.path.join(root, f"library{number}") for number in range(1, libraries)]
+
+	for lib in libs:
+		os.makedirs(os.path.join(lib, "steamapps/common"), exist_ok=True)
+		for number in range(otherGames):
+			os.makedirs(os.path.join(lib, "steamapps/common", f"Other Game {number}"), exist_ok=True)
+			makeAppManifest(lib, f"Other Game {number}", 900000 + number)
+
+	for index, (name, (folder, appId)) in enumerate(games.items()):
+		makeGame(libs[index % len(libs)], name, folder, appId)
+
+	makeLibraryFolders(steamPath, libs[1:])
+	return steamPath, libs
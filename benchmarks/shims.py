@@ -0,0 +1,70 @@
+"""
+Shims for the Windows-only parts of the installer, so it can run on any platform in the benchmarks.
+They must be installed before importing `HAInstaller`.
+"""
+
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+import procquery
+
+
+__all__ = ["installWinreg", "FakeProcessQuery", "installProcessQuery"]
+
+
+def installWinreg(steamPath: str):
+	"""Install a fake `winreg` module where the `SteamPath` value of the Steam key is `steamPath`."""
+
+	winreg = types.ModuleType("winreg")
+	winreg.HKEY_CURRENT_USER = 0x80000001
+
+	def OpenKey(key, subKey):
+		if key != winreg.HKEY_CURRENT_USER or subKey.lower() != "software\\valve\\steam":
+			raise FileNotFoundError(subKey)
+		return subKey
+
+	def QueryValueEx(handle, name):
+		if name != "SteamPath":
+			raise FileNotFoundError(name)
+		return steamPath, 1  # REG_SZ
+
+	winreg.OpenKey = OpenKey
+	winreg.QueryValueEx = QueryValueEx
+	winreg.CloseKey = lambda handle: None
+	sys.modules["winreg"] = winreg
+
+
+class FakeProcessQuery(procquery.ProcessQuery):
+	"""Process query backend with a fixed list of running processes, which exit after `exitAfter` checks."""
+
+	def __init__(self, processes: list[str] = (), exitAfter: int = 1) -> None:
+		self.processes = {1000 + pid: name for pid, name in enumerate(processes)}
+		self.exitAfter = exitAfter
+		self._checks = 0
+
+	def listProcesses(self) -> list[tuple[int, str]]:
+		return list(self.processes.items())
+
+	def _pidExists(self, pid: int) -> bool:
+		self._checks += 1
+		if self._checks > self.exitAfter:
+			self.processes.pop(pid, None)
+		return pid in self.processes
+
+
+def installProcessQuery(processes: list[str] = (), exitAfter: int = 1) -> FakeProcessQuery:
+	"""
+	Make the installer see the processes given as running, instead of the real ones. This stands in for
+	the Toolhelp snapshot used on Windows.
+	"""
+
+	query = FakeProcessQuery(processes, exitAfter)
+	procquery.getProcessQuery = lambda: query
+
+	import utils
+
+	utils.getProcessQuery = lambda: query
+	return query
@@ -1,20 +1,58 @@
-import os
-import shutil
-from time import sleep
 import winreg
 import argparse
-from os import path, listdir, system as runsys
-from srctools import cmdseq, clean_line, Property
-from tempfile import TemporaryFile, TemporaryDirectory
-from urllib import request
-from json import loads as jsonLoads
-from zipfile import ZipFile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from os import path, makedirs, environ, remove, replace, system as runsys
 from textwrap import dedent
+from typing import Callable
 from sys import exit
 from platform import architecture
-from distutils.dir_util import copy_tree
 
-from utils import getIndent, isProcess, Version
+# srctools, urllib, zipfile and shutil are slow to import, so they are imported by the functions using them.
+# That keeps --help and --chkup fast.
+
+from utils import isProcess, waitForProcessExit, Version
+from network import (
+	DEFAULT_BUFFER_SIZE,
+	DEFAULT_CONNECT_TIMEOUT,
+	DEFAULT_READ_TIMEOUT,
+	DEFAULT_RETRIES,
+	HttpClient,
+	fetchJson,
+)
+from cache import (
+	DEFAULT_CACHE_DIR,
+	DEFAULT_CACHE_SIZE,
+	DEFAULT_METADATA_TTL,
+	ReleaseCache,
+	MetadataCache,
+)
+from extraction import (
+	getPlacementRules,
+	planExtraction,
+	mergePlans,
+	extractPlan,
+	InstallManifest,
+	LINK_MODES,
+)
+from output import OUTPUT_MODES, PHASE_STEPS, getRenderer
+from download import DEFAULT_CONNECTIONS
+from discovery import DiscoveryCache, FoundGame, scanLibraries
+from patcher import InsertAfterRule, SetValueRule, patchFile
+import cmdseqedit
+from profiler import Profiler
+from progress import Progress, ProgressTask
+from releases import (
+	DEFAULT_MIRROR_PORT,
+	MIRROR_ENV,
+	ReleaseIndex,
+	ReleaseInfo,
+	ReleaseSource,
+	isExactSpec,
+	mirrorSource,
+	parseVersionSpec,
+)
+from logwriter import DEFAULT_FLUSH_INTERVAL, DEFAULT_MAX_BYTES, BufferedLogWriter
 import pbar
 from pbar import Term
 
@@ -22,35 +60,59 @@ from pbar import Term
 POSTCOMPILER_ARGS = "--propcombine $path\$file"
 VERSION = Version("1.7.5")
 RELEASES_URL = "https://api.github.com/repos/TeamSpen210/HammerAddons/releases"
+UPDATES_URL = "https://api.github.com/repos/DarviL82/HAInstaller/releases/latest"
 VDF_URL = (
 	"https://raw.githubusercontent.com/DarviL82/HAInstaller/main/resources/srctools.vdf"
 )
-AVAILABLE_GAMES: dict[str, tuple[str, str]] = {
-	# Game definitions. These specify the name of the main game folder, and for every game, the fgd, and the second game folder inside.
-	# Game Folder: (folder2, fgdname)
-	"Alien Swarm": ("asw", "swarm"),
-	"Black Mesa": ("bms", "blackmesa"),
-	"Counter-Strike Global Offensive": ("csgo", "csgo"),
-	"GarrysMod": ("garrysmod", "gmod"),
-	"Half-Life 2": ("hl2", "hl2"),
-	"Infra": ("infra", "infra"),
-	"Left 4 Dead": ("l4d", "l4d"),
-	"Left 4 Dead 2": ("left4dead2", "left4dead2"),
-	"Portal": ("portal", "portal"),
-	"Portal 2": ("portal2", "portal2"),
-	"Team Fortress 2": ("tf", "tf"),
+AVAILABLE_GAMES: dict[str, tuple[str, str, int]] = {
+	# Game definitions. These specify the name of the main game folder, and for every game, the fgd, the second game folder inside, and the Steam app ID.
+	# Game Folder: (folder2, fgdname, appid)
+	"Alien Swarm": ("asw", "swarm", 630),
+	"Black Mesa": ("bms", "blackmesa", 362890),
+	"Counter-Strike Global Offensive": ("csgo", "csgo", 730),
+	"GarrysMod": ("garrysmod", "gmod", 4000),
+	"Half-Life 2": ("hl2", "hl2", 220),
+	"Infra": ("infra", "infra", 251110),
+	"Left 4 Dead": ("l4d", "l4d", 500),
+	"Left 4 Dead 2": ("left4dead2", "left4dead2", 550),
+	"Portal": ("portal", "portal", 400),
+	"Portal 2": ("portal2", "portal2", 620),
+	"Team Fortress 2": ("tf", "tf", 440),
 }
 
 
+class InstallError(Exception):
+	"""Error which stops the installation for a game. Every argument is a line of the message."""
+
+
+logContext = threading.local()
+logContext.game = None
+outputLock = threading.Lock()
+# Records the time spent in every step when using --profile
+profiler = Profiler()
+
+
 def vLog(message: str, end="\n", onlyAppend: bool = False):
-	"""Prints a message if verbose is on"""
+	"""
+	Prints a message if verbose is on. Messages of functions started with `runInBackground()` are only
+	printed when they are joined with `joinBackground()`, so they don't get mixed with the prompts.
+	"""
 
 	if args.verbose:
-		if not onlyAppend:
-			print(message, end=end, flush=True)
+		if not onlyAppend and renderer.interactive:
+			printVerbose(message, end)
+
+		logWriter.write(message + end)
+
 
-		with open("HAInstaller.log", "a", errors="ignore") as f:
-			f.write(message + end)
+def printVerbose(message: str, end: str = "\n"):
+	"""Print a verbose message, or hold it if this is a background thread."""
+
+	held = getattr(logContext, "held", None)
+	if held is not None:
+		held.append((message, end))
+	else:
+		print(message, end=end, flush=True)
 
 
 def msgLogger(
@@ -65,66 +127,59 @@ def msgLogger(
 	@type: Available types: `good, error, loading, warning`
 	"""
 
-	MSG_PREFIX = {
-		"error": f"{Term.color((255, 87, 87))}[ E ]",
-		"good": f"{Term.color((48, 240, 134))}[ √ ]{Term.color((255, 255, 255))}",
-		"loading": f"{Term.color((235, 175, 66))}[...]",
-		"warning": f"{Term.color((92, 160, 2557))}[ ! ]",
-	}
-
 	strs = sep.replace("\n", "\n      ").join(str(item) for item in values)
-	msg = f"{Term.moveHoriz(-9999)}{Term.UNDERLINE}{MSG_PREFIX.get(type, '[   ]')}{Term.NO_UNDERLINE} {strs}{Term.RESET}{Term.CLEAR_RIGHT}"
-
-	if blink:
-		print(f"{Term.UNDERLINE}{msg}{Term.NO_UNDERLINE}", end="", flush=True)
-		sleep(0.25)
-
-	sleep(0.15)
-
-	# progresssbar
-	if type == "error":
-		pbColor = (255, 87, 87)
-	elif type == "good":
-		pbColor = (48, 240, 134)
-	elif type == "loading":
-		pbColor = (235, 175, 66)
-	elif type == "warning":
-		pbColor = (92, 160, 255)
-
-	global progressBar
-	progressBar.colorset |= {
-		"horiz": pbColor,
-		"vert": pbColor,
-		"corner": pbColor,
-		"text": pbColor,
-	}
-	progressBar.draw()
-
-	print(msg, end=end)
-	vLog(
-		f">>> ({type}): {strs}", onlyAppend=True
-	)  # print also to file if verbose is on
+	game = getattr(logContext, "game", None)
+
+	with outputLock:
+		renderer.message(strs, type, game, blink, end)
+		vLog(
+			f">>> ({type}): {f'[{game}] ' if game else ''}{strs}", onlyAppend=True
+		)  # print also to file if verbose is on
+
+
+def nextPhase(phase: str, text: str = None, steps: int = 1):
+	"""Advance the progress bar, and set the phase reported in the output."""
+
+	renderer.phase = phase
+	# The progress events may have moved the bar inside the last phase
+	value = progressBar.prange[0]
+	progressBar.step(value // PHASE_STEPS * PHASE_STEPS + steps * PHASE_STEPS - value, text)
+
+
+def reportProgress(task: ProgressTask):
+	"""Show the progress of a task of the download phase, like the bytes downloaded."""
+
+	with outputLock:
+		renderer.progress(task, progress.fraction)
 
 
 def closeScript(errorlevel: int = 0):
 	"""Closes the script with an errorlevel"""
 
-	runsys("pause > nul")
-	print(Term.BUFFER_OLD, end="")
+	if args.profile:
+		profiler.writeTrace(args.profile)
+		msgLogger(f"Profile: {profiler.summary()}")
+		msgLogger(f"Network: {httpClient.summary()}")
+	else:
+		vLog(f"Network: {httpClient.summary()}")
+
+	if renderer.interactive:
+		runsys("pause > nul")
+	renderer.close()
 	vLog("Script terminated\n\n\n\n", onlyAppend=True)
+	if args.verbose:
+		logWriter.close()
 	exit(errorlevel)
 
 
 def checkUpdates():
 	"""Check if the latest version is not equal to the one that we are using"""
 
-	url = "https://api.github.com/repos/DarviL82/HAInstaller/releases/latest"
 	msgLogger("Checking for new versions", type="loading")
 
 	try:
-		with request.urlopen(url) as data:
-			release = jsonLoads(data.read())
-			version = Version(release["tag_name"])
+		release = fetchJson(UPDATES_URL, MetadataCache(args.cacheDir, args.metadataTtl), httpClient)
+		version = Version(release["tag_name"])
 	except Exception:
 		msgLogger("An error ocurred while checking for updates", type="error")
 		closeScript(1)
@@ -138,6 +193,33 @@ def checkUpdates():
 		msgLogger("Using latest version", type="good")
 
 
+def serveMirror():
+	"""Serve the releases in the cache over HTTP until the script is interrupted, so other computers can use them as a mirror."""
+
+	from mirror import MirrorServer
+
+	try:
+		server = MirrorServer(args.cacheDir, args.host, args.port, args.bufferSize * 1024)
+	except OSError as error:
+		msgLogger(f"Couldn't start the mirror server ({error})", type="error")
+		closeScript(1)
+
+	msgLogger(f"Serving {len(releaseCache.releases())} cached release/s at {server.url}", type="good")
+	if not path.exists(releaseCache.vdfPath):
+		msgLogger("'srctools.vdf' is not cached, so it won't be served", type="warning")
+	msgLogger(f"Use it with '--mirror {server.url}' or the {MIRROR_ENV} environment variable. Press Ctrl+C to stop.")
+
+	try:
+		server.serveForever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.stop()
+
+	msgLogger(f"Mirror stopped after {server.requests} request/s")
+	closeScript(0)
+
+
 def parseArgs():
 	"""Parse the arguments passed to the script"""
 
@@ -160,11 +242,34 @@ def parseArgs():
 		help=f"Arguments for the PostCompiler executable. Default are '{POSTCOMPILER_ARGS}'.",
 		default=POSTCOMPILER_ARGS,
 	)
-	argparser.add_argument(
+	gameGroup = argparser.add_mutually_exclusive_group()
+	gameGroup.add_argument(
 		"-g",
 		"--game",
 		help="The name of the game folder in which the addons will be installed.",
 	)
+	gameGroup.add_argument(
+		"--games",
+		help="Comma separated list of game folders in which the addons will be installed.",
+	)
+	gameGroup.add_argument(
+		"--all",
+		help="Install the addons in all the supported games found.",
+		action="store_true",
+	)
+	argparser.add_argument(
+		"-j",
+		"--jobs",
+		help="Number of threads used to place files and to process several games at the same time. Default is 4.",
+		type=int,
+		default=4,
+	)
+	argparser.add_argument(
+		"-v",
+		"--version",
+		help="The version of HammerAddons to install. It can be 'latest', a version like '2.5.1', or constraints like '>=2.4,<3', and the newest release matching it is used. Default is 'latest'.",
+		default="latest",
+	)
 	argparser.add_argument(
 		"--skipCmdSeq", help="Do not modify the CmdSeq.wc file.", action="store_true"
 	)
@@ -176,35 +281,169 @@ def parseArgs():
 	argparser.add_argument(
 		"--skipDownload", help="Do not download any files.", action="store_true"
 	)
+	argparser.add_argument(
+		"--dryRun",
+		help="Show the changes to CmdSeq.wc, gameinfo.txt and srctools.vdf as a diff, and the files that would be extracted, without writing anything.",
+		action="store_true",
+	)
+	argparser.add_argument(
+		"--incremental",
+		help="Only write the files that changed since the last installation.",
+		action="store_true",
+	)
+	argparser.add_argument(
+		"--linkMode",
+		help="How to place the files in the game folder. 'hardlink' and 'reflink' link the files from the cache"
+		+ " instead of copying them, if it is on the same volume as the game. Default is 'copy'.",
+		choices=LINK_MODES,
+		default="copy",
+	)
 	argparser.add_argument(
 		"--verbose",
 		help="Show more information of all the steps and create a log file",
 		action="store_true",
 	)
+	argparser.add_argument(
+		"--logFlushInterval",
+		help=f"Seconds between writes to the log file. Default is {DEFAULT_FLUSH_INTERVAL}.",
+		type=float,
+		default=DEFAULT_FLUSH_INTERVAL,
+	)
+	argparser.add_argument(
+		"--logMaxSize",
+		help=f"Size in KiB after which the log file is rotated. Default is {DEFAULT_MAX_BYTES // 1024}.",
+		type=int,
+		default=DEFAULT_MAX_BYTES // 1024,
+	)
+	argparser.add_argument(
+		"--rescan",
+		help="Search for Steam libraries and games again, instead of using the cached ones.",
+		action="store_true",
+	)
 	argparser.add_argument(
 		"--ignoreHammer", help="Do not check if Hammer is running.", action="store_true"
 	)
+	argparser.add_argument(
+		"--hammerTimeout",
+		help="Maximum number of seconds to wait for Hammer to be closed. By default it waits forever.",
+		type=float,
+	)
 	argparser.add_argument(
 		"--chkup", help="Check for new versions of the installer.", action="store_true"
 	)
 	argparser.add_argument(
 		"--noPbar", help="Disable the progress bar", action="store_true"
 	)
-	args = argparser.parse_args()
-
-	if args.chkup:
-		checkUpdates()
-		exit()
+	argparser.add_argument(
+		"--output",
+		help="How to show the output. 'json' writes a JSON object per line, without colors or delays, and the progress"
+		+ " of the download with its rate.\nBy default it is 'interactive' if the output is a terminal, and 'json' otherwise.",
+		choices=OUTPUT_MODES,
+		default="auto",
+	)
+	argparser.add_argument(
+		"--bufferSize",
+		help=f"Size in KiB of the buffer used when downloading files. Default is {DEFAULT_BUFFER_SIZE // 1024}.",
+		type=int,
+		default=DEFAULT_BUFFER_SIZE // 1024,
+	)
+	argparser.add_argument(
+		"--connections",
+		help="Maximum number of connections used to download the release at the same time, if the server supports it."
+		+ f" Default is {DEFAULT_CONNECTIONS}.",
+		type=int,
+		default=DEFAULT_CONNECTIONS,
+	)
+	argparser.add_argument(
+		"--sparse",
+		help="Download only the files needed from the release with range requests, instead of the whole archive.\n"
+		+ "The release isn't cached then. If the server doesn't support ranges, the whole archive is downloaded.",
+		action="store_true",
+	)
+	argparser.add_argument(
+		"--timeout",
+		help=f"Seconds to wait for data from the server before retrying a download. Default is {DEFAULT_READ_TIMEOUT:g}.",
+		type=float,
+		default=DEFAULT_READ_TIMEOUT,
+	)
+	argparser.add_argument(
+		"--retries",
+		help=f"Number of times a failed request is retried, waiting longer every time. Default is {DEFAULT_RETRIES}.",
+		type=int,
+		default=DEFAULT_RETRIES,
+	)
+	argparser.add_argument(
+		"--offline",
+		help="Install from the release cache without connecting to the network.",
+		action="store_true",
+	)
+	argparser.add_argument(
+		"--cacheDir",
+		help=f"Folder where downloaded releases are cached. Default is '{DEFAULT_CACHE_DIR}'.",
+		default=DEFAULT_CACHE_DIR,
+	)
+	argparser.add_argument(
+		"--cacheSize",
+		help=f"Maximum size in MiB of the release cache. Default is {DEFAULT_CACHE_SIZE // 1024**2}.",
+		type=int,
+		default=DEFAULT_CACHE_SIZE // 1024**2,
+	)
+	argparser.add_argument(
+		"--metadataTtl",
+		help=f"Seconds during which the cached release information is used without asking GitHub. Default is {DEFAULT_METADATA_TTL}.",
+		type=int,
+		default=DEFAULT_METADATA_TTL,
+	)
+	argparser.add_argument(
+		"--profile",
+		help="Time every step of the installation, and write the timings to the file given as Chrome trace events. Default file is 'HAInstaller.trace.json'.",
+		nargs="?",
+		const="HAInstaller.trace.json",
+		metavar="FILE",
+	)
+	argparser.add_argument(
+		"--mirror",
+		help="Mirror to download the releases and srctools.vdf from before trying GitHub. It can be an HTTP URL or a folder."
+		+ f" Default is the value of the {MIRROR_ENV} environment variable.",
+		default=environ.get(MIRROR_ENV),
+	)
 
+	subparsers = argparser.add_subparsers(dest="command", metavar="COMMAND")
+	serveParser = subparsers.add_parser(
+		"serve-mirror",
+		help="Serve the releases in the cache over HTTP, so other computers can use them with --mirror.",
+	)
+	serveParser.add_argument("--host", help="Address to listen on. By default, all of them.", default="")
+	serveParser.add_argument(
+		"--port",
+		help=f"Port to listen on. Default is {DEFAULT_MIRROR_PORT}.",
+		type=int,
+		default=DEFAULT_MIRROR_PORT,
+	)
+	args = argparser.parse_args()
 
-def getSteamPath() -> tuple[str]:
-	"""
-	Return a tuple with with all the steam libraries that it can find. The first library in the tuple will always be the main Steam directory.
+	if args.bufferSize < 1:
+		argparser.error("the buffer size must be at least 1 KiB")
+	if args.jobs < 1:
+		argparser.error("the number of jobs must be at least 1")
+	if args.connections < 1:
+		argparser.error("the number of connections must be at least 1")
+	if args.timeout <= 0:
+		argparser.error("the timeout must be greater than 0")
+	if args.retries < 0:
+		argparser.error("the number of retries can't be negative")
+	if not args.logFlushInterval > 0:
+		argparser.error("the log flush interval must be greater than 0")
+	if args.logMaxSize < 1:
+		argparser.error("the log size must be at least 1 KiB")
+	try:
+		parseVersionSpec(args.version)
+	except ValueError as error:
+		argparser.error(str(error))
 
-	First checks the registry key for SteamPath, and if it can't find it, the path will be prompted to the user.
-	"""
 
-	msgLogger("Finding Steam", type="loading")
+def findSteamFolder() -> str:
+	"""Return the main Steam directory from the registry. If it can't be found there, the path will be prompted to the user."""
 
 	try:
 		# Read the SteamPath registry key
@@ -212,6 +451,10 @@ def getSteamPath() -> tuple[str]:
 		folder = winreg.QueryValueEx(hkey, "SteamPath")[0]
 		winreg.CloseKey(hkey)
 	except Exception:
+		if not renderer.interactive:
+			msgLogger("Couldn't find the Steam path", type="error")
+			closeScript(1)
+
 		msgLogger(
 			"Couldn't find the Steam path, please specify a directory: ",
 			type="loading",
@@ -224,6 +467,14 @@ def getSteamPath() -> tuple[str]:
 		msgLogger("Try again: ", type="loading", end="")
 		folder = input()
 
+	return folder
+
+
+def findLibraries(folder: str) -> tuple[str]:
+	"""Return a tuple with the main Steam directory `folder`, and all the other libraries listed in its `libraryfolders.vdf` file."""
+
+	from srctools import Property
+
 	steamlibs: list[str] = [folder.lower()]
 
 	# Find other steam libraries (thanks TeamSpen)
@@ -240,7 +491,28 @@ def getSteamPath() -> tuple[str]:
 					steamlibs.append(lib.replace("\\", "/").lower())
 
 	# remove possible duplicates
-	steamlibs = tuple(set(steamlibs))
+	return tuple(set(steamlibs))
+
+
+@profiler.span("steam")
+def getSteamPath() -> tuple[str]:
+	"""
+	Return a tuple with with all the steam libraries that it can find. The first library in the tuple will always be the main Steam directory.
+
+	First checks the registry key for SteamPath, and if it can't find it, the path will be prompted to the user.
+	The libraries found are cached until `libraryfolders.vdf` changes, unless `--rescan` is used.
+	"""
+
+	msgLogger("Finding Steam", type="loading")
+
+	cached = None if args.rescan else discoveryCache.getLibraries()
+	if cached:
+		folder, steamlibs = cached
+		vLog("\tUsing the cached Steam libraries")
+	else:
+		folder = findSteamFolder()
+		steamlibs = findLibraries(folder)
+		discoveryCache.storeLibraries(folder, steamlibs)
 
 	if len(steamlibs) > 1:
 		msgLogger(
@@ -253,52 +525,77 @@ def getSteamPath() -> tuple[str]:
 	return steamlibs
 
 
-def selectGame(steamlibs: tuple) -> tuple[str, str]:
+def findGames(steamlibs: tuple) -> list[FoundGame]:
 	"""
-	Let the user select one of their games.
+	Return a list with all the games that the user has installed and are supported by HammerAddons.
 
-	Returns a tuple containing the name of the game, and the location of the library that it belongs to.
+	The libraries are scanned at the same time, reading their app manifests. Libraries that didn't change
+	since the last run are taken from the discovery cache.
 	"""
 
-	# Populate usingGames with the games that the user has installed and are supported by HammerAddons
-	usingGames: list[tuple[str, str]] = []
+	usingGames: list[FoundGame] = []
+	toScan: list[str] = []
 
 	for lib in steamlibs:
-		common = path.join(lib, "steamapps/common")
-		usingGames.extend(
-			(game, lib)
-			for game in listdir(common)
-			if game in AVAILABLE_GAMES
-			and path.exists(
-				path.join(common, game, AVAILABLE_GAMES[game][0], "gameinfo.txt")
-			)
-		)
+		games = None if args.rescan else discoveryCache.getGames(lib)
+		if games is None:
+			toScan.append(lib)
+		else:
+			vLog(f"\tUsing the cached games of '{lib}'")
+			usingGames.extend(games)
+
+	supported = {game: (values[0], values[2]) for game, values in AVAILABLE_GAMES.items()}
+	for lib, games in scanLibraries(tuple(toScan), supported, args.jobs).items():
+		discoveryCache.storeGames(lib, games)
+		usingGames.extend(games)
+
+	discoveryCache.save()
+
 	if not usingGames:
 		# No supported games found, quitting
 		msgLogger("Couldn't find any game supported by HammerAddons", type="error")
 		closeScript(1)
 
+	return usingGames
+
+
+@profiler.span("select")
+def selectGame(steamlibs: tuple) -> tuple[str, str]:
+	"""
+	Let the user select one of their games.
+
+	Returns a tuple containing the name of the game, and the location of the library that it belongs to.
+	"""
+
+	usingGames = findGames(steamlibs)
+
 	if args.game:
 		# Check the string passed from the game argument
 		if args.game in AVAILABLE_GAMES:
-			for game, lib in usingGames:
-				if args.game == game:
+			for game in usingGames:
+				if args.game == game.name:
 					msgLogger(f"Selected game '{args.game}'", type="good")
-					return game, lib
+					return game.name, game.lib
 
 			msgLogger(f"The game '{args.game}' is not installed", type="error")
 		else:
 			msgLogger(f"The game '{args.game}' is not supported", type="error")
 
+	if not renderer.interactive:
+		msgLogger(
+			"No game selected, use the '--game', '--games' or '--all' arguments",
+			type="error",
+		)
+		closeScript(1)
+
 	# Print a simple select menu with all the available choices
 	msgLogger("Select a game to install HammerAddons", type="loading")
 	for number, game in enumerate(usingGames):
 		if args.verbose:
-			print(
-				f"\t{number + 1}: {game[0]} ('{path.join(game[1], 'steamapps/common/', game[0])}')"
-			)
+			size = f", {game.size / 1024**3:.1f} GiB" if game.size else ""
+			print(f"\t{number + 1}: {game.name} ('{game.path}'{size})")
 		else:
-			print(f"\t{number + 1}: {game[0]}")
+			print(f"\t{number + 1}: {game.name}")
 
 	while True:
 		try:
@@ -308,272 +605,449 @@ def selectGame(steamlibs: tuple) -> tuple[str, str]:
 
 			# The value is correct, so we move the cursor up the same number of lines taken by the menu to drawn, so then we can override it
 			print(Term.moveVert(-len(usingGames) - 1) + Term.CLEAR_DOWN, end="")
-			msgLogger(f"Selected game '{usingGames[usrInput - 1][0]}'", type="good")
-			return tuple(usingGames[usrInput - 1])
+			game = usingGames[usrInput - 1]
+			msgLogger(f"Selected game '{game.name}'", type="good")
+			return game.name, game.lib
 		except (ValueError, IndexError):
 			# If the value isn't valid, we move the terminal cursor up and then clear the line. This is done to not cause ugly spam when typing values
 			print(Term.moveVert(-1) + Term.CLEAR_LINE, end="")
 
 
-def parseCmdSeq():
+@profiler.span("select")
+def selectGames(steamlibs: tuple) -> list[tuple[str, str]]:
+	"""
+	Return the games selected with the `--all` or `--games` arguments.
+
+	Every item is a tuple containing the name of the game, and the location of the library that it belongs to.
+	"""
+
+	usingGames = findGames(steamlibs)
+
+	if args.all:
+		selected = [(game.name, game.lib) for game in usingGames]
+	else:
+		selected = []
+		for name in (name.strip() for name in args.games.split(",")):
+			if name not in AVAILABLE_GAMES:
+				msgLogger(f"The game '{name}' is not supported", type="error")
+				closeScript(1)
+
+			found = [(game.name, game.lib) for game in usingGames if game.name == name]
+			if not found:
+				msgLogger(f"The game '{name}' is not installed", type="error")
+				closeScript(1)
+			selected.extend(found)
+
+	msgLogger(
+		"Selected games:\n\t'" + "'\n\t'".join(game for game, _ in selected) + "'",
+		type="good",
+	)
+	return selected
+
+
+def getGamePath(game: str, lib: str) -> str:
+	"""Return the folder of the game `game` inside the library `lib`."""
+	return path.join(lib, "steamapps/common", game)
+
+
+@profiler.span("cmdseq")
+def parseCmdSeq(game: str, lib: str):
 	"""Read the user's CmdSeq.wc file, and add the postcompiler commands to it. This will also check if there's already a postcompiler command being used."""
 
+	from srctools import cmdseq
+
 	msgLogger("Adding postcompiler compile commands", type="loading")
 
-	gameBin = path.join(commonPath, selectedGame.lower(), "bin/")
+	gameBin = path.join(getGamePath(game, lib), "bin/")
 	cmdSeqPath = path.join(gameBin, "CmdSeq.wc")
 	cmdSeqDefaultPath = path.join(gameBin, "CmdSeqDefault.wc")
 
 	# Postcompiler command definition
-	POSTCOMPILER_CMD: dict[str, str] = {
-		"exe": path.join(gameBin, "postcompiler/postcompiler.exe"),
-		"args": args.args.lower(),
-	}
+	postcompilerCmd = cmdseq.Command(
+		path.join(gameBin, "postcompiler/postcompiler.exe"), args.args.lower()
+	)
 
 	# If the CmdSeq.wc file does not exist, we then check for the file CmdSeqDefault.wc, which has the default commands. Copy it as CmdSeq.wc
+	sourcePath = cmdSeqPath
 	if not path.isfile(cmdSeqPath):
-		if path.isfile(cmdSeqDefaultPath):
-			with open(cmdSeqDefaultPath, "rb") as defCmdFile, open(
-				cmdSeqPath, "wb"
-			) as CmdFile:
-				CmdFile.write(defCmdFile.read())
-		else:
-			msgLogger(
+		if not path.isfile(cmdSeqDefaultPath):
+			raise InstallError(
 				f"Couldn't find the 'CmdSeqDefault.wc' file in the game directory '{gameBin}'.",
 				"Open the Compile dialog (F9) in Hammer to generate the file, then try again.",
-				type="error",
-				sep="\n",
 			)
-			closeScript(1)
+		sourcePath = cmdSeqDefaultPath
 
-	with open(cmdSeqPath, "rb") as cmdfile:
+	with open(sourcePath, "rb") as cmdfile:
 		data = cmdseq.parse(cmdfile)
 
-	# We check for the existence of the bsp command. If found, we append the postcompiler command right after it
-	cmdsAdded = 0  # times we appended a postcompiler command
-	cmdsFound = 0  # times we found VBSP
-	for config in data:
-		foundBsp = False
-		commands = data[config]
-
-		vLog(f"\n\tConfig: '{config}'")
-
-		for index, cmd in enumerate(commands):
-			exeValue = str(cmd.exe).lower()
-			argValue = str(cmd.args).lower()
-
-			vLog(
-				f"\t\tL Command:\n\t\t\tExe:      '{exeValue}'\n\t\t\tArgument: '{argValue}'"
-			)
-
-			if foundBsp:
-				if "postcompiler" not in exeValue:
-					commands.insert(
-						index,
-						cmdseq.Command(
-							POSTCOMPILER_CMD["exe"], POSTCOMPILER_CMD["args"]
-						),
-					)
-					vLog("\t--- Found VBSP, appended command ---")
-					cmdsAdded += 1
-				elif POSTCOMPILER_CMD["args"] != argValue:
-					commands.pop(index)
-					commands.insert(
-						index,
-						cmdseq.Command(
-							POSTCOMPILER_CMD["exe"], POSTCOMPILER_CMD["args"]
-						),
-					)
-					vLog(
-						"\t--- Found postcompiler, re-appended command with new args ---"
-					)
-					cmdsAdded += 1
-				break
-			if exeValue == "$bsp_exe":
-				foundBsp = True
-				cmdsFound += 1
-				continue
+	# Make sure the postcompiler command comes right after the bsp command, with the current args, and only once
+	rules = [
+		cmdseqedit.InsertAfterRule("$bsp_exe", postcompilerCmd, "postcompiler"),
+	]
+	results = cmdseqedit.transformCmdSeq(data, rules)
+
+	cmdsFound = 0  # configs with the bsp command
+	cmdsAdded = 0  # configs changed
+	for result in results:
+		vLog(f"\n\tConfig: '{result.name}': {', '.join(result.results)}")
+		if result.results[0] != "Marker not found":
+			cmdsFound += 1
+		if result.changed:
+			cmdsAdded += 1
+			if args.dryRun:
+				renderer.diff(cmdSeqPath, result.diff)
+			elif args.verbose:
+				vLog(result.diff, end="")
+
+	# Only write the file if something changed, or if it has to be created from the defaults
+	if not args.dryRun and (cmdsAdded > 0 or sourcePath != cmdSeqPath):
+		for result in results:
+			data[result.name] = result.commands
+		with open(cmdSeqPath, "wb") as cmdfile:
+			cmdseq.write(data, cmdfile)
+			profiler.add(bytes=cmdfile.tell(), files=1)
 
 	if cmdsFound < 1:
 		msgLogger("Couldn't find any configuration with commands", type="error")
 	elif cmdsAdded == 0:
 		# No commands were added, no need to modify
 		msgLogger("Found already existing commands", type="warning")
+	elif args.dryRun:
+		msgLogger(f"Would add {cmdsAdded} command/s", type="good")
 	else:
-		with open(cmdSeqPath, "wb") as cmdfile:
-			cmdseq.write(data, cmdfile)
 		msgLogger(f"Added {cmdsAdded} command/s successfully", type="good")
 
 
-def parseGameInfo():
+@profiler.span("gameinfo")
+def parseGameInfo(game: str, lib: str):
 	"""Add the 'Game	Hammer' entry into the Gameinfo file while keeping the old contents."""
 
 	msgLogger("Checking GameInfo.txt", type="loading")
-	gameInfoPath = path.join(commonPath, selectedGame, inGameFolder, "gameinfo.txt")
+	gameInfoPath = path.join(
+		getGamePath(game, lib), AVAILABLE_GAMES[game][0], "gameinfo.txt"
+	)
 
 	if not path.exists(gameInfoPath):
-		msgLogger(f"Couldn't find the '{gameInfoPath}' file", type="error")
-		closeScript(1)
-
-	with open(gameInfoPath, encoding="utf8") as file:
-		data = list(file)
+		raise InstallError(f"Couldn't find the '{gameInfoPath}' file")
 
-	for number, line in reversed(list(enumerate(data))):
-		strip_line = clean_line(line).lower()
-
-		vLog(f"\t{number}: {line}", end="")
+	rule = InsertAfterRule(
+		lambda strip: "|gameinfo_path|" in strip,
+		lambda strip: all(item in strip for item in {"game", "hammer"}),
+		"Game\tHammer",
+	)
+	result = patchFile(gameInfoPath, [rule], args.dryRun)
+	if result.changed and not args.dryRun:
+		profiler.add(bytes=path.getsize(gameInfoPath), files=1)
+
+	if not result.changed:
+		# Hammer is already in there, or there is nowhere to add it
+		vLog(f"\t{rule.result}. Skipping.")
+		msgLogger("No need to modify", type="warning")
+	elif args.dryRun:
+		renderer.diff(gameInfoPath, result.diff)
+		msgLogger("Would add a new entry", type="good")
+	else:
+		vLog(result.diff, end="")
+		vLog("\tFound '|gameinfo_path|'. Added 'Game  Hammer' entry.")
+		msgLogger("Added a new entry", type="good")
 
-		if all(item in strip_line for item in {"game", "hammer"}):
-			# Hammer is already in there, skip
-			vLog("\t^ Found 'Game  Hammer'. Skipping.")
-			msgLogger("No need to modify", type="warning")
-			break
 
-		elif "|gameinfo_path|" in strip_line:
-			# Append Game Hammer right after the |gameinfo_path| entry
-			data.insert(number + 1, f"{getIndent(line)}Game\tHammer\n")
-			with open(gameInfoPath, "w") as file:
-				for line in data:
-					file.write(line)
+def getSources() -> list[ReleaseSource]:
+	"""Return the places to download the releases from, in the order they are tried: the mirror if there is one, then GitHub."""
 
-			vLog("\t^ Found '|gameinfo_path|'. Added 'Game  Hammer' entry.")
-			msgLogger("Added a new entry", type="good")
-			break
+	github = ReleaseSource("GitHub", f"{RELEASES_URL}?per_page=100", VDF_URL, metadataCache, httpClient)
+	return [mirrorSource(args.mirror, httpClient), github] if args.mirror else [github]
 
 
-def getZipUrl(ver: str) -> tuple[str, str]:
+@profiler.span("lookup")
+def getZipUrl(ver: str, source: ReleaseSource) -> tuple[Version, str, int, str]:
 	"""
-	Return a tuple with the version tag, and the url of the zip download page from the version specified. (`(verTag, zipUrl)`)
+	Return a tuple with the version tag, the url of the zip download page, and the size and digest of the zip from the version specified. (`(verTag, zipUrl, size, digest)`)
+
+	- `ver` is a version specifier: `latest`, a version like `2.5.1`, or constraints like `>=2.4,<3`.
+	The newest release matching it is used.
+	- `source` is where the releases are looked up.
 
-	- `ver` is a string containing a version value, or `latest`.
+	The release cache is checked first. If the release is served from the cache, `zipUrl` is `None`.
+	In offline mode, only the cached releases are available.
 	"""
 
-	verS = Version(ver)
+	cached = ReleaseIndex((tag, None) for tag in releaseCache.tags())
 
-	with request.urlopen(RELEASES_URL) as data:
-		data = jsonLoads(data.read())
+	if args.offline:
+		found = cached.best(ver)
+		if found is not None and releaseCache.get(found[0]):
+			return (found[0], None, None, None)
 
-	# Create a dict with all the versionTags: zipUrls
-	# We iterate through every release getting the only values that we need, the "tag_name", and the "browser_download_url"
-	versions: dict[str, str] = {}
+		raise InstallError(
+			f"Version '{ver}' is not cached, cached versions: '"
+			+ "', '".join(map(str, reversed(cached.versions())))
+			+ "'"
+		)
 
-	for release in data:
-		tag = Version(release["tag_name"])
-		url = release["assets"][0]["browser_download_url"]
-		versions[tag] = url
-		vLog(f"\tFound version {tag}\t('{url}')")
+	# A pinned version which is already cached doesn't need to be looked up
+	if isExactSpec(ver):
+		found = cached.best(ver)
+		if found is not None and releaseCache.get(found[0]):
+			vLog(f"\tFound version {found[0]} in the cache")
+			return (found[0], None, None, None)
+
+	# Releases are listed from the newest, so stop asking for more pages once one matches
+	releases: ReleaseIndex[ReleaseInfo] = ReleaseIndex()
+	for page in source.iterReleases():
+		for release in page:
+			releases.add(release.tag, release)
+			vLog(f"\tFound version {release.tag}\t('{release.url}')")
+		if releases.best(ver) is not None:
+			break
 
-	if ver.lower() == "latest":
-		# If ver arg is "latest" we get the first key and value from the versions dict
-		return (tuple(versions.keys())[0], tuple(versions.values())[0])
-	elif verS in versions:
-		# If the stripped ver is a key inside versions, return itself and it's value in the dict
-		return (verS, versions[verS])
-	else:
+	match = releases.best(ver)
+	if match is None:
 		# We didn't succeed, generate an error message and exit
-		msgLogger(
-			f"Version '{ver}' does not exist, available versions: '"
-			+ "', '".join(map(str, versions.keys()))
-			+ "'",
-			type="error",
+		raise InstallError(
+			f"No version matches '{ver}' in {source}, available versions: '"
+			+ "', '".join(map(str, reversed(releases.versions())))
+			+ "'"
 		)
-		closeScript(1)
+	tag, url, size, digest = match[1]
 
+	if releaseCache.get(tag, digest):
+		vLog(f"\tFound version {tag} in the cache")
+		return (tag, None, size, digest)
 
-def downloadAddons():
-	"""Download and unzip all necessary files."""
+	return (tag, url, size, digest)
 
-	gamePath = path.join(commonPath, selectedGame)
+
+def runInBackground(function: Callable, *values) -> Future:
+	"""
+	Call the function in a daemon thread, so it doesn't keep the installer open if it quits early.
+	Returns a future with its result, or the exception it raised. Wait for it with `joinBackground()`.
+	"""
+
+	future = Future()
+	future.set_running_or_notify_cancel()
+	future.heldMessages = []
+
+	def run():
+		logContext.held = future.heldMessages
+		try:
+			future.set_result(function(*values))
+		except BaseException as error:
+			future.set_exception(error)
+
+	threading.Thread(target=run, name=function.__name__, daemon=True).start()
+	return future
+
+
+def joinBackground(future: Future) -> object:
+	"""Wait for a function started with `runInBackground()`, print the verbose messages it held, and return its result."""
 
 	try:
-		msgLogger("Looking up for latest version", type="loading")
+		return future.result()
+	finally:
+		for message, end in future.heldMessages:
+			printVerbose(message, end)
 
-		version, zipUrl = getZipUrl("latest")
 
-		msgLogger(f"Downloading required files of version {version}", type="loading")
+def fetchVdf():
+	"""Download srctools.vdf into the cache, so we can copy it to every game folder."""
 
-		# Download all required files for HammerAddons
-		with request.urlopen(zipUrl) as data, TemporaryFile() as tempfile:
-			vLog(f"\tDownloading '{zipUrl}'... ", end="")
+	if path.exists(releaseCache.vdfPath):
+		return
+	if args.offline:
+		raise FileNotFoundError("'srctools.vdf' is not cached")
 
-			tempfile.write(data.read())
+	makedirs(releaseCache.root, exist_ok=True)
+	# Downloaded next to the cached file and moved over it at the end, so an interrupted download isn't cached
+	tempPath = releaseCache.vdfPath + ".part"
+	for source in sources:
+		try:
+			with profiler.span("download") as span, source.open(source.vdfUrl) as data:
+				vLog(f"\tDownloading '{source.vdfUrl}'... ", end="")
+				try:
+					with open(tempPath, "wb") as file:
+						span.add(bytes=file.write(data.read()), files=1)
+					replace(tempPath, releaseCache.vdfPath)
+				except BaseException:
+					if path.exists(tempPath):
+						remove(tempPath)
+					raise
+				vLog("Done")
+			return
+		except OSError as error:
+			if source is sources[-1]:
+				raise
+			vLog(f"\tCouldn't download 'srctools.vdf' from {source} ({error}), trying the next source")
+
+
+def openRemoteRelease(version: Version, zipUrl: str, source: ReleaseSource, size: int, digest: str):
+	"""
+	Open the zip of the release at `zipUrl` to download only the files needed from it later.
+	Returns a `RemoteFile`, or `None` if the server doesn't support range requests.
+	"""
+
+	from remotezip import RangesNotSupported, RemoteFile
+
+	# Stage the files in the same folder as the cached zip would, if the digest is known
+	name = f"{digest.rpartition(':')[2].lower()}.zip" if digest else f"{version}.zip"
 
-			vLog("Done")
-			msgLogger("Unzipping files", type="loading")
+	try:
+		with profiler.span("download"):
+			remote = RemoteFile(source.client, zipUrl, size, name, args.connections)
+	except RangesNotSupported as error:
+		vLog(f"\t{error}, downloading the whole release")
+		return None
+
+	vLog(f"\tReading the files needed from '{zipUrl}' ({remote.size} bytes)")
+	return remote
 
-			with ZipFile(tempfile) as zipfile, TemporaryDirectory() as tempdir:
-				zipfile.extractall(tempdir)
 
-				# iterate through all files in the tempdir
-				for file_name, file_path in (
-					(f, path.join(tempdir, f)) for f in os.listdir(tempdir)
-				):
-					if (file_name == "win64" and isSysX64) or (
-						file_name == "win32" and not isSysX64
-					):
-						# move the win64/postcompiler folder to the game folder
-						copy_tree(
-							path.join(file_path, "postcompiler"),
-							path.join(gamePath, "bin/postcompiler"),
+def fetchRelease() -> tuple[Version, str, bool]:
+	"""
+	Find the release to install, and download it into the cache along with srctools.vdf. Both downloads run
+	at the same time. Returns a tuple with the version, the path of the cached zip, and whether it was
+	downloaded. (`(version, zipPath, downloaded)`) With `--sparse`, `zipPath` is a `RemoteFile` instead,
+	which reads the zip from the server.
+
+	This doesn't need to know the games, so it runs in the background while they are found and their
+	config files are edited. Messages are left for `downloadAddons()`, and the verbose ones are held until
+	it joins this, so they don't get mixed with the game selection.
+	"""
+
+	from http.client import HTTPException
+
+	vdf = runInBackground(fetchVdf)
+
+	# Every source is tried in order, until one has a matching release which can be downloaded
+	for source in sources:
+		try:
+			vLog(f"\tLooking up for version {args.version} in {source}")
+			version, zipUrl, size, digest = getZipUrl(args.version, source)
+
+			if zipUrl is None:
+				zipPath = releaseCache.get(version)
+				progress.task("download").start(0)
+			else:
+				zipPath = openRemoteRelease(version, zipUrl, source, size, digest) if args.sparse else None
+				if zipPath is None:
+					# Download all required files for HammerAddons into the cache
+					with profiler.span("download") as span:
+						vLog(f"\tDownloading '{zipUrl}'... ", end="")
+						zipPath = releaseCache.fetch(
+							version,
+							zipUrl,
+							source.client,
+							size,
+							digest,
+							args.connections,
+							args.bufferSize * 1024,
+							progress,
 						)
-						vLog(f"\tMoved 'postcompiler' to '{gamePath}/bin/'")
-
-					elif file_name == "hammer":
-						# move the hammer folder to the game folder
-						copy_tree(file_path, path.join(gamePath, "hammer"))
-						vLog(f"\tMoved 'hammer' to '{gamePath}/'")
-
-					elif file_name == "instances" and path.exists(
-						path.join(file_path, inGameFolder)
-					):
-						# move the instances folder to the game folder
-						copy_tree(file_path, path.join(gamePath, "sdk_content/maps"))
-						vLog(f"\tMoved 'instances' to '{gamePath}/sdk_content/maps'")
-
-					elif file_name == f"{AVAILABLE_GAMES[selectedGame][1]}.fgd":
-						# move the fgd file to the game folder
-						shutil.copy(file_path, path.join(gamePath, "bin/"))
-						vLog(f"\tMoved '{file_name}' to '{gamePath}/bin/'")
-
-		# Download srctools.vdf, so we can modify it to have the correct game folder inside.
-		vdfPath = path.join(gamePath, "srctools.vdf")
-		if not path.exists(vdfPath):
-			with request.urlopen(VDF_URL) as data:
-				with open(vdfPath, "wb") as file:
-					vLog(f"\tDownloading '{VDF_URL}'... ", end="")
-
-					file.write(data.read())
-
-					vLog("Done")
+						span.add(bytes=path.getsize(zipPath), files=1)
+						vLog("Done")
+			break
+		except (InstallError, OSError, HTTPException, ValueError) as error:
+			if source is sources[-1] or args.offline:
+				raise
+			vLog(f"\tCouldn't get the release from {source} ({error}), trying the next source")
+
+	joinBackground(vdf)
+	return (version, zipPath, zipUrl is not None)
+
+
+def downloadAddons(games: list[tuple[str, str]], release: Future):
+	"""Wait for the release started by `fetchRelease()`, and unzip all necessary files for every game."""
+
+	from zipfile import ZipFile
+
+	try:
+		msgLogger("Waiting for the release files", type="loading")
+		version, zipPath, downloaded = joinBackground(release)
+		if downloaded:
+			msgLogger(f"Downloaded files of version {version}", type="loading")
 		else:
-			vLog("\tFound 'srctools.vdf'. Skipping.")
-
-		with open(vdfPath) as file:
-			data = list(file)
-
-		# Replace the gameinfo entry to match the game that we are installing
-		for number, line in list(enumerate(data)):
-			strip_line = clean_line(line).lower()
-
-			vLog(f"\t{number}: {line}", end="")
-
-			if '"gameinfo"' in strip_line:
-				if f'"{inGameFolder}/"' in strip_line:
-					# We found it already in there, skip
-					vLog(f"\t^ Found \"'gameinfo' '{inGameFolder}/'\". Skipping.")
-				else:
-					# It isn't there, remove it and add a new one to match the game
-					data.pop(number)
-					data.insert(
-						number, f'{getIndent(line)}"gameinfo" "{inGameFolder}/"\n'
+			msgLogger(f"Using cached files of version {version}", type="loading")
+
+		msgLogger("Unzipping files", type="loading")
+
+		with ZipFile(zipPath) as zipfile:
+			with profiler.span("extraction") as span:
+				members = zipfile.infolist()
+				gamePlans: list[tuple[InstallManifest, list]] = []
+				plans: list[list] = []
+				skipped = 0
+
+				for game, lib in games:
+					gamePath = getGamePath(game, lib)
+					manifest = InstallManifest(gamePath)
+					plan = planExtraction(
+						members,
+						getPlacementRules(
+							gamePath,
+							AVAILABLE_GAMES[game][0],
+							AVAILABLE_GAMES[game][1],
+							isSysX64,
+						),
 					)
-					vLog(f"\t^ Changed line to \"'gameinfo' '{inGameFolder}/'\".")
+					gamePlans.append((manifest, plan))
 
-					with open(vdfPath, "w") as file:
-						for line in data:
-							file.write(line)
-				break
+					if args.incremental:
+						plan, gameSkipped = manifest.filterPlan(plan)
+						skipped += gameSkipped
 
+					for info, dest in plan:
+						vLog(f"\t{'Would extract' if args.dryRun else 'Extracting'} '{info.filename}' to '{dest}'")
+
+					plans.append(plan)
+					span.add(
+						bytes=sum(info.file_size for info, _ in plan), files=len(plan)
+					)
+
+				merged = mergePlans(*plans)
+
+			if args.dryRun:
+				# Nothing is placed, and the manifests are left as they are
+				msgLogger(
+					f"Would extract {sum(map(len, plans))} files"
+					+ f" ({sum(info.file_size for plan in plans for info, _ in plan)} bytes)",
+					type="good",
+				)
+				return
+
+			if not isinstance(zipPath, str):
+				# Only the members in the plan are downloaded from the remote zip
+				with profiler.span("download") as span:
+					zipPath.prefetchMembers(zipfile, [info for info, _ in merged], progress)
+					span.add(bytes=zipPath.bytesFetched, files=len(merged))
+				vLog(
+					f"\tDownloaded {zipPath.bytesFetched} of {zipPath.size} bytes of the release"
+					+ f" in {zipPath.requests} request/s"
+				)
+
+			with profiler.span("placement") as span:
+				written = extractPlan(
+					zipfile,
+					merged,
+					args.bufferSize * 1024,
+					args.jobs,
+					args.linkMode,
+					releaseCache.stagingPath(zipPath if isinstance(zipPath, str) else zipPath.name),
+					progress,
+				)
+
+				for manifest, plan in gamePlans:
+					manifest.record(plan)
+				span.add(bytes=written, files=sum(map(len, plans)))
+
+			vLog(f"\tExtracted {sum(map(len, plans))} files ({written} bytes)")
+			if args.incremental:
+				msgLogger(
+					f"Wrote {written} bytes, skipped {skipped} bytes of unchanged files",
+					type="good",
+				)
+
+	except InstallError:
+		raise
 	except Exception as error:
 		if args.verbose:
 			raise
@@ -585,65 +1059,213 @@ def downloadAddons():
 	msgLogger("Downloaded all files", type="good")
 
 
+@profiler.span("vdf")
+def parseVdf(game: str, lib: str):
+	"""Place the srctools.vdf file in the game folder, and modify it to have the correct game folder inside."""
+
+	from shutil import copyfile
+
+	gamePath = getGamePath(game, lib)
+	inGameFolder = AVAILABLE_GAMES[game][0]
+
+	vdfPath = path.join(gamePath, "srctools.vdf")
+	if not path.exists(vdfPath):
+		if args.dryRun:
+			# Show the changes that would be made to the file that would be copied
+			vLog(f"\tWould copy 'srctools.vdf' to '{gamePath}'")
+			vdfPath = releaseCache.vdfPath
+		else:
+			copyfile(releaseCache.vdfPath, vdfPath)
+			profiler.add(bytes=path.getsize(vdfPath), files=1)
+	else:
+		vLog("\tFound 'srctools.vdf'. Skipping.")
+
+	# Replace the gameinfo entry to match the game that we are installing
+	rule = SetValueRule("gameinfo", f"{inGameFolder}/")
+	result = patchFile(vdfPath, [rule], args.dryRun)
+
+	if not result.changed:
+		vLog(f"\tFound \"'gameinfo' '{inGameFolder}/'\". Skipping.")
+	elif args.dryRun:
+		renderer.diff(vdfPath, result.diff)
+	else:
+		vLog(f"\tChanged line to \"'gameinfo' '{inGameFolder}/'\".")
+
+
+def installGame(game: str, lib: str, steps: list[Callable]) -> tuple[bool, str]:
+	"""
+	Apply the per-game steps given to a game in batch mode. Every step is called with the game and its library.
+
+	Returns a tuple with whether the steps succeeded, and an error message if they didn't.
+	"""
+
+	logContext.game = game
+
+	try:
+		with profiler.span("game", game=game):
+			for step in steps:
+				step(game, lib)
+	except InstallError as error:
+		msgLogger(*error.args, type="error", sep="\n")
+		return (False, " ".join(error.args))
+	except Exception as error:
+		msgLogger(f"An error ocurred ({error})", type="error")
+		return (False, str(error))
+	finally:
+		logContext.game = None
+
+	return (True, "")
+
+
+def batchInstall(games: list[tuple[str, str]], release: Future):
+	"""Install HammerAddons for all the games at once. The release is downloaded and unzipped only once."""
+
+	# The config files are edited while the release is still downloading
+	nextPhase("games", "Processing games")
+	steps = [
+		step
+		for skip, step in ((args.skipCmdSeq, parseCmdSeq), (args.skipGameinfo, parseGameInfo))
+		if not skip
+	]
+	with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+		results = list(executor.map(lambda game: installGame(*game, steps), games))
+
+	nextPhase("download", "Downloading files", 2)
+	# The games that failed already don't get any files
+	remaining = [game for game, (success, _) in zip(games, results) if success]
+	if not args.skipDownload and remaining:
+		downloadAddons(remaining, release)
+
+		# srctools.vdf is placed with the rest of the files, in the games that didn't fail yet
+		with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+			results = list(
+				executor.map(
+					lambda item: installGame(*item[0], [parseVdf]) if item[1][0] else item[1],
+					zip(games, results),
+				)
+			)
+
+	nextPhase("done", "Done!")
+	for (game, _), (success, error) in zip(games, results):
+		if success:
+			msgLogger(f"{game}: Installed", type="good")
+		else:
+			msgLogger(f"{game}: Failed ({error})", type="error")
+
+	failed = sum(not success for success, _ in results)
+	msgLogger(
+		f"Finished installing HammerAddons for {len(games) - failed} of {len(games)} games!",
+		type="warning" if failed else "good",
+		blink=True,
+	)
+	closeScript(1 if failed else 0)
+
+
 def main():
-	global inGameFolder, selectedGame, commonPath, progressBar, isSysX64
+	global progressBar, renderer, logWriter, isSysX64, releaseCache, metadataCache, discoveryCache, httpClient, sources
+	global progress
 
 	runsys("")  # This is required to be able to display Term sequences on Windows 10
 	parseArgs()
+	if args.profile:
+		profiler.start()
 	isSysX64 = "64" in architecture()[0]
+	releaseCache = ReleaseCache(args.cacheDir, args.cacheSize * 1024**2)
+	metadataCache = MetadataCache(args.cacheDir, args.metadataTtl)
+	discoveryCache = DiscoveryCache(args.cacheDir)
+	httpClient = HttpClient(
+		min(DEFAULT_CONNECT_TIMEOUT, args.timeout), args.timeout, args.retries, userAgent=f"HAInstaller/{VERSION}"
+	)
+	sources = getSources()
+	if args.verbose:
+		logWriter = BufferedLogWriter(
+			"HAInstaller.log", args.logFlushInterval, args.logMaxSize * 1024
+		)
 
-	progressBar = pbar.PBar(prange=(0, 6), position=(23, 3), text="Preparing...")
-	progressBar.enabled = not args.noPbar and not args.verbose
+	progressBar = pbar.PBar(prange=(0, 6 * PHASE_STEPS), position=(23, 3), text="Preparing...")
+	progressBar.enabled = not args.noPbar and not args.verbose and not args.chkup and not args.command
+	renderer = getRenderer(args.output, progressBar)
+	progress = Progress(reportProgress)
 
-	print(
-		Term.BUFFER_NEW
-		+ Term.CURSOR_HOME
-		+ Term.formatStr("<#0ff>-TeamSpen's Hammer Addons Installer \- v", False)
+	if args.chkup:
+		checkUpdates()
+		exit()
+	if args.command == "serve-mirror":
+		serveMirror()
+
+	renderer.start(
+		Term.formatStr("<#0ff>-TeamSpen's Hammer Addons Installer \- v", False)
 		+ f"{VERSION}{Term.RESET}"
-		+ (Term.margin(5) + "\n\n\n\n" if progressBar.enabled else "")
+		if renderer.interactive
+		else f"TeamSpen's Hammer Addons Installer - v{VERSION}"
 	)
 
-	progressBar.draw()
+	# The release doesn't depend on the games, so start looking for it and downloading it right away
+	release = None if args.skipDownload else runInBackground(fetchRelease)
 
 	try:
+		renderer.phase = "steam"
 		steamlibs = getSteamPath()
 
-		progressBar.step()
+		nextPhase("select")
 
-		selectedGame, steamPath = selectGame(steamlibs)
-		commonPath = path.join(steamPath, "steamapps/common")
-		inGameFolder = AVAILABLE_GAMES[selectedGame][0]
+		if args.all or args.games:
+			games = selectGames(steamlibs)
+		else:
+			games = [selectGame(steamlibs)]
+
+		nextPhase("hammer")
+
+		with profiler.span("hammer"):
+			if not args.ignoreHammer:
+				# We check if Hammer is open. If it is, we wait until it gets closed to continue.
+				if isProcess("hammer.exe"):
+					msgLogger(
+						"Hammer is running, please close it before continuing.",
+						type="error",
+						blink=True,
+					)
+					if not waitForProcessExit("hammer.exe", args.hammerTimeout):
+						msgLogger("Hammer is still running, quitting", type="error")
+						closeScript(1)
+					msgLogger("Hammer was closed", type="good")
 
-		progressBar.step()
+		if len(games) > 1:
+			batchInstall(games, release)
 
-		if not args.ignoreHammer:
-			# We check continuosly if Hammer is open. Once it is closed, we continue.
-			while isProcess("hammer.exe"):
-				msgLogger(
-					"Hammer is running, please close it before continuing. Press any key to retry.",
-					type="error",
-					blink=True,
-				)
-				runsys("pause > nul")
-				print(Term.moveVert(-1), end="")
+		selectedGame, steamPath = games[0]
 
-		progressBar.step(text="Processing CmdSeq")
+		nextPhase("cmdseq", "Processing CmdSeq")
 		if not args.skipCmdSeq:
-			parseCmdSeq()
+			parseCmdSeq(selectedGame, steamPath)
 
-		progressBar.step(text="Processing Gameinfo")
+		nextPhase("gameinfo", "Processing Gameinfo")
 		if not args.skipGameinfo:
-			parseGameInfo()
+			parseGameInfo(selectedGame, steamPath)
 
-		progressBar.step(text="Downloading files")
+		nextPhase("download", "Downloading files")
 		if not args.skipDownload:
-			downloadAddons()
+			downloadAddons(games, release)
+			try:
+				parseVdf(selectedGame, steamPath)
+			except Exception as error:
+				if args.verbose:
+					raise
+				msgLogger(
+					f"An error ocurred while modifying 'srctools.vdf' ({error})",
+					type="error",
+				)
+				closeScript(1)
+
+	except InstallError as error:
+		msgLogger(*error.args, type="error", sep="\n")
+		closeScript(1)
 
 	except KeyboardInterrupt:
 		msgLogger("Installation interrupted", type="error")
 		closeScript(1)
 
-	progressBar.step(text="Done!")
+	nextPhase("done", "Done!")
 	msgLogger(
 		f"Finished installing HammerAddons for {selectedGame}!", type="good", blink=True
 	)
@@ -0,0 +1,236 @@
+from json import loads as jsonLoads, dumps as jsonDumps
+from os import path, environ, makedirs, remove, replace
+from time import time
+from typing import TYPE_CHECKING, Optional
+
+from download import DEFAULT_CONNECTIONS, downloadFile
+from network import DEFAULT_BUFFER_SIZE, HttpClient
+from utils import Version
+
+if TYPE_CHECKING:
+	from progress import Progress
+
+
+__all__ = [
+	"DEFAULT_CACHE_DIR",
+	"DEFAULT_CACHE_SIZE",
+	"DEFAULT_METADATA_TTL",
+	"ReleaseCache",
+	"MetadataCache",
+]
+
+
+DEFAULT_CACHE_DIR = path.join(
+	environ.get("LOCALAPPDATA", path.expanduser("~/.cache")), "HAInstaller"
+)
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+DEFAULT_METADATA_TTL = 10 * 60
+
+
+class ReleaseCache:
+	"""
+	On-disk cache of release archives.
+
+	Archives are stored once by the SHA-256 digest of their contents, and an index maps every release tag
+	to its archive. When the archives take more space than `maxSize`, the least recently used releases are
+	removed.
+	"""
+
+	def __init__(self, root: str = DEFAULT_CACHE_DIR, maxSize: int = DEFAULT_CACHE_SIZE) -> None:
+		self.root = root
+		self.maxSize = maxSize
+		self._objects = path.join(root, "objects")
+		self._indexPath = path.join(root, "index.json")
+		self._index: dict[str, dict] = self._readIndex()
+
+	@property
+	def vdfPath(self) -> str:
+		"""Location of the cached `srctools.vdf` file."""
+		return path.join(self.root, "srctools.vdf")
+
+	def _readIndex(self) -> dict[str, dict]:
+		try:
+			with open(self._indexPath) as file:
+				return jsonLoads(file.read())
+		except (OSError, ValueError):
+			return {}
+
+	def _writeIndex(self):
+		makedirs(self.root, exist_ok=True)
+		tempPath = self._indexPath + ".tmp"
+		with open(tempPath, "w") as file:
+			file.write(jsonDumps(self._index, indent=1))
+		replace(tempPath, self._indexPath)
+
+	def _objectPath(self, digest: str) -> str:
+		return path.join(self._objects, f"{digest}.zip")
+
+	def stagingPath(self, zipPath: str) -> str:
+		"""Return the folder where the contents of the cached archive at `zipPath` can be extracted."""
+		return path.join(self.root, "staging", path.splitext(path.basename(zipPath))[0])
+
+	@staticmethod
+	def _stripDigest(digest: Optional[str]) -> Optional[str]:
+		"""Remove the algorithm prefix from digests like `sha256:abc...`"""
+		if digest is None:
+			return None
+		algorithm, _, value = digest.rpartition(":")
+		return value.lower() if algorithm in {"", "sha256"} else None
+
+	def tags(self) -> list[Version]:
+		"""Return the versions of all the cached releases."""
+		return [Version(tag) for tag in self._index]
+
+	def releases(self) -> list[tuple[Version, str, int, str]]:
+		"""
+		Return the version, archive path, size and SHA-256 digest of every cached release whose archive is
+		still there. Unlike `get()`, this doesn't mark them as used.
+		"""
+
+		return [
+			(Version(tag), self._objectPath(entry["digest"]), entry["size"], entry["digest"])
+			for tag, entry in self._index.items()
+			if path.isfile(self._objectPath(entry["digest"]))
+		]
+
+	def get(self, tag: Version, digest: str = None) -> Optional[str]:
+		"""
+		Return the path of the cached archive of the release `tag`, or `None` if it isn't cached.
+
+		- `digest` is the expected digest of the archive, if known. If the cached archive has a different one, it is ignored.
+		"""
+
+		entry = self._index.get(str(tag))
+		if entry is None:
+			return None
+
+		digest = self._stripDigest(digest)
+		objectPath = self._objectPath(entry["digest"])
+		if (digest and digest != entry["digest"]) or not path.isfile(objectPath):
+			return None
+
+		entry["lastUsed"] = time()
+		self._writeIndex()
+		return objectPath
+
+	def fetch(
+		self,
+		tag: Version,
+		url: str,
+		client: HttpClient,
+		size: int = None,
+		digest: str = None,
+		connections: int = DEFAULT_CONNECTIONS,
+		bufferSize: int = DEFAULT_BUFFER_SIZE,
+		progress: "Progress" = None,
+	) -> str:
+		"""
+		Download the archive at `url` into the cache as the release `tag` with `downloadFile()`, and return the
+		path of the cached archive. An interrupted download of the same archive is resumed.
+
+		- `size` and `digest` are the expected size and digest of the archive. If the downloaded data doesn't
+		match them, `ValueError` is raised.
+		- `progress` is a `Progress` where the bytes downloaded are counted.
+		"""
+
+		partialPath = path.join(self.root, "partial", f"{tag}.zip")
+		size, actualDigest = downloadFile(
+			client, url, partialPath, connections, size, self._stripDigest(digest), bufferSize, progress
+		)
+		return self._add(tag, partialPath, size, actualDigest)
+
+	def _add(self, tag: Version, filePath: str, size: int, digest: str) -> str:
+		"""Move the archive at `filePath` into the cache as the release `tag`, and return its new path."""
+
+		makedirs(self._objects, exist_ok=True)
+		objectPath = self._objectPath(digest)
+		replace(filePath, objectPath)
+
+		self._index[str(tag)] = {
+			"digest": digest,
+			"size": size,
+			"lastUsed": time(),
+		}
+		self._evict(keep=str(tag))
+		self._writeIndex()
+
+		return objectPath
+
+	def _evict(self, keep: str):
+		"""Remove the least recently used releases until the cache fits in `maxSize`. The release `keep` is never removed."""
+
+		from shutil import rmtree
+
+		def totalSize() -> int:
+			return sum(
+				{entry["digest"]: entry["size"] for entry in self._index.values()}.values()
+			)
+
+		for tag, entry in sorted(self._index.items(), key=lambda item: item[1]["lastUsed"]):
+			if totalSize() <= self.maxSize:
+				break
+			if tag == keep:
+				continue
+
+			del self._index[tag]
+			if not any(other["digest"] == entry["digest"] for other in self._index.values()):
+				objectPath = self._objectPath(entry["digest"])
+				rmtree(self.stagingPath(objectPath), ignore_errors=True)
+				try:
+					remove(objectPath)
+				except FileNotFoundError:
+					pass
+
+
+class MetadataCache:
+	"""
+	Persistent cache of JSON API responses, along with the `ETag` and `Last-Modified` values sent with them.
+
+	Entries younger than `ttl` seconds are considered fresh, and can be used without asking the server.
+	"""
+
+	def __init__(self, root: str = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_METADATA_TTL) -> None:
+		self.root = root
+		self.ttl = ttl
+		self._path = path.join(root, "metadata.json")
+		try:
+			with open(self._path) as file:
+				self._entries: dict[str, dict] = jsonLoads(file.read())
+		except (OSError, ValueError):
+			self._entries = {}
+
+	def _write(self):
+		makedirs(self.root, exist_ok=True)
+		tempPath = self._path + ".tmp"
+		with open(tempPath, "w") as file:
+			file.write(jsonDumps(self._entries))
+		replace(tempPath, self._path)
+
+	def get(self, url: str) -> Optional[dict]:
+		"""Return the entry of `url` (`data`, `etag`, `lastModified`, `next` and `fetched` keys), or `None` if there is none."""
+		return self._entries.get(url)
+
+	def isFresh(self, url: str) -> bool:
+		"""Return `True` if the entry of `url` was fetched less than `ttl` seconds ago."""
+		entry = self._entries.get(url)
+		return entry is not None and time() - entry["fetched"] < self.ttl
+
+	def store(
+		self, url: str, data: object, etag: str = None, lastModified: str = None, nextUrl: str = None
+	):
+		"""Save the response `data` of `url` with its validators, and the URL of the next page if it is paginated."""
+
+		self._entries[url] = {
+			"data": data,
+			"etag": etag,
+			"lastModified": lastModified,
+			"next": nextUrl,
+			"fetched": time(),
+		}
+		self._write()
+
+	def touch(self, url: str):
+		"""Mark the entry of `url` as fetched now, after the server confirmed that it didn't change."""
+
+		self._entries[url]["fetched"] = time()
+		self._write()
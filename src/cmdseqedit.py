@@ -0,0 +1,148 @@
+import difflib
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+	from srctools.cmdseq import Command
+
+
+__all__ = [
+	"CommandRule",
+	"InsertAfterRule",
+	"ConfigResult",
+	"transformCmdSeq",
+]
+
+
+class CommandRule:
+	"""
+	Base class for the rules applied by `transformCmdSeq()`.
+
+	`apply()` gets the commands of a config, and returns its new commands. It returns the same list when the
+	config doesn't need any change, and never modifies it.
+	"""
+
+	# Message describing what the rule did to the last config, for logging
+	result = ""
+
+	def apply(self, commands: list["Command"]) -> list["Command"]:
+		return commands
+
+
+class InsertAfterRule(CommandRule):
+	"""
+	Make sure that `command` comes right after the first command with the executable `after`, and that it is
+	the only command whose executable contains `match`.
+
+	If the command after `after` matches, it is kept, or replaced if it has different arguments. Every other
+	matching command is removed. Configs without `after` are left as they are.
+	"""
+
+	def __init__(self, after: str, command: "Command", match: str) -> None:
+		self.after = after.lower()
+		self.command = command
+		self.args = command.args.lower()
+		self.match = match.lower()
+		self._marker = f"\0{self.after}\0"
+
+	def apply(self, commands: list["Command"]) -> list["Command"]:
+		# The executables are searched all at once, instead of one command at a time
+		try:
+			joined = "\0" + "\0".join([cmd.exe for cmd in commands]).lower() + "\0"
+		except TypeError:
+			# Special commands, which aren't strings
+			joined = "\0" + "\0".join([str(cmd.exe) for cmd in commands]).lower() + "\0"
+
+		start = joined.find(self._marker) + len(self._marker)
+		if start < len(self._marker):
+			self.result = "Marker not found"
+			return commands
+
+		# The command after `after`, if any
+		index = joined.count("\0", 0, start) - 1
+		followingExe = joined[start : joined.find("\0", start)]
+		if self.match not in followingExe:
+			self.result = "Inserted"
+			placed = self.command
+		elif commands[index].args.lower() != self.args:
+			self.result = "Updated"
+			placed = self.command
+		else:
+			self.result = "Already present"
+			placed = commands[index]
+
+		if joined.count(self.match) != followingExe.count(self.match):
+			self.result += ", removed duplicates"
+			return (
+				[cmd for cmd in commands[:index] if self.match not in str(cmd.exe).lower()]
+				+ [placed]
+				+ [cmd for cmd in commands[index:] if self.match not in str(cmd.exe).lower()]
+			)
+
+		if self.result == "Already present":
+			return commands
+		newCommands = commands.copy()
+		if self.result == "Inserted":
+			newCommands.insert(index, self.command)
+		else:
+			newCommands[index] = self.command
+		return newCommands
+
+
+def _describe(cmd: "Command") -> str:
+	return f"{cmd.exe} {cmd.args}\n"
+
+
+class ConfigResult(NamedTuple):
+	"""Result of transforming a single config."""
+
+	name: str
+	oldCommands: list["Command"]
+	commands: list["Command"]
+	changed: bool
+	# The `result` of every rule, in order
+	results: tuple[str, ...]
+
+	@property
+	def diff(self) -> str:
+		"""The changes made to the config, as a unified diff. Only built when asked for."""
+
+		if not self.changed:
+			return ""
+
+		return "".join(
+			difflib.unified_diff(
+				[_describe(cmd) for cmd in self.oldCommands],
+				[_describe(cmd) for cmd in self.commands],
+				self.name,
+				self.name,
+			)
+		)
+
+
+def transformCmdSeq(
+	data: dict[str, list["Command"]], rules: list[CommandRule]
+) -> list[ConfigResult]:
+	"""
+	Apply the rules in order to every config of a parsed CmdSeq file. The data is not modified.
+
+	Returns a result for every config, with its new commands and whether they are different from the old ones.
+	"""
+
+	results: list[ConfigResult] = []
+
+	for name, commands in data.items():
+		newCommands = commands
+		for rule in rules:
+			newCommands = rule.apply(newCommands)
+
+		results.append(
+			ConfigResult(
+				name,
+				commands,
+				newCommands,
+				newCommands is not commands and newCommands != commands,
+				tuple([rule.result for rule in rules]),
+			)
+		)
+
+	return results
@@ -0,0 +1,206 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from json import loads as jsonLoads, dumps as jsonDumps
+from os import path, makedirs, replace, stat
+from typing import NamedTuple, Optional
+
+
+__all__ = ["DiscoveryCache", "FoundGame", "getMtime", "scanLibrary", "scanLibraries"]
+
+
+class FoundGame(NamedTuple):
+	"""A supported game installed in a Steam library."""
+
+	name: str
+	lib: str
+	path: str
+	size: Optional[int]
+	appId: Optional[int]
+
+
+def getMtime(filePath: str) -> Optional[int]:
+	"""Return the modification time of a file or folder in nanoseconds, or `None` if it doesn't exist."""
+
+	try:
+		return stat(filePath).st_mtime_ns
+	except OSError:
+		return None
+
+
+class DiscoveryCache:
+	"""
+	Persistent cache of the Steam libraries and supported games found on the system.
+
+	The libraries are valid while the modification time of `libraryfolders.vdf` doesn't change, and the games
+	of a library while the modification times of its `steamapps` and `steamapps/common` folders don't change
+	(A game folder or app manifest being added or removed changes them).
+	"""
+
+	def __init__(self, root: str) -> None:
+		self.root = root
+		self._path = path.join(root, "discovery.json")
+		self._changed = False
+		try:
+			with open(self._path) as file:
+				self._data: dict = jsonLoads(file.read())
+		except (OSError, ValueError):
+			self._data = {}
+
+	@staticmethod
+	def _vdfPath(steamPath: str) -> str:
+		return path.join(steamPath, "steamapps/libraryfolders.vdf")
+
+	def getLibraries(self) -> Optional[tuple[str, tuple[str]]]:
+		"""Return the cached Steam path and libraries, or `None` if they aren't cached or are outdated."""
+
+		steam = self._data.get("steam")
+		if (
+			not steam
+			or not path.isdir(steam["path"])
+			or getMtime(self._vdfPath(steam["path"])) != steam["vdfMtime"]
+		):
+			return None
+
+		return steam["path"], tuple(steam["libraries"])
+
+	def storeLibraries(self, steamPath: str, libraries: tuple[str]):
+		"""Save the Steam path and the libraries found in it."""
+
+		self._data["steam"] = {
+			"path": steamPath,
+			"vdfMtime": getMtime(self._vdfPath(steamPath)),
+			"libraries": list(libraries),
+		}
+		self._changed = True
+
+	@staticmethod
+	def _libMtimes(lib: str) -> list[Optional[int]]:
+		return [getMtime(path.join(lib, "steamapps")), getMtime(path.join(lib, "steamapps/common"))]
+
+	def getGames(self, lib: str) -> Optional[list[FoundGame]]:
+		"""Return the cached games of the library `lib`, or `None` if they aren't cached or are outdated."""
+
+		entry = self._data.get("games", {}).get(lib)
+		if not entry or self._libMtimes(lib) != entry["mtime"]:
+			return None
+
+		return [FoundGame(*game) for game in entry["games"]]
+
+	def storeGames(self, lib: str, games: list[FoundGame]):
+		"""Save the games found in the library `lib`."""
+
+		self._data.setdefault("games", {})[lib] = {
+			"mtime": self._libMtimes(lib),
+			"games": [list(game) for game in games],
+		}
+		self._changed = True
+
+	def save(self):
+		"""Write the cache to disk, if anything changed."""
+
+		if not self._changed:
+			return
+
+		makedirs(self.root, exist_ok=True)
+		tempPath = self._path + ".tmp"
+		with open(tempPath, "w") as file:
+			file.write(jsonDumps(self._data, indent=1))
+		replace(tempPath, self._path)
+		self._changed = False
+
+
+_KEYVALUE = re.compile(r'^\s*"([^"]+)"\s+"([^"]*)"')
+
+
+def _readManifest(filePath: str) -> dict[str, str]:
+	"""
+	Return the top level values of an app manifest, with lowercase keys. Only `"key" "value"` lines are
+	read, which is much faster than parsing the whole KeyValues tree.
+	"""
+
+	values: dict[str, str] = {}
+	with open(filePath, encoding="utf8", errors="ignore") as file:
+		for line in file:
+			match = _KEYVALUE.match(line)
+			if match:
+				values.setdefault(match[1].lower(), match[2])
+	return values
+
+
+def _isGame(gamePath: str, inGameFolder: str) -> bool:
+	return path.isfile(path.join(gamePath, inGameFolder, "gameinfo.txt"))
+
+
+def scanLibrary(lib: str, supported: dict[str, tuple[str, int]]) -> list[FoundGame]:
+	"""
+	Return the supported games installed in the library `lib`.
+
+	- `supported` maps the folder name of every supported game to a tuple with its inner game folder and app ID.
+
+	The `appmanifest_*.acf` files of the library are used to find the games by app ID, only parsing the
+	manifests of supported games. If the library has no manifests, the `common` folder is listed instead.
+	"""
+
+	steamapps = path.join(lib, "steamapps")
+	common = path.join(steamapps, "common")
+	byAppId = {appId: (name, folder) for name, (folder, appId) in supported.items()}
+	games: list[FoundGame] = []
+
+	try:
+		entries = [
+			name
+			for name in os.listdir(steamapps)
+			if name.startswith("appmanifest_") and name.endswith(".acf")
+		]
+	except OSError:
+		entries = []
+
+	if entries:
+		for fileName in entries:
+			appId = fileName[len("appmanifest_") : -len(".acf")]
+			if not appId.isdigit() or int(appId) not in byAppId:
+				continue
+
+			name, folder = byAppId[int(appId)]
+			try:
+				values = _readManifest(path.join(steamapps, fileName))
+				installDir = values.get("installdir", name)
+				size = int(values.get("sizeondisk", 0)) or None
+			except (OSError, ValueError):
+				# Broken manifest, trust the folder name
+				installDir, size = name, None
+
+			# Game folders are referred to by their supported name in the rest of the installer
+			if installDir.lower() != name.lower():
+				continue
+
+			gamePath = path.join(common, installDir)
+			if _isGame(gamePath, folder):
+				games.append(FoundGame(name, lib, gamePath, size, int(appId)))
+
+		return games
+
+	try:
+		with os.scandir(common) as it:
+			for entry in it:
+				if entry.name in supported and entry.is_dir():
+					folder, appId = supported[entry.name]
+					if _isGame(entry.path, folder):
+						games.append(FoundGame(entry.name, lib, entry.path, None, appId))
+	except OSError:
+		pass
+
+	return games
+
+
+def scanLibraries(
+	libs: tuple[str], supported: dict[str, tuple[str, int]], workers: int = 8
+) -> dict[str, list[FoundGame]]:
+	"""Scan all the libraries at the same time with `scanLibrary()`. Returns a dict with the games of every library."""
+
+	if not libs:
+		return {}
+
+	with ThreadPoolExecutor(max_workers=min(workers, len(libs))) as executor:
+		return dict(zip(libs, executor.map(lambda lib: scanLibrary(lib, supported), libs)))
@@ -0,0 +1,307 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from json import loads as jsonLoads, dumps as jsonDumps
+from os import path, makedirs, remove, replace
+from time import monotonic
+from typing import TYPE_CHECKING, Optional
+
+from network import DEFAULT_BUFFER_SIZE, HttpClient, HttpError, HttpResponse, isTransient, parseContentRange
+
+if TYPE_CHECKING:
+	from progress import Progress, ProgressTask
+
+
+__all__ = ["DEFAULT_CONNECTIONS", "MIN_SEGMENT_SIZE", "downloadFile"]
+
+
+DEFAULT_CONNECTIONS = 4
+# Files are not split in segments smaller than this, since every segment costs a request
+MIN_SEGMENT_SIZE = 1024 * 1024
+
+# Seconds between saves of the progress of a download
+_SAVE_INTERVAL = 0.5
+
+
+class _FileChanged(Exception):
+	"""The file on the server is not the one a partial download was started with."""
+
+
+def _splitSegments(size: int, connections: int) -> list[list[int]]:
+	"""Split `size` bytes in up to `connections` segments of `[start, end, done]`, with `end` included."""
+
+	if not size:
+		return []
+	count = max(1, min(connections, size // MIN_SEGMENT_SIZE))
+	step = -(-size // count)
+	return [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+
+
+class _RangedDownload:
+	"""
+	A download split in segments, written to `<filePath>.part`. The progress of every segment is saved to
+	`<filePath>.part.json`, so the download can be resumed later.
+	"""
+
+	def __init__(
+		self, client: HttpClient, url: str, filePath: str, bufferSize: int, task: Optional["ProgressTask"]
+	) -> None:
+		self.client = client
+		self.url = url
+		self.partPath = filePath + ".part"
+		self.statePath = self.partPath + ".json"
+		self.bufferSize = bufferSize
+		self.task = task
+		self.state: dict = {}
+		self._lock = threading.Lock()
+		self._lastSave = 0.0
+		self._failed = threading.Event()
+
+	def load(self, digest: Optional[str]) -> bool:
+		"""Load the saved progress of a previous download of the same file. Returns whether there was one."""
+
+		try:
+			with open(self.statePath) as file:
+				state = jsonLoads(file.read())
+			size = path.getsize(self.partPath)
+		except (OSError, ValueError):
+			return False
+
+		if state.get("url") != self.url or state.get("digest") != digest or size != state.get("size"):
+			return False
+		self.state = state
+		return True
+
+	def start(self, response: HttpResponse, total: int, digest: Optional[str], connections: int):
+		"""Start a new download, creating the file with its final size."""
+
+		makedirs(path.dirname(self.partPath) or ".", exist_ok=True)
+		with open(self.partPath, "wb") as file:
+			file.truncate(total)
+
+		self.state = {
+			"url": self.url,
+			"size": total,
+			"etag": response.headers.get("ETag"),
+			"digest": digest,
+			"segments": _splitSegments(total, connections),
+		}
+		self.save(force=True)
+
+	def save(self, force: bool = False):
+		with self._lock:
+			now = monotonic()
+			if not force and now - self._lastSave < _SAVE_INTERVAL:
+				return
+			self._lastSave = now
+			tempPath = self.statePath + ".tmp"
+			with open(tempPath, "w") as file:
+				file.write(jsonDumps(self.state))
+			replace(tempPath, self.statePath)
+
+	def discard(self):
+		for filePath in (self.partPath, self.statePath):
+			try:
+				remove(filePath)
+			except FileNotFoundError:
+				pass
+
+	def _openSegment(self, segment: list[int]) -> HttpResponse:
+		start, end, done = segment
+		headers = {"Range": f"bytes={start + done}-{end}"}
+		if self.state["etag"]:
+			headers["If-Range"] = self.state["etag"]
+
+		response = self.client.open(self.url, headers)
+		contentRange = parseContentRange(response.headers.get("Content-Range"))
+		if response.status != 206 or contentRange is None or contentRange[0] != start + done:
+			response.close()
+			raise _FileChanged(f"the server didn't send the range requested of '{self.url}'")
+		return response
+
+	def fetchSegment(self, segment: list[int], response: HttpResponse = None):
+		"""
+		Download the rest of the segment, starting with the response given if any. Transient errors are
+		retried, as long as every attempt makes some progress or the client has retries left.
+		"""
+
+		buffer = bytearray(self.bufferSize)
+		view = memoryview(buffer)
+		failures = 0
+
+		with open(self.partPath, "r+b") as file:
+			while segment[2] < segment[1] - segment[0] + 1:
+				if self._failed.is_set():
+					return
+				try:
+					if response is None:
+						response = self._openSegment(segment)
+					file.seek(segment[0] + segment[2])
+
+					with response:
+						while (remaining := segment[1] - segment[0] + 1 - segment[2]) > 0:
+							read = response.readinto(view[: min(remaining, len(buffer))])
+							if not read:
+								break
+							file.write(view[:read])
+							# The data has to reach the file before the progress is saved
+							file.flush()
+							segment[2] += read
+							failures = 0
+							if self.task is not None:
+								self.task.add(read)
+							self.save()
+					response = None
+				except Exception as error:
+					response = None
+					if isinstance(error, _FileChanged) or not isTransient(error) or failures >= self.client.retries:
+						self._failed.set()
+						raise
+					self.client.waitBeforeRetry(failures)
+					failures += 1
+
+	def run(self, firstResponse: HttpResponse = None):
+		"""Download all the unfinished segments at the same time. `firstResponse` is the body from the start of the file."""
+
+		pending = [segment for segment in self.state["segments"] if segment[2] < segment[1] - segment[0] + 1]
+		if firstResponse is not None and pending and pending[0][0] != 0:
+			firstResponse.close()
+			firstResponse = None
+
+		self._failed.clear()
+		try:
+			with ThreadPoolExecutor(max(1, len(pending)), thread_name_prefix="download") as pool:
+				futures = [
+					pool.submit(self.fetchSegment, segment, firstResponse if number == 0 else None)
+					for number, segment in enumerate(pending)
+				]
+				for future in futures:
+					future.result()
+		finally:
+			if firstResponse is not None:
+				firstResponse.close()
+			self.save(force=True)
+
+	def verify(self, size: Optional[int], digest: Optional[str]) -> str:
+		"""Check the size and SHA-256 digest of the whole file, and return its digest. Raises `ValueError` if they don't match."""
+
+		actualSize = path.getsize(self.partPath)
+		if actualSize != self.state["size"] or (size is not None and actualSize != size):
+			self.discard()
+			raise ValueError(f"size mismatch for '{self.url}' ({actualSize} != {size or self.state['size']})")
+
+		sha256 = hashlib.sha256()
+		buffer = bytearray(self.bufferSize)
+		with open(self.partPath, "rb") as file:
+			while read := file.readinto(buffer):
+				sha256.update(memoryview(buffer)[:read])
+
+		actualDigest = sha256.hexdigest()
+		if digest and actualDigest != digest:
+			self.discard()
+			raise ValueError(f"digest mismatch for '{self.url}' ({actualDigest} != {digest})")
+		return actualDigest
+
+
+def _streamDownload(
+	response: HttpResponse,
+	partPath: str,
+	size: Optional[int],
+	digest: Optional[str],
+	bufferSize: int,
+	task: Optional["ProgressTask"],
+) -> tuple[int, str]:
+	"""Write the whole response to `partPath` in a single stream, checking its size and SHA-256 digest."""
+
+	if task is not None:
+		task.start(response.length if response.length is not None else size)
+
+	sha256 = hashlib.sha256()
+	buffer = bytearray(bufferSize)
+	view = memoryview(buffer)
+	written = 0
+
+	makedirs(path.dirname(partPath) or ".", exist_ok=True)
+	with response, open(partPath, "wb") as file:
+		while read := response.readinto(buffer):
+			sha256.update(view[:read])
+			file.write(view[:read])
+			written += read
+			if task is not None:
+				task.add(read)
+
+	actualDigest = sha256.hexdigest()
+	if (size is not None and written != size) or (digest and actualDigest != digest):
+		remove(partPath)
+		raise ValueError(
+			f"the file downloaded from '{response.url}' doesn't match"
+			+ f" ({written} bytes, {actualDigest} != {size} bytes, {digest})"
+		)
+	return written, actualDigest
+
+
+def downloadFile(
+	client: HttpClient,
+	url: str,
+	filePath: str,
+	connections: int = DEFAULT_CONNECTIONS,
+	size: int = None,
+	digest: str = None,
+	bufferSize: int = DEFAULT_BUFFER_SIZE,
+	progress: "Progress" = None,
+) -> tuple[int, str]:
+	"""
+	Download the file at `url` to `filePath`. Returns its size and SHA-256 digest. (`(size, digest)`)
+
+	If the server supports ranges, the file is split in up to `connections` segments downloaded at the same
+	time, and the progress is saved next to the file, so a download that was interrupted continues where it
+	stopped next time. Otherwise, it is downloaded in a single stream.
+
+	- `size` and `digest` are the expected size and SHA-256 digest (in hex) of the file, if known.
+	`ValueError` is raised if the file doesn't match them, and the partial download is removed.
+	- `progress` is a `Progress` where the bytes downloaded are counted, in the `download` task.
+	"""
+
+	task = progress.task("download") if progress is not None else None
+	download = _RangedDownload(client, url, filePath, bufferSize, task)
+
+	# When the size is known, only ask for the first segment, so the server doesn't send the whole file
+	# through the first connection while the other segments are downloaded
+	firstRange = f"bytes=0-{_splitSegments(size, connections)[0][1]}" if size else "bytes=0-"
+
+	for restart in (False, True):
+		if restart or not download.load(digest):
+			try:
+				response = client.open(url, {"Range": firstRange})
+			except HttpError as error:
+				# Empty files can't have a range
+				if error.status != 416:
+					raise
+				response = client.open(url)
+			contentRange = parseContentRange(response.headers.get("Content-Range"))
+			if response.status != 206 or contentRange is None or contentRange[0] != 0:
+				download.discard()
+				written, actualDigest = _streamDownload(response, download.partPath, size, digest, bufferSize, task)
+				break
+			download.start(response, contentRange[2], digest, connections)
+		else:
+			response = None
+
+		if task is not None:
+			task.start(download.state["size"], sum(segment[2] for segment in download.state["segments"]))
+		try:
+			download.run(response)
+		except _FileChanged:
+			# The file was replaced on the server since the download started, so start it again
+			download.discard()
+			if restart:
+				raise ValueError(f"the file at '{url}' keeps changing while downloading it")
+			continue
+
+		actualDigest = download.verify(size, digest)
+		written = download.state["size"]
+		remove(download.statePath)
+		break
+
+	replace(download.partPath, filePath)
+	return written, actualDigest
@@ -0,0 +1,359 @@
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from json import loads as jsonLoads, dumps as jsonDumps
+from os import path, makedirs, replace, stat, link, remove
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from network import DEFAULT_BUFFER_SIZE, streamCopy
+
+if TYPE_CHECKING:
+	from zipfile import ZipFile, ZipInfo
+
+	from progress import Progress, ProgressTask
+
+
+__all__ = [
+	"MANIFEST_NAME",
+	"LINK_MODES",
+	"getPlacementRules",
+	"planExtraction",
+	"mergePlans",
+	"placeFile",
+	"extractPlan",
+	"fileCrc",
+	"InstallManifest",
+]
+
+
+MANIFEST_NAME = "hainstaller_manifest.json"
+LINK_MODES = ("copy", "hardlink", "reflink")
+
+
+def getPlacementRules(
+	gamePath: str, inGameFolder: str, fgdName: str, isX64: bool
+) -> list[tuple[str, str]]:
+	"""
+	Return a list of `(zipPrefix, destination)` pairs describing where every needed part of the release goes.
+
+	Prefixes ending with a `/` match a whole folder of the zip, and the rest of the member path is kept
+	below the destination folder. Other prefixes match a single file, and the destination is the final path.
+	"""
+
+	arch = "win64" if isX64 else "win32"
+
+	return [
+		(f"{arch}/postcompiler/", path.join(gamePath, "bin/postcompiler")),
+		("hammer/", path.join(gamePath, "hammer")),
+		(
+			f"instances/{inGameFolder}/",
+			path.join(gamePath, "sdk_content/maps", inGameFolder),
+		),
+		(f"{fgdName}.fgd", path.join(gamePath, "bin", f"{fgdName}.fgd")),
+	]
+
+
+def planExtraction(
+	members: Iterable["ZipInfo"], rules: list[tuple[str, str]]
+) -> list[tuple["ZipInfo", str]]:
+	"""
+	Map the members of the zip to their final paths using the rules from `getPlacementRules()`.
+	Members which don't match any rule, and directory entries, are left out.
+	"""
+
+	plan: list[tuple["ZipInfo", str]] = []
+
+	for info in members:
+		if info.is_dir():
+			continue
+
+		name = info.filename
+		for prefix, dest in rules:
+			if prefix.endswith("/"):
+				if not name.startswith(prefix):
+					continue
+				relPath = path.normpath(name[len(prefix) :])
+				if relPath.startswith("..") or path.isabs(relPath):
+					# Never write outside of the destination folder
+					break
+				plan.append((info, path.join(dest, relPath)))
+				break
+			elif name == prefix:
+				plan.append((info, dest))
+				break
+
+	return plan
+
+
+def mergePlans(*plans: list[tuple["ZipInfo", str]]) -> list[tuple["ZipInfo", list[str]]]:
+	"""
+	Group several extraction plans (One for every game, for example) by zip member, so every member
+	is paired with all the paths it has to be written to.
+	"""
+
+	merged: dict[str, tuple["ZipInfo", list[str]]] = {}
+
+	for plan in plans:
+		for info, dest in plan:
+			merged.setdefault(info.filename, (info, []))[1].append(dest)
+
+	return list(merged.values())
+
+
+class _FanOutWriter:
+	"""Writes the same data to several files, counting it in `task` if given."""
+
+	def __init__(self, files: list, task: Optional["ProgressTask"] = None) -> None:
+		self.files = files
+		self.task = task
+
+	def write(self, data):
+		for file in self.files:
+			file.write(data)
+		if self.task is not None:
+			self.task.add(len(data))
+
+
+def _reflink(source: str, dest: str):
+	"""Make `dest` a copy-on-write clone of `source`. Raises `OSError` if the file system doesn't support it."""
+
+	try:
+		import fcntl
+	except ImportError:
+		raise OSError("reflinks are not supported on this platform")
+
+	FICLONE = 0x40049409
+	with open(source, "rb") as src, open(dest, "wb") as dst:
+		fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def placeFile(source: str, dest: str, linkMode: str = "copy") -> str:
+	"""
+	Place the file `source` at `dest`, replacing it if it exists. The old file is never written to, since it
+	may be linked to the staging area and to other games by an earlier installation.
+
+	- `linkMode` is one of `LINK_MODES`. If a hardlink or reflink can't be made (Different volumes, or a file
+	system without support for them), the file is copied instead.
+
+	Returns the link mode that was actually used.
+	"""
+
+	from shutil import copyfile
+
+	makedirs(path.dirname(dest), exist_ok=True)
+
+	if linkMode != "copy":
+		try:
+			remove(dest)
+		except FileNotFoundError:
+			pass
+
+		try:
+			if linkMode == "hardlink":
+				link(source, dest)
+			else:
+				_reflink(source, dest)
+			return linkMode
+		except OSError:
+			try:
+				remove(dest)
+			except FileNotFoundError:
+				pass
+
+	copyfile(source, dest + ".part")
+	replace(dest + ".part", dest)
+	return "copy"
+
+
+def _extractMember(
+	zipfile: "ZipFile",
+	info: "ZipInfo",
+	dests: list[str],
+	bufferSize: int,
+	linkMode: str,
+	stagingDir: Optional[str],
+	progress: Optional["Progress"],
+) -> int:
+	"""Extract a single member of a plan. Returns the number of bytes written."""
+
+	inflated = progress.task("inflate") if progress is not None else None
+	placed = progress.task("place") if progress is not None else None
+
+	if stagingDir is None:
+		# Write new files and replace the old ones with them, since the old ones may be hardlinks
+		partPaths = [dest + ".part" for dest in dests]
+		try:
+			with ExitStack() as stack:
+				files = []
+				for partPath in partPaths:
+					makedirs(path.dirname(partPath), exist_ok=True)
+					files.append(stack.enter_context(open(partPath, "wb")))
+
+				with zipfile.open(info) as member:
+					written = streamCopy(member, _FanOutWriter(files, inflated), bufferSize) * len(files)
+		except BaseException:
+			for partPath in partPaths:
+				try:
+					remove(partPath)
+				except FileNotFoundError:
+					pass
+			raise
+
+		for partPath, dest in zip(partPaths, dests):
+			replace(partPath, dest)
+
+		if placed is not None:
+			placed.add(len(dests))
+		return written
+
+	# Decompress the member into the staging area once, and then link it to every destination
+	written = 0
+	staged = path.join(stagingDir, path.normpath(info.filename))
+	if not path.isfile(staged) or stat(staged).st_size != info.file_size:
+		makedirs(path.dirname(staged), exist_ok=True)
+		with zipfile.open(info) as member, open(staged + ".part", "wb") as file:
+			written += streamCopy(member, _FanOutWriter([file], inflated), bufferSize)
+		replace(staged + ".part", staged)
+	elif inflated is not None:
+		# Already decompressed by an earlier installation
+		inflated.add(info.file_size)
+
+	for dest in dests:
+		if placeFile(staged, dest, linkMode) == "copy":
+			written += info.file_size
+		if placed is not None:
+			placed.add(1)
+
+	return written
+
+
+def extractPlan(
+	zipfile: "ZipFile",
+	plan: list[tuple["ZipInfo", list[str]]],
+	bufferSize: int = DEFAULT_BUFFER_SIZE,
+	workers: int = 1,
+	linkMode: str = "copy",
+	stagingDir: str = None,
+	progress: "Progress" = None,
+) -> int:
+	"""
+	Decompress every member of the plan straight into its final paths. Every member is decompressed only once,
+	even if it has to be written to several paths. Returns the number of bytes written.
+
+	- `workers` is the number of threads used to extract members at the same time.
+	- `linkMode` is one of `LINK_MODES`. When it isn't `copy`, members are decompressed into `stagingDir`,
+	which should be on the same volume as the destinations, and hardlinked or reflinked from there.
+	- `progress` is a `Progress` where the bytes decompressed and the files placed are counted, in the
+	`inflate` and `place` tasks.
+	"""
+
+	if linkMode != "copy" and stagingDir is None:
+		raise ValueError("a staging folder is required to link files")
+
+	stagingDir = stagingDir if linkMode != "copy" else None
+	if progress is not None:
+		progress.task("inflate").start(sum(info.file_size for info, _ in plan))
+		progress.task("place").start(sum(len(dests) for _, dests in plan))
+
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		return sum(
+			executor.map(
+				lambda item: _extractMember(
+					zipfile, item[0], item[1], bufferSize, linkMode, stagingDir, progress
+				),
+				plan,
+			)
+		)
+
+
+def fileCrc(filePath: str, bufferSize: int = DEFAULT_BUFFER_SIZE) -> int:
+	"""Return the CRC32 of the contents of a file, as stored in zip files."""
+
+	crc = 0
+	with open(filePath, "rb") as file:
+		while chunk := file.read(bufferSize):
+			crc = zlib.crc32(chunk, crc)
+	return crc
+
+
+class InstallManifest:
+	"""
+	List of the files installed in a game folder, saved next to its `srctools.vdf` file.
+
+	Every file is stored with its size, modification time and CRC32, so on the next upgrade the files
+	which weren't touched since can be compared with the zip members without reading them.
+	"""
+
+	def __init__(self, gamePath: str) -> None:
+		self.gamePath = gamePath
+		self._path = path.join(gamePath, MANIFEST_NAME)
+		try:
+			with open(self._path) as file:
+				self._entries: dict[str, dict] = jsonLoads(file.read())
+		except (OSError, ValueError):
+			self._entries = {}
+
+	def _key(self, dest: str) -> str:
+		return path.relpath(dest, self.gamePath).replace("\\", "/")
+
+	def isUnchanged(self, info: "ZipInfo", dest: str) -> bool:
+		"""Return `True` if the file at `dest` has the same contents as the zip member `info`."""
+
+		try:
+			fileStat = stat(dest)
+		except OSError:
+			return False
+
+		if fileStat.st_size != info.file_size:
+			return False
+
+		entry = self._entries.get(self._key(dest))
+		if (
+			entry
+			and entry["size"] == fileStat.st_size
+			and entry["mtime"] == fileStat.st_mtime_ns
+		):
+			crc = entry["crc"]
+		else:
+			crc = fileCrc(dest)
+
+		return crc == info.CRC
+
+	def filterPlan(
+		self, plan: list[tuple["ZipInfo", str]]
+	) -> tuple[list[tuple["ZipInfo", str]], int]:
+		"""
+		Remove the members whose installed file is already up to date from the plan.
+		Returns the new plan, and the number of bytes skipped.
+		"""
+
+		newPlan: list[tuple["ZipInfo", str]] = []
+		skipped = 0
+
+		for info, dest in plan:
+			if self.isUnchanged(info, dest):
+				skipped += info.file_size
+			else:
+				newPlan.append((info, dest))
+
+		return newPlan, skipped
+
+	def record(self, plan: list[tuple["ZipInfo", str]]):
+		"""Save the state of all the installed files of the plan into the manifest file."""
+
+		for info, dest in plan:
+			try:
+				fileStat = stat(dest)
+			except OSError:
+				continue
+
+			self._entries[self._key(dest)] = {
+				"size": fileStat.st_size,
+				"mtime": fileStat.st_mtime_ns,
+				"crc": info.CRC,
+			}
+
+		tempPath = self._path + ".tmp"
+		with open(tempPath, "w") as file:
+			file.write(jsonDumps(self._entries, indent=1))
+		replace(tempPath, self._path)
@@ -0,0 +1,96 @@
+import atexit
+import threading
+from os import path, remove, replace
+
+
+__all__ = ["DEFAULT_FLUSH_INTERVAL", "DEFAULT_MAX_BYTES", "BufferedLogWriter"]
+
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+
+class BufferedLogWriter:
+	"""
+	Appends text to a log file through a single open handle.
+
+	Writes are kept in memory and flushed by a background thread every `flushInterval` seconds, and when
+	the program exits. When the file grows over `maxBytes`, it is rotated to `<file>.1`, `<file>.2`...
+	keeping up to `backups` old files.
+	"""
+
+	def __init__(
+		self,
+		filePath: str,
+		flushInterval: float = DEFAULT_FLUSH_INTERVAL,
+		maxBytes: int = DEFAULT_MAX_BYTES,
+		backups: int = 3,
+	) -> None:
+		self.filePath = filePath
+		self.flushInterval = flushInterval
+		self.maxBytes = maxBytes
+		self.backups = backups
+
+		self._buffer: list[str] = []
+		self._lock = threading.Lock()
+		self._closed = threading.Event()
+		self._file = open(filePath, "a", errors="ignore")
+
+		self._thread = threading.Thread(target=self._run, name="logwriter", daemon=True)
+		self._thread.start()
+		atexit.register(self.close)
+
+	def write(self, text: str):
+		"""Add text to the log. It will be written to the file on the next flush."""
+
+		with self._lock:
+			if not self._closed.is_set():
+				self._buffer.append(text)
+
+	def _run(self):
+		while not self._closed.wait(self.flushInterval):
+			self.flush()
+
+	def _rotate(self):
+		self._file.close()
+
+		for number in range(self.backups - 1, 0, -1):
+			old = f"{self.filePath}.{number}"
+			if path.exists(old):
+				replace(old, f"{self.filePath}.{number + 1}")
+
+		if self.backups > 0:
+			replace(self.filePath, f"{self.filePath}.1")
+		else:
+			remove(self.filePath)
+
+		self._file = open(self.filePath, "a", errors="ignore")
+
+	def flush(self):
+		"""Write all the buffered text to the file."""
+
+		with self._lock:
+			if not self._buffer or self._file.closed:
+				return
+
+			data = "".join(self._buffer)
+			self._buffer.clear()
+
+			if self.maxBytes and self._file.tell() + len(data) > self.maxBytes and self._file.tell() > 0:
+				self._rotate()
+
+			self._file.write(data)
+			self._file.flush()
+
+	def close(self):
+		"""Flush the remaining text, stop the background thread and close the file."""
+
+		if self._closed.is_set():
+			return
+
+		self.flush()
+		with self._lock:
+			self._closed.set()
+			self._file.close()
+
+		atexit.unregister(self.close)
@@ -0,0 +1,123 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps as jsonDumps
+from os import path
+
+from cache import ReleaseCache
+from network import DEFAULT_BUFFER_SIZE, streamCopy
+from releases import DEFAULT_MIRROR_PORT
+
+
+__all__ = ["cachedReleaseList", "MirrorServer"]
+
+
+def cachedReleaseList(cache: ReleaseCache) -> list[dict]:
+	"""
+	Return the releases of the cache from the newest, in the format of the GitHub releases API.
+	Asset URLs are relative to the list, like `assets/2.6.0.zip`.
+	"""
+
+	return [
+		{
+			"tag_name": str(tag),
+			"assets": [
+				{
+					"name": f"{tag}.zip",
+					"browser_download_url": f"assets/{tag}.zip",
+					"size": size,
+					"digest": f"sha256:{digest}",
+				}
+			],
+		}
+		for tag, _, size, digest in sorted(cache.releases(), reverse=True)
+	]
+
+
+class MirrorServer:
+	"""
+	Serves the releases of the cache at `root` over HTTP, with the layout read by `mirrorSource()`:
+	`/releases.json`, `/assets/<tag>.zip` and `/srctools.vdf`.
+
+	The cache is read again on every request, so releases downloaded while the server runs are served too.
+	"""
+
+	def __init__(
+		self,
+		root: str,
+		host: str = "",
+		port: int = DEFAULT_MIRROR_PORT,
+		bufferSize: int = DEFAULT_BUFFER_SIZE,
+	) -> None:
+		self.root = root
+		self.bufferSize = bufferSize
+		self.requests = 0
+		self._lock = threading.Lock()
+
+		server = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = "HTTP/1.1"
+
+			def setup(self):
+				super().setup()
+				# The headers and the body are sent apart, which would wait for a delayed ACK otherwise
+				self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+			def do_GET(self):
+				server._handle(self)
+
+			def log_message(self, *args):
+				pass
+
+		self._server = ThreadingHTTPServer((host, port), Handler)
+		self._server.daemon_threads = True
+
+	@property
+	def url(self) -> str:
+		host, port = self._server.server_address[:2]
+		return f"http://{host if host not in {'', '0.0.0.0'} else 'localhost'}:{port}/"
+
+	def _handle(self, handler: BaseHTTPRequestHandler):
+		with self._lock:
+			self.requests += 1
+
+		cache = ReleaseCache(self.root)
+		urlPath = handler.path.split("?", 1)[0]
+
+		if urlPath == "/releases.json":
+			body = jsonDumps(cachedReleaseList(cache)).encode()
+			handler.send_response(200)
+			handler.send_header("Content-Type", "application/json")
+			handler.send_header("Content-Length", str(len(body)))
+			handler.end_headers()
+			handler.wfile.write(body)
+			return
+
+		if urlPath == "/srctools.vdf":
+			filePath = cache.vdfPath
+		else:
+			archives = {f"/assets/{tag}.zip": archivePath for tag, archivePath, _, _ in cache.releases()}
+			filePath = archives.get(urlPath)
+
+		if filePath is None or not path.isfile(filePath):
+			handler.send_error(404)
+			return
+
+		with open(filePath, "rb") as file:
+			handler.send_response(200)
+			handler.send_header("Content-Type", "application/octet-stream")
+			handler.send_header("Content-Length", str(path.getsize(filePath)))
+			handler.end_headers()
+			try:
+				streamCopy(file, handler.wfile, self.bufferSize)
+			except (BrokenPipeError, ConnectionResetError):
+				pass
+
+	def serveForever(self):
+		"""Handle requests until `stop()` is called from another thread, or the process is interrupted."""
+		self._server.serve_forever()
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
@@ -0,0 +1,588 @@
+import re
+import threading
+from json import loads as jsonLoads
+from os import fstat
+from time import perf_counter, sleep
+from typing import BinaryIO, Callable, NamedTuple, Optional
+
+
+__all__ = [
+	"DEFAULT_BUFFER_SIZE",
+	"DEFAULT_CONNECT_TIMEOUT",
+	"DEFAULT_READ_TIMEOUT",
+	"DEFAULT_RETRIES",
+	"streamCopy",
+	"HttpError",
+	"isTransient",
+	"parseContentRange",
+	"RequestRecord",
+	"HttpResult",
+	"HttpResponse",
+	"HttpClient",
+	"sharedClient",
+	"fetchJsonPage",
+	"fetchJson",
+]
+
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+
+_NEXT_LINK = re.compile(r'<([^>]+)>\s*;\s*rel="?next"?')
+
+# Statuses which may not happen again if the same request is repeated a bit later
+_RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+_REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+_MAX_REDIRECTS = 5
+_MAX_RETRY_AFTER = 60.0
+
+
+def streamCopy(source: BinaryIO, dest: BinaryIO, bufferSize: int = DEFAULT_BUFFER_SIZE) -> int:
+	"""
+	Copy all the data from `source` into `dest` in chunks, returning the number of bytes written.
+
+	A single buffer of `bufferSize` bytes is reused for every chunk, so the peak memory used does not
+	depend on the size of the data being copied.
+	"""
+
+	buffer = bytearray(bufferSize)
+	view = memoryview(buffer)
+	total = 0
+
+	while True:
+		read = source.readinto(buffer)
+		if not read:
+			break
+		dest.write(view[:read])
+		total += read
+
+	return total
+
+
+def _nextLink(header: Optional[str]) -> Optional[str]:
+	"""Return the URL with `rel="next"` from a `Link` header, if any."""
+
+	if not header:
+		return None
+	match = _NEXT_LINK.search(header)
+	return match.group(1) if match else None
+
+
+class HttpError(OSError):
+	"""A response with an error status. It is an `OSError`, like the connection errors."""
+
+	def __init__(self, url: str, status: int, reason: str = "", headers=None) -> None:
+		super().__init__(f"HTTP {status}{f' {reason}' if reason else ''} from '{url}'")
+		self.url = url
+		self.status = status
+		self.headers = headers if headers is not None else {}
+
+
+def parseContentRange(value: Optional[str]) -> Optional[tuple[int, int, int]]:
+	"""Return the start, end and total size of a `Content-Range: bytes start-end/total` header, if it has them all."""
+
+	if not value or not value.startswith("bytes "):
+		return None
+	span, _, total = value[6:].partition("/")
+	start, _, end = span.partition("-")
+	if not (start.isdigit() and end.isdigit() and total.isdigit()):
+		return None
+	return int(start), int(end), int(total)
+
+
+class RequestRecord(NamedTuple):
+	"""Counters of a finished request."""
+
+	url: str
+	status: int
+	attempts: int  # Including the resumed reads of the body
+	reused: bool  # Whether it went through a connection kept from a previous request
+	latency: float  # Seconds until the headers of the response were received
+	seconds: float  # Seconds until the response was closed
+	bytes: int  # Bytes of the body received, before decompressing
+
+
+class HttpResult(NamedTuple):
+	"""A response read completely by `HttpClient.get()`."""
+
+	url: str
+	status: int
+	headers: object
+	body: bytes
+
+
+def isTransient(error: Exception) -> bool:
+	"""Return whether the request that raised `error` may work if it is sent again."""
+
+	import ssl
+	from http.client import HTTPException
+
+	if isinstance(error, HttpError):
+		return error.status in _RETRY_STATUSES
+	# Errors of the files, and failed certificate checks or handshakes, happen again every time
+	if isinstance(error, (FileNotFoundError, PermissionError, IsADirectoryError, NotADirectoryError)):
+		return False
+	if isinstance(error, ssl.SSLError):
+		# Except for the connection being closed in the middle of the TLS stream
+		return isinstance(error, (ssl.SSLEOFError, ssl.SSLZeroReturnError))
+	return isinstance(error, (OSError, HTTPException))
+
+
+class HttpResponse:
+	"""
+	A response whose body is read as a stream, with `read()` or `readinto()`.
+
+	If the connection breaks while reading the body, the rest of it is requested again with a `Range` header,
+	as long as the server supports ranges and the client has retries left. Closing the response returns its
+	connection to the pool of the client, if the body was read completely.
+	"""
+
+	def __init__(
+		self,
+		client: "HttpClient",
+		url: str,
+		status: int,
+		headers,
+		stream,
+		requestHeaders: dict = None,
+		connection=None,
+		key: tuple = None,
+		reused: bool = False,
+		attempts: int = 1,
+		start: float = None,
+	) -> None:
+		self.client = client
+		self.url = url
+		self.status = status
+		self.headers = headers
+		self.received = 0
+		self.attempts = attempts
+		self.reused = reused
+		self._stream = stream
+		self._requestHeaders = requestHeaders or {}
+		self._connection = connection
+		self._key = key
+		self._start = start if start is not None else perf_counter()
+		self.latency = perf_counter() - self._start
+		self._closed = False
+
+		length = headers.get("Content-Length")
+		self.length = int(length) if length and length.isdigit() else None
+
+	def _resumable(self) -> bool:
+		return (
+			self._connection is not None
+			and self.status == 200
+			and self.length is not None
+			and "bytes" in self.headers.get("Accept-Ranges", "")
+			and not self.headers.get("Content-Encoding")
+		)
+
+	def _resume(self, error: Exception):
+		"""Request the rest of the body after the connection broke with `error`, or raise it if that's not possible."""
+
+		if not self._resumable() or not isTransient(error):
+			raise error
+
+		self._connection.close()
+		self._connection = None
+		while True:
+			if self.attempts > self.client.retries:
+				raise error
+			self.client.waitBeforeRetry(self.attempts - 1)
+			self.attempts += 1
+
+			headers = dict(self._requestHeaders, Range=f"bytes={self.received}-")
+			etag = self.headers.get("ETag")
+			if etag:
+				headers["If-Range"] = etag
+			try:
+				connection, key, response, _ = self.client._send(self.url, headers)
+			except Exception as newError:
+				if not isTransient(newError):
+					raise
+				error = newError
+				continue
+
+			contentRange = response.getheader("Content-Range", "")
+			if response.status != 206 or not contentRange.startswith(f"bytes {self.received}-"):
+				connection.close()
+				raise error
+
+			self._connection, self._key, self._stream = connection, key, response
+			return
+
+	def readinto(self, buffer) -> int:
+		from http.client import IncompleteRead
+
+		while True:
+			try:
+				read = self._stream.readinto(buffer)
+				# http.client doesn't complain if the connection is closed before the whole body is sent
+				if not read and len(buffer) and self.length is not None and self.received < self.length:
+					raise IncompleteRead(b"", self.length - self.received)
+			except Exception as error:
+				self._resume(error)
+				continue
+			self.received += read
+			self.client._count(read)
+			return read
+
+	def read(self, size: int = -1) -> bytes:
+		"""Read up to `size` bytes of the body, or all of the rest if `size` is negative."""
+
+		if size is not None and size >= 0:
+			buffer = bytearray(size)
+			return bytes(buffer[: self.readinto(buffer)])
+
+		chunks = []
+		buffer = bytearray(DEFAULT_BUFFER_SIZE)
+		while read := self.readinto(buffer):
+			chunks.append(bytes(buffer[:read]))
+		return b"".join(chunks)
+
+	def close(self):
+		if self._closed:
+			return
+		self._closed = True
+
+		if self._connection is not None:
+			if self._stream.isclosed() and not self._stream.will_close:
+				self.client._release(self._key, self._connection)
+			else:
+				self._connection.close()
+		else:
+			self._stream.close()
+
+		self.client._record(
+			RequestRecord(
+				self.url,
+				self.status,
+				self.attempts,
+				self.reused,
+				self.latency,
+				perf_counter() - self._start,
+				self.received,
+			)
+		)
+
+	def __enter__(self) -> "HttpResponse":
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+
+class HttpClient:
+	"""
+	HTTP client which keeps the connections to every host open between requests, to reuse them.
+
+	- `connectTimeout` and `readTimeout` are the maximum number of seconds to wait for a connection to be
+	made, and for any data to be received.
+	- Transient errors (connection errors, timeouts, and statuses like 503) are retried up to `retries`
+	times, waiting `backoff` seconds before the first retry and twice as much before every other one, up
+	to `maxBackoff`, with some random jitter.
+	- `maxIdle` is the number of idle connections kept for every host.
+
+	Every finished request is recorded in `records`. `file://` URLs are read from the disk.
+	"""
+
+	def __init__(
+		self,
+		connectTimeout: float = DEFAULT_CONNECT_TIMEOUT,
+		readTimeout: float = DEFAULT_READ_TIMEOUT,
+		retries: int = DEFAULT_RETRIES,
+		backoff: float = 0.5,
+		maxBackoff: float = 8.0,
+		maxIdle: int = 4,
+		userAgent: str = "HAInstaller",
+	) -> None:
+		self.connectTimeout = connectTimeout
+		self.readTimeout = readTimeout
+		self.retries = retries
+		self.backoff = backoff
+		self.maxBackoff = maxBackoff
+		self.maxIdle = maxIdle
+		self.userAgent = userAgent
+		self.records: list[RequestRecord] = []
+		self.bytesReceived = 0
+		self.connections = 0
+		self._pools: dict[tuple, list] = {}
+		self._lock = threading.Lock()
+
+	def _count(self, received: int):
+		with self._lock:
+			self.bytesReceived += received
+
+	def _record(self, record: RequestRecord):
+		with self._lock:
+			self.records.append(record)
+
+	def waitBeforeRetry(self, retry: int, retryAfter: str = None):
+		"""Wait before the retry number `retry` (from 0)."""
+
+		from random import uniform
+
+		delay = min(self.maxBackoff, self.backoff * 2**retry)
+		delay = uniform(delay / 2, delay)
+		if retryAfter and retryAfter.strip().isdigit():
+			delay = max(delay, min(float(retryAfter), _MAX_RETRY_AFTER))
+		sleep(delay)
+
+	def _newConnection(self, scheme: str, host: str, port: int):
+		import http.client
+		from urllib.request import getproxies, proxy_bypass
+
+		proxy = getproxies().get(scheme)
+		if proxy and proxy_bypass(host):
+			proxy = None
+
+		if proxy:
+			from urllib.parse import urlsplit
+
+			proxyUrl = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+			address = (proxyUrl.hostname, proxyUrl.port or 80)
+		else:
+			address = (host, port)
+
+		if scheme == "https":
+			import ssl
+
+			connection = http.client.HTTPSConnection(
+				*address, timeout=self.connectTimeout, context=ssl.create_default_context()
+			)
+			if proxy:
+				connection.set_tunnel(host, port)
+		else:
+			connection = http.client.HTTPConnection(*address, timeout=self.connectTimeout)
+		# Plain HTTP through a proxy asks for the whole URL
+		connection.absoluteTarget = bool(proxy) and scheme == "http"
+
+		connection.connect()
+		connection.sock.settimeout(self.readTimeout)
+		with self._lock:
+			self.connections += 1
+		return connection
+
+	def _acquire(self, key: tuple) -> tuple[object, bool]:
+		"""Return an idle connection to the host of `key`, or a new one, and whether it was reused."""
+
+		with self._lock:
+			pool = self._pools.get(key)
+			if pool:
+				return pool.pop(), True
+		return self._newConnection(*key), False
+
+	def _release(self, key: tuple, connection):
+		with self._lock:
+			pool = self._pools.setdefault(key, [])
+			if len(pool) < self.maxIdle:
+				pool.append(connection)
+				return
+		connection.close()
+
+	def close(self):
+		"""Close all the idle connections."""
+
+		with self._lock:
+			pools, self._pools = self._pools, {}
+		for pool in pools.values():
+			for connection in pool:
+				connection.close()
+
+	def _send(self, url: str, headers: dict) -> tuple[object, tuple, object, bool]:
+		"""
+		Send a GET request once, and return the connection, its pool key, the response with the headers read,
+		and whether the connection was reused. (`(connection, key, response, reused)`)
+		"""
+
+		from http.client import HTTPException
+		from urllib.parse import urlsplit
+
+		parts = urlsplit(url)
+		if parts.scheme not in {"http", "https"}:
+			raise ValueError(f"unsupported URL '{url}'")
+		key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+		headers = {"User-Agent": self.userAgent, "Accept-Encoding": "identity", **headers}
+
+		connection, reused = self._acquire(key)
+		target = url if connection.absoluteTarget else (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+		try:
+			connection.request("GET", target, headers=headers)
+			response = connection.getresponse()
+		except (OSError, HTTPException):
+			connection.close()
+			if not reused:
+				raise
+			# The server closed the idle connection in the meantime. That's not a failure of the request.
+			connection, reused = self._newConnection(*key), False
+			try:
+				connection.request("GET", target, headers=headers)
+				response = connection.getresponse()
+			except (OSError, HTTPException):
+				connection.close()
+				raise
+
+		return connection, key, response, reused
+
+	def _openOnce(self, url: str, headers: dict, attempts: int, start: float) -> HttpResponse:
+		"""Send the request once, following redirects. Raises `HttpError` for error statuses."""
+
+		if url.startswith("file:"):
+			from urllib.parse import urlsplit
+			from urllib.request import url2pathname
+
+			file = open(url2pathname(urlsplit(url).path), "rb")
+			size = str(fstat(file.fileno()).st_size)
+			return HttpResponse(self, url, 200, {"Content-Length": size}, file, attempts=attempts, start=start)
+
+		for _ in range(_MAX_REDIRECTS + 1):
+			connection, key, response, reused = self._send(url, headers)
+
+			location = response.getheader("Location")
+			if response.status in _REDIRECT_STATUSES and location:
+				from urllib.parse import urljoin
+
+				response.read()
+				self._release(key, connection)
+				url = urljoin(url, location)
+				continue
+
+			if response.status >= 400:
+				response.read()
+				self._release(key, connection)
+				raise HttpError(url, response.status, response.reason, response.headers)
+
+			return HttpResponse(
+				self, url, response.status, response.headers, response, headers, connection, key, reused, attempts, start
+			)
+
+		connection.close()
+		raise HttpError(url, response.status, "Too many redirects")
+
+	def _withRetries(self, action: Callable[[int], object]) -> object:
+		"""Call `action` with the attempt number (from 1) until it doesn't raise a transient error, or no retries are left."""
+
+		attempt = 1
+		while True:
+			try:
+				return action(attempt)
+			except Exception as error:
+				if attempt > self.retries or not isTransient(error):
+					raise
+				retryAfter = error.headers.get("Retry-After") if isinstance(error, HttpError) else None
+				self.waitBeforeRetry(attempt - 1, retryAfter)
+				attempt += 1
+
+	def open(self, url: str, headers: dict = None) -> HttpResponse:
+		"""
+		Send a GET request to `url`, and return the response to read its body as a stream.
+		Statuses under 400 other than redirects (like 304) are returned, the others raise `HttpError`.
+		"""
+
+		start = perf_counter()
+		return self._withRetries(lambda attempt: self._openOnce(url, headers or {}, attempt, start))
+
+	def get(self, url: str, headers: dict = None) -> HttpResult:
+		"""Send a GET request to `url` and read the whole body, which the server may compress with gzip."""
+
+		headers = {**(headers or {}), "Accept-Encoding": "gzip"}
+		start = perf_counter()
+
+		def attempt(number: int) -> HttpResult:
+			with self._openOnce(url, headers, number, start) as response:
+				body = response.read()
+			if response.headers.get("Content-Encoding", "").lower() == "gzip":
+				import gzip
+
+				body = gzip.decompress(body)
+			return HttpResult(response.url, response.status, response.headers, body)
+
+		return self._withRetries(attempt)
+
+	def summary(self) -> str:
+		"""Return a line with the number of requests and connections, the retries, the bytes received and the latencies."""
+
+		from statistics import median
+
+		with self._lock:
+			records = list(self.records)
+		if not records:
+			return "no requests"
+
+		retries = sum(record.attempts - 1 for record in records)
+		reused = sum(record.reused for record in records)
+		size = self.bytesReceived
+		return (
+			f"{len(records)} request/s over {self.connections} connection/s ({reused} reused), {retries} retries,"
+			+ (f" {size / 1024**2:.1f}MiB" if size >= 1024**2 else f" {size / 1024:.1f}KiB")
+			+ f" received, latency median {median(record.latency for record in records) * 1000:.0f}ms"
+			+ f" max {max(record.latency for record in records) * 1000:.0f}ms"
+		)
+
+
+_sharedClient: Optional[HttpClient] = None
+
+
+def sharedClient() -> HttpClient:
+	"""Return the client used when no other one is given."""
+
+	global _sharedClient
+	if _sharedClient is None:
+		_sharedClient = HttpClient()
+	return _sharedClient
+
+
+def fetchJsonPage(
+	url: str, cache=None, transform: Callable[[object], object] = None, client: HttpClient = None
+) -> tuple[object, Optional[str]]:
+	"""
+	Download and parse the JSON document at `url`. Returns a tuple with the data, and the URL of the next page
+	from the `Link` header, if any. (`(data, nextUrl)`)
+
+	- `cache` is an optional `MetadataCache`. A fresh entry is returned without any request, and a stale one
+	is revalidated with `If-None-Match` / `If-Modified-Since`, being reused if the server replies with a 304.
+	- `transform` is applied to the parsed data before caching and returning it, so only the values needed
+	are kept. It must give the same result when applied to its own output.
+	- `client` is the `HttpClient` used, by default the shared one.
+	"""
+
+	entry = cache.get(url) if cache else None
+	if entry and cache.isFresh(url):
+		data = transform(entry["data"]) if transform else entry["data"]
+		return data, entry.get("next")
+
+	headers = {"Accept": "application/vnd.github+json"}
+	if entry:
+		if entry["etag"]:
+			headers["If-None-Match"] = entry["etag"]
+		if entry["lastModified"]:
+			headers["If-Modified-Since"] = entry["lastModified"]
+
+	result = (client or sharedClient()).get(url, headers)
+	if result.status == 304:
+		if not entry:
+			raise HttpError(url, 304, "Not Modified, without a cached response")
+		cache.touch(url)
+		data = transform(entry["data"]) if transform else entry["data"]
+		return data, entry.get("next")
+
+	data = jsonLoads(result.body)
+	etag = result.headers.get("ETag")
+	lastModified = result.headers.get("Last-Modified")
+	nextUrl = _nextLink(result.headers.get("Link"))
+
+	if transform:
+		data = transform(data)
+	if cache:
+		cache.store(url, data, etag, lastModified, nextUrl)
+
+	return data, nextUrl
+
+
+def fetchJson(url: str, cache=None, client: HttpClient = None) -> object:
+	"""Download and parse the JSON document at `url`, like `fetchJsonPage()`, ignoring pagination."""
+
+	return fetchJsonPage(url, cache, client=client)[0]
@@ -0,0 +1,202 @@
+import sys
+from json import dumps as jsonDumps
+from time import sleep, time
+from typing import TYPE_CHECKING, TextIO
+
+from pbar import PBar, Term
+
+if TYPE_CHECKING:
+	from progress import ProgressTask
+
+
+__all__ = ["OUTPUT_MODES", "PHASE_STEPS", "Renderer", "InteractiveRenderer", "JsonRenderer", "getRenderer"]
+
+
+OUTPUT_MODES = ("auto", "interactive", "json")
+# Steps of the progress bar in every phase, so the progress events can move it inside the download phase
+PHASE_STEPS = 100
+
+
+class Renderer:
+	"""Base class for the output backends. Every message logged by the installer goes through one of these."""
+
+	# Whether the user can be asked for input
+	interactive = False
+
+	def __init__(self, stream: TextIO = None) -> None:
+		self.stream = stream or sys.stdout
+		self.phase = "start"
+
+	def message(self, text: str, type: str = None, game: str = None, blink: bool = False, end: str = "\n"):
+		"""Show a message. `type` is one of `good, error, loading, warning`."""
+		raise NotImplementedError
+
+	def diff(self, filePath: str, diff: str):
+		"""Show the changes that would be made to a file, as a unified diff."""
+		raise NotImplementedError
+
+	def progress(self, task: "ProgressTask", fraction: float):
+		"""Show the progress of a task of the download phase. `fraction` is how much of the whole phase is done."""
+
+	def start(self, title: str):
+		"""Called once when the installer starts."""
+
+	def close(self):
+		"""Called once when the installer finishes."""
+
+
+class InteractiveRenderer(Renderer):
+	"""Colored output for terminals, which also keeps the progress bar up to date."""
+
+	interactive = True
+
+	# Seconds that a blinking message stays underlined
+	BLINK_DELAY = 0.25
+
+	MSG_COLORS = {
+		"error": (255, 87, 87),
+		"good": (48, 240, 134),
+		"loading": (235, 175, 66),
+		"warning": (92, 160, 255),
+	}
+
+	# Text of the progress bar for every task of the download phase
+	TASK_LABELS = {"download": "Downloading", "inflate": "Unzipping", "place": "Placing"}
+
+	def __init__(self, progressBar: PBar, stream: TextIO = None) -> None:
+		super().__init__(stream)
+		self.progressBar = progressBar
+
+	def _prefix(self, type: str) -> str:
+		return {
+			"error": f"{Term.color(self.MSG_COLORS['error'])}[ E ]",
+			"good": f"{Term.color(self.MSG_COLORS['good'])}[ √ ]{Term.color((255, 255, 255))}",
+			"loading": f"{Term.color(self.MSG_COLORS['loading'])}[...]",
+			"warning": f"{Term.color((92, 160, 2557))}[ ! ]",
+		}.get(type, "[   ]")
+
+	def message(self, text: str, type: str = None, game: str = None, blink: bool = False, end: str = "\n"):
+		if game:
+			text = f"[{game}] {text}"
+		msg = f"{Term.moveHoriz(-9999)}{Term.UNDERLINE}{self._prefix(type)}{Term.NO_UNDERLINE} {text}{Term.RESET}{Term.CLEAR_RIGHT}"
+
+		if blink:
+			print(f"{Term.UNDERLINE}{msg}{Term.NO_UNDERLINE}", end="", flush=True, file=self.stream)
+			sleep(self.BLINK_DELAY)
+
+		# progresssbar
+		if type in self.MSG_COLORS:
+			pbColor = self.MSG_COLORS[type]
+			self.progressBar.colorset |= {
+				"horiz": pbColor,
+				"vert": pbColor,
+				"corner": pbColor,
+				"text": pbColor,
+			}
+		self.progressBar.draw()
+
+		print(msg, end=end, file=self.stream)
+
+	def diff(self, filePath: str, diff: str):
+		for line in diff.splitlines():
+			if line.startswith("+") and not line.startswith("+++"):
+				line = f"{Term.color(self.MSG_COLORS['good'])}{line}{Term.RESET}"
+			elif line.startswith("-") and not line.startswith("---"):
+				line = f"{Term.color(self.MSG_COLORS['error'])}{line}{Term.RESET}"
+			print(f"{Term.moveHoriz(-9999)}      {line}{Term.CLEAR_RIGHT}", file=self.stream)
+
+	def progress(self, task: "ProgressTask", fraction: float):
+		# The release is downloaded in the background during the earlier phases, which have their own text
+		if not self.progressBar.enabled or self.phase != "download":
+			return
+
+		value, stop = self.progressBar.prange
+		start = value // PHASE_STEPS * PHASE_STEPS
+		self.progressBar.prange = (start + min(int(fraction * PHASE_STEPS), PHASE_STEPS - 1), stop)
+
+		text = self.TASK_LABELS.get(task.name, task.name)
+		if task.rate:
+			text += f" {task.rate / 1e6:.1f} MB/s" if task.unit == "bytes" else f" {task.rate:.0f} {task.unit}/s"
+		if task.eta is not None and task.fraction < 1:
+			text += f", {task.eta:.0f}s left"
+		self.progressBar.text = text
+		self.progressBar.draw()
+
+	def start(self, title: str):
+		print(
+			Term.BUFFER_NEW
+			+ Term.CURSOR_HOME
+			+ title
+			+ (Term.margin(5) + "\n\n\n\n" if self.progressBar.enabled else ""),
+			file=self.stream,
+		)
+		self.progressBar.draw()
+
+	def close(self):
+		print(Term.BUFFER_OLD, end="", file=self.stream)
+
+
+class JsonRenderer(Renderer):
+	"""
+	Output for scripts. Every message is written as a JSON object in its own line, with the `event`, `phase`,
+	`level`, `message` and `timestamp` keys, and `game` when it refers to a single game.
+	There are no escape sequences and no delays.
+
+	The progress of the download phase is written as `progress` events, with the `task` (`download`, `inflate`
+	or `place`), its `unit`, the units `done` and the `total`, the smoothed `rate` in units per second, the
+	`eta` in seconds, and the `fraction` of the whole phase done. `total`, `rate` and `eta` are `null` while
+	they aren't known. Their `phase` is always the one of the task, even when the release is downloaded in the
+	background during the earlier phases.
+	"""
+
+	def event(self, event: str, **values):
+		"""Write a single event line."""
+
+		values = {"event": event, "phase": self.phase, **values, "timestamp": time()}
+		self.stream.write(jsonDumps(values) + "\n")
+		self.stream.flush()
+
+	def message(self, text: str, type: str = None, game: str = None, blink: bool = False, end: str = "\n"):
+		values = {"level": type, "message": text}
+		if game:
+			values["game"] = game
+		self.event("message", **values)
+
+	def diff(self, filePath: str, diff: str):
+		self.event("diff", file=filePath, diff=diff)
+
+	def progress(self, task: "ProgressTask", fraction: float):
+		eta = task.eta
+		self.event(
+			"progress",
+			phase=task.phase,
+			task=task.name,
+			unit=task.unit,
+			done=task.done,
+			total=task.total,
+			rate=None if task.rate is None else round(task.rate, 1),
+			eta=None if eta is None else round(eta, 2),
+			fraction=round(fraction, 4),
+		)
+
+	def start(self, title: str):
+		self.event("start", message=title)
+
+	def close(self):
+		self.event("end")
+
+
+def getRenderer(mode: str, progressBar: PBar) -> Renderer:
+	"""
+	Return the renderer for the output mode given, which is one of `OUTPUT_MODES`.
+	The `auto` mode uses the interactive renderer only if the standard output is a terminal.
+	"""
+
+	if mode == "auto":
+		mode = "interactive" if sys.stdout.isatty() else "json"
+
+	if mode == "interactive":
+		return InteractiveRenderer(progressBar)
+
+	progressBar.enabled = False
+	return JsonRenderer()
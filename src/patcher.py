@@ -0,0 +1,181 @@
+import difflib
+import hashlib
+from os import path, replace
+from typing import Callable, NamedTuple
+
+from utils import getIndent
+
+
+__all__ = ["LineRule", "InsertAfterRule", "SetValueRule", "PatchResult", "patchFile"]
+
+
+class LineRule:
+	"""
+	Base class for the rules applied by `patchFile()`.
+
+	Every line of the file is passed to `feed()` along with its cleaned, lowercase version, and the lines
+	returned are written in its place. A rule may hold lines back and return them later, or from `finish()`.
+	"""
+
+	# Message describing what the rule did, for logging
+	result = ""
+
+	def feed(self, line: str, strip: str) -> list[str]:
+		return [line]
+
+	def finish(self) -> list[str]:
+		return []
+
+
+def _lineEnding(line: str) -> str:
+	return "\r\n" if line.endswith("\r\n") else "\n"
+
+
+class InsertAfterRule(LineRule):
+	"""
+	Insert a line right after the last line matching `isMarker`, with the same indentation, unless a line
+	matching `isPresent` is found after it.
+	"""
+
+	def __init__(
+		self,
+		isMarker: Callable[[str], bool],
+		isPresent: Callable[[str], bool],
+		newLine: str,
+	) -> None:
+		self.isMarker = isMarker
+		self.isPresent = isPresent
+		self.newLine = newLine
+		# Lines after the last marker, held until we know if the new line is needed
+		self._held: list[str] = []
+		self.result = "Marker not found"
+
+	def _release(self) -> list[str]:
+		lines, self._held = self._held, []
+		return lines
+
+	def feed(self, line: str, strip: str) -> list[str]:
+		if self.isMarker(strip):
+			released = self._release()
+			self._held = [line]
+			return released
+
+		if self._held:
+			if self.isPresent(strip):
+				self.result = "Already present"
+				return self._release() + [line]
+			self._held.append(line)
+			return []
+
+		return [line]
+
+	def finish(self) -> list[str]:
+		if not self._held:
+			return []
+
+		marker = self._held[0]
+		self.result = "Inserted"
+		return [marker, f"{getIndent(marker)}{self.newLine}{_lineEnding(marker)}"] + self._held[1:]
+
+
+class SetValueRule(LineRule):
+	"""Make the first line containing the quoted key `key` have the value `value`."""
+
+	def __init__(self, key: str, value: str) -> None:
+		self.key = key
+		self.value = value
+		self._done = False
+		self.result = "Key not found"
+
+	def feed(self, line: str, strip: str) -> list[str]:
+		if self._done or f'"{self.key.lower()}"' not in strip:
+			return [line]
+
+		self._done = True
+		if f'"{self.value.lower()}"' in strip:
+			self.result = "Already set"
+			return [line]
+
+		self.result = "Changed"
+		return [f'{getIndent(line)}"{self.key}" "{self.value}"{_lineEnding(line)}']
+
+
+class PatchResult(NamedTuple):
+	changed: bool
+	diff: str
+
+
+def patchFile(
+	filePath: str, rules: list[LineRule], dryRun: bool = False, encoding: str = "utf8"
+) -> PatchResult:
+	"""
+	Apply the rules to the file in a single pass over its lines.
+
+	If the new contents have the same hash as the old ones, the file is not written. Otherwise they are written
+	to a temporary file which then replaces the original one, so the file is never left half written.
+	With `dryRun`, nothing is written, and only the diff is returned.
+	"""
+
+	from srctools import clean_line
+
+	oldHash = hashlib.sha256()
+	newHash = hashlib.sha256()
+	oldLines: list[str] = []
+	newLines: list[str] = []
+
+	def emit(lines: list[str]):
+		for line in lines:
+			newHash.update(line.encode(encoding, "surrogateescape"))
+			newLines.append(line)
+
+	with open(filePath, encoding=encoding, errors="surrogateescape", newline="") as file:
+		for line in file:
+			oldHash.update(line.encode(encoding, "surrogateescape"))
+			oldLines.append(line)
+
+			lines = [line]
+			strip = clean_line(line).lower()
+			for rule in rules:
+				lines = [
+					out
+					for current in lines
+					for out in rule.feed(current, strip if current is line else clean_line(current).lower())
+				]
+			emit(lines)
+
+	# Lines held back by a rule still have to go through the rules after it
+	for index, rule in enumerate(rules):
+		lines = rule.finish()
+		for nextRule in rules[index + 1 :]:
+			lines = [out for current in lines for out in nextRule.feed(current, clean_line(current).lower())]
+		emit(lines)
+
+	if oldHash.digest() == newHash.digest():
+		return PatchResult(False, "")
+
+	diff = "".join(
+		difflib.unified_diff(
+			[line.rstrip("\r\n") + "\n" for line in oldLines],
+			[line.rstrip("\r\n") + "\n" for line in newLines],
+			filePath,
+			filePath,
+		)
+	)
+
+	if not dryRun:
+		from shutil import copymode
+		from tempfile import NamedTemporaryFile
+
+		with NamedTemporaryFile(
+			"w",
+			dir=path.dirname(path.abspath(filePath)),
+			encoding=encoding,
+			errors="surrogateescape",
+			newline="",
+			delete=False,
+		) as file:
+			file.writelines(newLines)
+		copymode(filePath, file.name)
+		replace(file.name, filePath)
+
+	return PatchResult(True, diff)
@@ -0,0 +1,281 @@
+import os
+import select
+import sys
+from os import path
+from time import monotonic, sleep
+from typing import Optional
+
+
+__all__ = [
+	"ProcessQuery",
+	"WindowsProcessQuery",
+	"ProcfsProcessQuery",
+	"getProcessQuery",
+]
+
+
+class ProcessQuery:
+	"""
+	Base class for the process query backends. They list the running processes without spawning any
+	subprocess or using temporary files.
+	"""
+
+	# Maximum time between two checks when polling for processes to exit
+	MAX_POLL_INTERVAL = 0.5
+
+	def listProcesses(self) -> list[tuple[int, str]]:
+		"""Return a list of `(pid, name)` tuples with all the running processes."""
+		raise NotImplementedError
+
+	def _matches(self, name: str, process: str) -> bool:
+		return name == process
+
+	def findProcesses(self, process: str) -> list[int]:
+		"""Return the PIDs of all the processes with the name given, including extension."""
+		return [pid for pid, name in self.listProcesses() if self._matches(name, process)]
+
+	def isRunning(self, process: str) -> bool:
+		"""Return `True` if there is any process running with the name given, including extension."""
+		return bool(self.findProcesses(process))
+
+	def _waitPids(self, pids: list[int], timeout: Optional[float]) -> bool:
+		"""Wait until all the processes in `pids` exit. Returns `False` if the timeout expired first."""
+
+		interval = 0.05
+		deadline = None if timeout is None else monotonic() + timeout
+
+		while any(self._pidExists(pid) for pid in pids):
+			if deadline is not None and monotonic() >= deadline:
+				return False
+			sleep(interval if deadline is None else min(interval, max(deadline - monotonic(), 0)))
+			interval = min(interval * 2, self.MAX_POLL_INTERVAL)
+
+		return True
+
+	def _pidExists(self, pid: int) -> bool:
+		raise NotImplementedError
+
+	def waitForExit(self, process: str, timeout: float = None) -> bool:
+		"""
+		Wait until there are no processes running with the name given.
+
+		- `timeout` is the maximum number of seconds to wait. `None` waits forever.
+
+		Returns `True` if no process with that name is running, or `False` if the timeout expired first.
+		"""
+
+		deadline = None if timeout is None else monotonic() + timeout
+
+		while pids := self.findProcesses(process):
+			remaining = None if deadline is None else max(deadline - monotonic(), 0)
+			if not self._waitPids(pids, remaining):
+				return False
+
+		return True
+
+
+class WindowsProcessQuery(ProcessQuery):
+	"""
+	Lists processes with the Toolhelp32 API, and waits for them to exit with `WaitForMultipleObjects`. Processes
+	which can't be waited for that way, like the ones of other users, are polled.
+	"""
+
+	_SNAPPROCESS = 0x2
+	_SYNCHRONIZE = 0x00100000
+	_WAIT_TIMEOUT = 0x102
+	_WAIT_FAILED = 0xFFFFFFFF
+	_ERROR_ACCESS_DENIED = 5
+	_MAXIMUM_WAIT_OBJECTS = 64
+	# Longest single wait, so that Ctrl+C isn't blocked until the processes exit
+	WAIT_SLICE = 0.25
+
+	def __init__(self) -> None:
+		import ctypes
+		from ctypes import wintypes
+
+		class PROCESSENTRY32W(ctypes.Structure):
+			_fields_ = [
+				("dwSize", wintypes.DWORD),
+				("cntUsage", wintypes.DWORD),
+				("th32ProcessID", wintypes.DWORD),
+				("th32DefaultHeapID", ctypes.c_size_t),
+				("th32ModuleID", wintypes.DWORD),
+				("cntThreads", wintypes.DWORD),
+				("th32ParentProcessID", wintypes.DWORD),
+				("pcPriClassBase", wintypes.LONG),
+				("dwFlags", wintypes.DWORD),
+				("szExeFile", wintypes.WCHAR * 260),
+			]
+
+		self._ctypes = ctypes
+		self._entryType = PROCESSENTRY32W
+		self._kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+		# Handles are pointer sized, so they would be truncated as the default `c_int` on 64-bit systems
+		self._kernel32.CreateToolhelp32Snapshot.argtypes = (wintypes.DWORD, wintypes.DWORD)
+		self._kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+		self._kernel32.Process32FirstW.argtypes = (wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W))
+		self._kernel32.Process32FirstW.restype = wintypes.BOOL
+		self._kernel32.Process32NextW.argtypes = (wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W))
+		self._kernel32.Process32NextW.restype = wintypes.BOOL
+		self._kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+		self._kernel32.OpenProcess.restype = wintypes.HANDLE
+		self._kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+		self._kernel32.CloseHandle.restype = wintypes.BOOL
+		self._kernel32.WaitForMultipleObjects.argtypes = (
+			wintypes.DWORD,
+			ctypes.POINTER(wintypes.HANDLE),
+			wintypes.BOOL,
+			wintypes.DWORD,
+		)
+		self._kernel32.WaitForMultipleObjects.restype = wintypes.DWORD
+		self._kernel32.WaitForSingleObject.argtypes = (wintypes.HANDLE, wintypes.DWORD)
+		self._kernel32.WaitForSingleObject.restype = wintypes.DWORD
+
+	def listProcesses(self) -> list[tuple[int, str]]:
+		ctypes = self._ctypes
+		snapshot = self._kernel32.CreateToolhelp32Snapshot(self._SNAPPROCESS, 0)
+		if snapshot in {None, ctypes.c_void_p(-1).value}:
+			raise ctypes.WinError(ctypes.get_last_error())
+
+		processes: list[tuple[int, str]] = []
+		entry = self._entryType()
+		entry.dwSize = ctypes.sizeof(entry)
+
+		try:
+			found = self._kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+			while found:
+				processes.append((entry.th32ProcessID, entry.szExeFile))
+				found = self._kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+		finally:
+			self._kernel32.CloseHandle(snapshot)
+
+		return processes
+
+	def _matches(self, name: str, process: str) -> bool:
+		return name.lower() == process.lower()
+
+	def _pidExists(self, pid: int) -> bool:
+		handle = self._kernel32.OpenProcess(self._SYNCHRONIZE, False, pid)
+		if not handle:
+			# Processes of other users may not be opened, but they exist
+			return self._ctypes.get_last_error() == self._ERROR_ACCESS_DENIED
+
+		try:
+			return self._kernel32.WaitForSingleObject(handle, 0) == self._WAIT_TIMEOUT
+		finally:
+			self._kernel32.CloseHandle(handle)
+
+	def _waitPids(self, pids: list[int], timeout: Optional[float]) -> bool:
+		from ctypes import wintypes
+
+		deadline = None if timeout is None else monotonic() + timeout
+		handles = [
+			handle
+			for handle in (
+				self._kernel32.OpenProcess(self._SYNCHRONIZE, False, pid)
+				for pid in pids[: self._MAXIMUM_WAIT_OBJECTS]
+			)
+			if handle
+		]
+		if not handles:
+			# None of them could be opened, so poll them until they are gone
+			return super()._waitPids(pids, timeout)
+
+		try:
+			handleArray = (wintypes.HANDLE * len(handles))(*handles)
+			while True:
+				remaining = None if deadline is None else max(deadline - monotonic(), 0)
+				waitTime = self.WAIT_SLICE if remaining is None else min(remaining, self.WAIT_SLICE)
+				result = self._kernel32.WaitForMultipleObjects(
+					len(handles), handleArray, True, int(waitTime * 1000)
+				)
+				if result != self._WAIT_TIMEOUT or waitTime == remaining:
+					break
+		finally:
+			for handle in handles:
+				self._kernel32.CloseHandle(handle)
+
+		if result == self._WAIT_FAILED:
+			return super()._waitPids(pids, None if deadline is None else max(deadline - monotonic(), 0))
+		return result != self._WAIT_TIMEOUT
+
+
+class ProcfsProcessQuery(ProcessQuery):
+	"""
+	Lists processes by reading `/proc`. Waits for them to exit with pidfds when the system supports them,
+	otherwise by polling.
+	"""
+
+	def __init__(self, root: str = "/proc") -> None:
+		self.root = root
+
+	def _processName(self, pid: str) -> Optional[str]:
+		# "comm" is truncated to 15 characters, so the name is taken from the command line when possible
+		try:
+			with open(path.join(self.root, pid, "stat"), "rb") as file:
+				# Zombie processes have already exited
+				if file.read().rpartition(b")")[2].split()[0] == b"Z":
+					return None
+
+			with open(path.join(self.root, pid, "cmdline"), "rb") as file:
+				argv0 = file.read().split(b"\0", 1)[0].decode(errors="replace")
+			if argv0:
+				return path.basename(argv0.replace("\\", "/"))
+
+			with open(path.join(self.root, pid, "comm")) as file:
+				return file.read().strip()
+		except OSError:
+			# The process exited while listing them
+			return None
+
+	def listProcesses(self) -> list[tuple[int, str]]:
+		processes: list[tuple[int, str]] = []
+
+		for entry in os.scandir(self.root):
+			if not entry.name.isdigit():
+				continue
+			name = self._processName(entry.name)
+			if name is not None:
+				processes.append((int(entry.name), name))
+
+		return processes
+
+	def _pidExists(self, pid: int) -> bool:
+		return self._processName(str(pid)) is not None
+
+	def _waitPids(self, pids: list[int], timeout: Optional[float]) -> bool:
+		if not hasattr(os, "pidfd_open") or self.root != "/proc":
+			return super()._waitPids(pids, timeout)
+
+		fds: list[int] = []
+		try:
+			for pid in pids:
+				try:
+					fds.append(os.pidfd_open(pid))
+				except ProcessLookupError:
+					pass
+				except OSError:
+					return super()._waitPids(pids, timeout)
+
+			# A pidfd becomes readable once its process exits
+			deadline = None if timeout is None else monotonic() + timeout
+			pending = set(fds)
+			while pending:
+				remaining = None if deadline is None else max(deadline - monotonic(), 0)
+				ready, _, _ = select.select(list(pending), [], [], remaining)
+				if not ready:
+					return False
+				pending.difference_update(ready)
+		finally:
+			for fd in fds:
+				os.close(fd)
+
+		return True
+
+
+def getProcessQuery() -> ProcessQuery:
+	"""Return the process query backend for the current platform."""
+
+	if sys.platform == "win32":
+		return WindowsProcessQuery()
+	return ProcfsProcessQuery()
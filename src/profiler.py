@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Iterator
+
+
+__all__ = ["Span", "Profiler"]
+
+
+class Span:
+	"""A timed part of the installation, with counters like the bytes and files it handled."""
+
+	def __init__(self, name: str, args: dict) -> None:
+		self.name = name
+		self.args = args
+		self.start = 0.0
+		self.end = 0.0
+		self.thread = threading.current_thread()
+
+	@property
+	def duration(self) -> float:
+		return self.end - self.start
+
+	def add(self, **values):
+		"""Add numbers to the counters of the span. Other values are just set."""
+
+		for key, value in values.items():
+			if isinstance(value, (int, float)) and not isinstance(value, bool):
+				self.args[key] = self.args.get(key, 0) + value
+			else:
+				self.args[key] = value
+
+
+class Profiler:
+	"""
+	Records timing spans. Spans can be nested, and may be opened from several threads at once.
+	When the profiler is not enabled, spans are not timed nor stored.
+	"""
+
+	def __init__(self, enabled: bool = False) -> None:
+		self.enabled = enabled
+		self.spans: list[Span] = []
+		self.origin = perf_counter()
+		self._lock = threading.Lock()
+		self._local = threading.local()
+
+	def start(self):
+		"""Enable the profiler, counting the time from now."""
+
+		self.enabled = True
+		self.origin = perf_counter()
+
+	def _stack(self) -> list[Span]:
+		if not hasattr(self._local, "stack"):
+			self._local.stack = []
+		return self._local.stack
+
+	@contextmanager
+	def span(self, name: str, **args) -> Iterator[Span]:
+		"""
+		Time the code inside the `with` block, or the decorated function. `args` are the initial counters
+		and values of the span.
+		"""
+
+		span = Span(name, args)
+		if not self.enabled:
+			yield span
+			return
+
+		stack = self._stack()
+		stack.append(span)
+		span.start = perf_counter()
+		try:
+			yield span
+		finally:
+			span.end = perf_counter()
+			stack.pop()
+			with self._lock:
+				self.spans.append(span)
+
+	def add(self, **values):
+		"""Add counters to the innermost span open in this thread, if any."""
+
+		stack = self._stack() if self.enabled else None
+		if stack:
+			stack[-1].add(**values)
+
+	def traceEvents(self) -> list[dict]:
+		"""Return the spans as Chrome trace events (the format read by `chrome://tracing` and Perfetto)."""
+
+		pid = os.getpid()
+		threads = {}
+		events = []
+		for span in sorted(self.spans, key=lambda span: span.start):
+			threads[span.thread.ident] = span.thread.name
+			events.append(
+				{
+					"name": span.name,
+					"cat": "phase",
+					"ph": "X",
+					"ts": round((span.start - self.origin) * 1e6, 1),
+					"dur": round(span.duration * 1e6, 1),
+					"pid": pid,
+					"tid": span.thread.ident,
+					"args": span.args,
+				}
+			)
+
+		metadata = [
+			{"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}}
+			for ident, name in threads.items()
+		]
+		return metadata + events
+
+	def writeTrace(self, filePath: str):
+		with open(filePath, "w") as file:
+			json.dump({"traceEvents": self.traceEvents(), "displayTimeUnit": "ms"}, file)
+
+	def summary(self) -> str:
+		"""
+		Return a single line with the total time of every kind of span, in the order they started, and the
+		bytes and files they handled. Spans that ran at the same time in several threads are added up.
+		"""
+
+		totals: dict[str, list] = {}
+		for span in sorted(self.spans, key=lambda span: span.start):
+			total = totals.setdefault(span.name, [0.0, 0, 0])
+			total[0] += span.duration
+			total[1] += span.args.get("bytes", 0)
+			total[2] += span.args.get("files", 0)
+
+		columns = []
+		for name, (duration, size, files) in totals.items():
+			column = f"{name} {duration * 1000:.0f}ms"
+			if size:
+				column += f" {size / 1024**2:.1f}MiB" if size >= 1024**2 else f" {size / 1024:.1f}KiB"
+			if files:
+				column += f" {files} files"
+			columns.append(column)
+
+		end = max((span.end for span in self.spans), default=self.origin)
+		columns.append(f"total {(end - self.origin) * 1000:.0f}ms")
+		return " | ".join(columns)
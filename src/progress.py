@@ -0,0 +1,144 @@
+import threading
+from time import monotonic
+from typing import Callable, Optional
+
+
+__all__ = ["TASKS", "RateMeter", "ProgressTask", "Progress"]
+
+
+# The tasks of the download phase and their units: bytes downloaded, bytes decompressed from the zip, and files placed
+TASKS = {"download": "bytes", "inflate": "bytes", "place": "files"}
+
+
+class RateMeter:
+	"""
+	Smoothed rate of a counter, in units per second. Every new sample is weighted by the time since the last
+	one, so samples `halfLife` seconds old count half as much as the newest one. The weights are normalized,
+	so the first estimates are the average rate so far instead of leaning to the first sample.
+	"""
+
+	def __init__(self, halfLife: float = 2.0) -> None:
+		self.halfLife = halfLife
+		self.rate: Optional[float] = None
+		self._last: Optional[tuple[float, float]] = None
+		self._weightedSum = 0.0
+		self._weight = 0.0
+
+	def update(self, value: float, now: float = None):
+		"""Add a sample of the counter, which is `value` at the time `now` (`monotonic()` by default)."""
+
+		now = monotonic() if now is None else now
+		if self._last is None:
+			self._last = (now, value)
+			return
+
+		elapsed = now - self._last[0]
+		if elapsed <= 0:
+			return
+		decay = 0.5 ** (elapsed / self.halfLife)
+		self._weightedSum = self._weightedSum * decay + (value - self._last[1]) / elapsed * (1 - decay)
+		self._weight = self._weight * decay + (1 - decay)
+		self.rate = self._weightedSum / self._weight
+		self._last = (now, value)
+
+	def eta(self, remaining: float) -> Optional[float]:
+		"""Return the seconds left to count `remaining` more units at the current rate, or `None` if it isn't known."""
+
+		if remaining <= 0:
+			return 0.0
+		return remaining / self.rate if self.rate else None
+
+
+class ProgressTask:
+	"""
+	Counter of the progress of a task, like the bytes downloaded, with its smoothed rate. It can be updated from
+	several threads at once.
+	"""
+
+	# Phase of the installation the tasks belong to. They may run in the background during the earlier ones.
+	phase = "download"
+
+	def __init__(self, owner: "Progress", name: str, unit: str) -> None:
+		self.owner = owner
+		self.name = name
+		self.unit = unit
+		self.done = 0
+		self.total: Optional[int] = None
+		self.meter = RateMeter()
+		self._lock = threading.Lock()
+		self._lastReport = 0.0
+
+	@property
+	def rate(self) -> Optional[float]:
+		"""Smoothed rate, in units per second."""
+		return self.meter.rate
+
+	@property
+	def eta(self) -> Optional[float]:
+		"""Estimated seconds left, if the total and the rate are known."""
+		return None if self.total is None else self.meter.eta(self.total - self.done)
+
+	@property
+	def fraction(self) -> float:
+		"""How much of the task is done, from 0 to 1. Tasks that weren't started are at 0."""
+
+		if self.total is None:
+			return 0.0
+		return min(1.0, self.done / self.total) if self.total else 1.0
+
+	def start(self, total: Optional[int], done: int = 0):
+		"""
+		Start the task (again) with the `total` given, if known, and `done` units already done, like a resumed
+		download.
+		"""
+
+		with self._lock:
+			self.total = total
+			self.done = done
+			self.meter = RateMeter()
+			self._lastReport = monotonic()
+			self.meter.update(done, self._lastReport)
+		self.owner._report(self)
+
+	def add(self, amount: int):
+		"""Count `amount` more units done."""
+
+		with self._lock:
+			self.done += amount
+			now = monotonic()
+			finished = self.total is not None and self.done >= self.total
+			if not finished and now - self._lastReport < self.owner.interval:
+				return
+			self._lastReport = now
+			self.meter.update(self.done, now)
+		self.owner._report(self)
+
+
+class Progress:
+	"""
+	Progress of the tasks of the installation (see `TASKS`). Every change of a task is sent to `callback(task)`,
+	at most every `interval` seconds for each task, and always when a task starts or finishes.
+	"""
+
+	def __init__(self, callback: Callable[[ProgressTask], None] = None, interval: float = 0.1) -> None:
+		self.callback = callback
+		self.interval = interval
+		self.tasks: dict[str, ProgressTask] = {}
+		self._lock = threading.Lock()
+
+	def task(self, name: str) -> ProgressTask:
+		"""Return the task called `name`, one of `TASKS`, creating it if needed."""
+
+		with self._lock:
+			if name not in self.tasks:
+				self.tasks[name] = ProgressTask(self, name, TASKS[name])
+			return self.tasks[name]
+
+	@property
+	def fraction(self) -> float:
+		"""How much of all the `TASKS` is done, from 0 to 1."""
+		return sum(self.task(name).fraction for name in TASKS) / len(TASKS)
+
+	def _report(self, task: ProgressTask):
+		if self.callback is not None:
+			self.callback(task)
@@ -0,0 +1,257 @@
+from bisect import bisect_left, bisect_right
+from typing import Generic, Iterable, Iterator, NamedTuple, Optional, TypeVar
+
+from network import HttpClient, HttpResponse, fetchJsonPage, sharedClient
+from utils import Version
+
+
+__all__ = [
+	"MIRROR_ENV",
+	"DEFAULT_MIRROR_PORT",
+	"parseVersionSpec",
+	"isExactSpec",
+	"ReleaseIndex",
+	"ReleaseInfo",
+	"projectReleases",
+	"iterReleasePages",
+	"ReleaseSource",
+	"mirrorSource",
+]
+
+
+MIRROR_ENV = "HAINSTALLER_MIRROR"
+DEFAULT_MIRROR_PORT = 8750
+
+T = TypeVar("T")
+
+# Longest operators first, so `>=` isn't read as `>`
+_OPERATORS = ("==", "!=", ">=", "<=", ">", "<")
+
+
+def parseVersionSpec(spec: str) -> list[tuple[str, Version]]:
+	"""
+	Parse a version specifier into a list of `(operator, version)` constraints, which all must match.
+
+	The specifier is `latest`, a single version like `2.5.1` (the same as `==2.5.1`), or a comma separated
+	list of constraints like `>=2.4,<3`. `ValueError` is raised if a constraint has no version.
+	"""
+
+	if spec.strip().lower() == "latest":
+		return []
+
+	constraints = []
+	for part in spec.split(","):
+		part = part.strip()
+		operator = next((op for op in _OPERATORS if part.startswith(op)), "==")
+		value = part[len(operator) :].strip() if part.startswith(operator) else part
+		if not any(char.isdigit() for char in value):
+			raise ValueError(f"invalid version constraint '{part}'")
+		constraints.append((operator, Version(value)))
+	return constraints
+
+
+def isExactSpec(spec: str) -> bool:
+	"""Return whether the specifier only matches a single version, like `2.5.1` or `==2.5.1`."""
+
+	constraints = parseVersionSpec(spec)
+	return len(constraints) == 1 and constraints[0][0] == "=="
+
+
+class ReleaseIndex(Generic[T]):
+	"""
+	Releases sorted by version, each one with a value attached (like its download URL).
+	Queries use binary search over the sorted version keys.
+	"""
+
+	def __init__(self, releases: Iterable[tuple[Version, T]] = ()) -> None:
+		items = sorted(releases, key=lambda item: item[0].key)
+		self._keys = [version.key for version, _ in items]
+		self._versions = [version for version, _ in items]
+		self._values = [value for _, value in items]
+
+	def add(self, version: Version, value: T = None):
+		"""Add a release, replacing the value of the same version if it is already there."""
+
+		index = bisect_left(self._keys, version.key)
+		if index < len(self._keys) and self._keys[index] == version.key:
+			self._values[index] = value
+			return
+
+		self._keys.insert(index, version.key)
+		self._versions.insert(index, version)
+		self._values.insert(index, value)
+
+	def __len__(self) -> int:
+		return len(self._keys)
+
+	def __iter__(self) -> Iterator[tuple[Version, T]]:
+		"""Iterate over the releases from the oldest to the newest."""
+		return zip(self._versions, self._values)
+
+	def __contains__(self, version: Version) -> bool:
+		return self.get(version) is not None
+
+	def versions(self) -> list[Version]:
+		return list(self._versions)
+
+	def get(self, version: Version) -> Optional[tuple[Version, T]]:
+		"""Return the release of the version given, or `None` if there isn't one."""
+
+		index = bisect_left(self._keys, version.key)
+		if index < len(self._keys) and self._keys[index] == version.key:
+			return (self._versions[index], self._values[index])
+		return None
+
+	def _bounds(self, spec: str) -> tuple[int, int, set]:
+		"""Return the range of indexes matching the specifier, and the keys excluded with `!=`."""
+
+		low, high = 0, len(self._keys)
+		excluded = set()
+
+		for operator, version in parseVersionSpec(spec):
+			key = version.key
+			if operator == "==":
+				low = max(low, bisect_left(self._keys, key))
+				high = min(high, bisect_right(self._keys, key))
+			elif operator == ">=":
+				low = max(low, bisect_left(self._keys, key))
+			elif operator == ">":
+				low = max(low, bisect_right(self._keys, key))
+			elif operator == "<=":
+				high = min(high, bisect_right(self._keys, key))
+			elif operator == "<":
+				high = min(high, bisect_left(self._keys, key))
+			else:
+				excluded.add(key)
+
+		return low, high, excluded
+
+	def best(self, spec: str) -> Optional[tuple[Version, T]]:
+		"""Return the newest release matching the specifier, or `None` if none does."""
+
+		low, high, excluded = self._bounds(spec)
+		for index in range(high - 1, low - 1, -1):
+			if self._keys[index] not in excluded:
+				return (self._versions[index], self._values[index])
+		return None
+
+
+class ReleaseInfo(NamedTuple):
+	"""The values of a release that the installer uses."""
+
+	tag: Version
+	url: str
+	size: Optional[int]
+	digest: Optional[str]
+
+
+def _pickAsset(assets: list[dict]) -> Optional[dict]:
+	"""Return the zip asset of a release, or its first asset if none of them is a zip."""
+
+	for asset in assets:
+		if asset.get("name", asset.get("browser_download_url", "")).lower().endswith(".zip"):
+			return asset
+	return assets[0] if assets else None
+
+
+def projectReleases(data: list[dict]) -> list[dict]:
+	"""
+	Keep only the tag and the zip asset's URL, size and digest of every release in a page of the GitHub
+	releases API, with the same structure. Releases without assets are left out.
+	"""
+
+	releases = []
+	for release in data:
+		asset = _pickAsset(release.get("assets") or [])
+		if asset is None:
+			continue
+		releases.append(
+			{
+				"tag_name": release["tag_name"],
+				"assets": [
+					{
+						"name": asset.get("name"),
+						"browser_download_url": asset["browser_download_url"],
+						"size": asset.get("size"),
+						"digest": asset.get("digest"),
+					}
+				],
+			}
+		)
+	return releases
+
+
+def iterReleasePages(url: str, cache=None, client: HttpClient = None) -> Iterator[list[ReleaseInfo]]:
+	"""
+	Yield the releases of the GitHub releases API at `url` a page at a time, following the `Link: rel="next"`
+	headers. Pages are only requested when the previous one has been consumed, so the caller can stop
+	early. `cache` is an optional `MetadataCache` for the pages.
+	"""
+
+	while url:
+		data, url = fetchJsonPage(url, cache, projectReleases, client)
+		yield [
+			ReleaseInfo(
+				Version(release["tag_name"]),
+				release["assets"][0]["browser_download_url"],
+				release["assets"][0]["size"],
+				release["assets"][0]["digest"],
+			)
+			for release in data
+		]
+
+
+class ReleaseSource:
+	"""
+	A place where the releases and `srctools.vdf` are downloaded from: GitHub, or a mirror with the same layout.
+
+	- `releasesUrl` is the URL of the release list, in the format of the GitHub releases API. Asset URLs in it
+	may be relative to it.
+	- `cache` is an optional `MetadataCache` for the release list.
+	- `client` is the `HttpClient` used, by default the shared one.
+	"""
+
+	def __init__(
+		self, name: str, releasesUrl: str, vdfUrl: str, cache=None, client: HttpClient = None
+	) -> None:
+		self.name = name
+		self.releasesUrl = releasesUrl
+		self.vdfUrl = vdfUrl
+		self.cache = cache
+		self.client = client or sharedClient()
+
+	def __str__(self) -> str:
+		return self.name
+
+	def iterReleases(self) -> Iterator[list[ReleaseInfo]]:
+		"""Yield the releases a page at a time, like `iterReleasePages()`, with absolute asset URLs."""
+
+		from urllib.parse import urljoin
+
+		for page in iterReleasePages(self.releasesUrl, self.cache, self.client):
+			yield [release._replace(url=urljoin(self.releasesUrl, release.url)) for release in page]
+
+	def open(self, url: str) -> HttpResponse:
+		"""Open a file of the source, like an asset or `vdfUrl`, for reading."""
+		return self.client.open(url)
+
+
+def mirrorSource(location: str, client: HttpClient = None) -> ReleaseSource:
+	"""
+	Return the source for the mirror at `location`, which is an HTTP(S) URL or a local folder. The mirror has
+	`releases.json`, with the releases in the format of the GitHub releases API, `srctools.vdf`, and the
+	assets at the URLs listed, which may be relative to the mirror (like `assets/2.6.0.zip`).
+	This is the layout served by `MirrorServer`.
+	"""
+
+	from urllib.parse import urlsplit
+
+	if urlsplit(location).scheme in {"http", "https", "file"}:
+		base = location
+	else:
+		from pathlib import Path
+
+		base = Path(location).resolve().as_uri()
+	base = base.rstrip("/") + "/"
+
+	return ReleaseSource(f"mirror '{location}'", base + "releases.json", base + "srctools.vdf", client=client)
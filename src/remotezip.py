@@ -0,0 +1,225 @@
+import io
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from network import DEFAULT_BUFFER_SIZE, HttpClient, isTransient, parseContentRange
+
+if TYPE_CHECKING:
+	from zipfile import ZipFile, ZipInfo
+
+	from progress import Progress, ProgressTask
+
+
+__all__ = ["TAIL_SIZE", "MERGE_GAP", "RangesNotSupported", "RemoteFile", "mergeRanges"]
+
+
+# Bytes requested from the end of the file when it is opened. The end of central directory record is at most
+# 64 KiB from the end, and the central directory of a release usually fits in the rest.
+TAIL_SIZE = 128 * 1024
+# Ranges closer than this are fetched with a single request, since a request costs more than the bytes between them
+MERGE_GAP = 64 * 1024
+# Bytes read after a position which isn't fetched yet, so reading a zip header doesn't take a request per field
+_READ_AHEAD = 16 * 1024
+
+
+class RangesNotSupported(OSError):
+	"""The server didn't answer a `Range` request with the range asked for."""
+
+
+def mergeRanges(ranges: Iterable[tuple[int, int]], gap: int = MERGE_GAP) -> list[tuple[int, int]]:
+	"""Sort the `(start, end)` ranges given, with `end` excluded, and merge the ones less than `gap` bytes apart."""
+
+	merged: list[tuple[int, int]] = []
+	for start, end in sorted(ranges):
+		if merged and start - merged[-1][1] < gap:
+			merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+		else:
+			merged.append((start, end))
+	return merged
+
+
+class RemoteFile(io.RawIOBase):
+	"""
+	Read-only file over HTTP, which only downloads the parts that are read, with `Range` requests. It can be
+	opened with `ZipFile`, which reads the central directory from the end of the file, so a zip can be
+	listed and some of its members extracted without downloading the whole of it.
+
+	Fetched data is kept in memory. `prefetchMembers()` downloads the members that will be read beforehand,
+	with as few requests as possible.
+
+	- `size` is the size of the file, if known.
+	- `connections` is the number of requests sent at the same time by `prefetchMembers()`.
+
+	`RangesNotSupported` is raised if the server doesn't support ranges, and when the file changed on the
+	server since it was opened.
+	"""
+
+	def __init__(
+		self, client: HttpClient, url: str, size: int = None, name: str = None, connections: int = 4
+	) -> None:
+		super().__init__()
+		self.client = client
+		self.url = url
+		self.name = name or url.rsplit("/", 1)[-1]
+		self.connections = connections
+		self.bytesFetched = 0
+		self.requests = 0
+		self._position = 0
+		self._etag: Optional[str] = None
+		# Fetched parts of the file, sorted and without overlaps
+		self._starts: list[int] = []
+		self._chunks: list[bytes] = []
+		self._lock = threading.Lock()
+
+		# The tail has the central directory, and tells the size of the file if it isn't known
+		if size is not None:
+			self.size = size
+			if size:
+				self._fetch(max(0, size - TAIL_SIZE), size)
+		else:
+			self.size = 0
+			self._fetch(-TAIL_SIZE, None)
+
+	def readable(self) -> bool:
+		return True
+
+	def seekable(self) -> bool:
+		return True
+
+	def tell(self) -> int:
+		return self._position
+
+	def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+		if whence == io.SEEK_CUR:
+			offset += self._position
+		elif whence == io.SEEK_END:
+			offset += self.size
+		if offset < 0:
+			raise ValueError(f"negative seek position {offset}")
+		self._position = offset
+		return offset
+
+	def _request(self, start: int, end: Optional[int], task: "ProgressTask" = None) -> bytes:
+		"""
+		Download the bytes from `start` to `end` (excluded). A negative `start` without `end` asks for the last
+		`-start` bytes. Transient errors are retried like the client does. The bytes received are counted in `task`.
+		"""
+
+		headers = {"Range": f"bytes={start}-{end - 1}" if end is not None else f"bytes={start}"}
+		if self._etag:
+			headers["If-Range"] = self._etag
+
+		failures = 0
+		while True:
+			data = bytearray()
+			try:
+				response = self.client.open(self.url, headers)
+				with response:
+					contentRange = parseContentRange(response.headers.get("Content-Range"))
+					if response.status != 206 or contentRange is None or (start >= 0 and contentRange[0] != start):
+						raise RangesNotSupported(
+							f"the server didn't send the range requested of '{self.url}'"
+							+ (" (the file changed)" if self._etag else "")
+						)
+					while chunk := response.read(DEFAULT_BUFFER_SIZE):
+						data += chunk
+						if task is not None:
+							task.add(len(chunk))
+				break
+			except Exception as error:
+				if task is not None and data:
+					# The range is requested again from the start
+					task.add(-len(data))
+				if isinstance(error, RangesNotSupported) or not isTransient(error) or failures >= self.client.retries:
+					raise
+				self.client.waitBeforeRetry(failures)
+				failures += 1
+
+		with self._lock:
+			self.requests += 1
+			self.bytesFetched += len(data)
+			if self._etag is None:
+				self._etag = response.headers.get("ETag")
+			if end is None:
+				self.size = contentRange[2]
+		return bytes(data)
+
+	def _fetch(self, start: int, end: Optional[int], task: "ProgressTask" = None):
+		"""Download a part of the file and keep it. It must not overlap the parts already fetched."""
+
+		data = self._request(start, end, task)
+		if end is None:
+			start = self.size - len(data)
+
+		with self._lock:
+			index = bisect_right(self._starts, start)
+			self._starts.insert(index, start)
+			self._chunks.insert(index, data)
+
+	def _missing(self, start: int, end: int) -> list[tuple[int, int]]:
+		"""Return the parts between `start` and `end` which haven't been fetched."""
+
+		missing = []
+		with self._lock:
+			index = max(0, bisect_right(self._starts, start) - 1)
+			for chunkStart, chunk in zip(self._starts[index:], self._chunks[index:]):
+				if chunkStart >= end:
+					break
+				if chunkStart > start:
+					missing.append((start, chunkStart))
+				start = max(start, chunkStart + len(chunk))
+		if start < end:
+			missing.append((start, end))
+		return missing
+
+	def readinto(self, buffer) -> int:
+		view = memoryview(buffer).cast("B")
+		end = min(self._position + len(view), self.size)
+		if end <= self._position:
+			return 0
+
+		if self._missing(self._position, end):
+			# Read a bit more than asked, only when a request has to be sent anyway
+			for start, stop in self._missing(self._position, min(max(end, self._position + _READ_AHEAD), self.size)):
+				self._fetch(start, stop)
+
+		written = 0
+		with self._lock:
+			index = bisect_right(self._starts, self._position) - 1
+			while self._position < end:
+				chunkStart, chunk = self._starts[index], self._chunks[index]
+				offset = self._position - chunkStart
+				count = min(len(chunk) - offset, end - self._position)
+				view[written : written + count] = chunk[offset : offset + count]
+				written += count
+				self._position += count
+				index += 1
+		return written
+
+	def prefetchMembers(self, zipfile: "ZipFile", members: Iterable["ZipInfo"], progress: "Progress" = None):
+		"""
+		Download the members of `zipfile` (opened from this file) given, so extracting them doesn't send any
+		more requests. Members close to each other are fetched together, and up to `connections` requests
+		are sent at the same time.
+
+		- `progress` is a `Progress` where the bytes downloaded are counted, in the `download` task.
+		"""
+
+		# A member goes from its local header until the next member, or the central directory
+		offsets = sorted({info.header_offset for info in zipfile.infolist()} | {zipfile.start_dir})
+		ranges = []
+		for info in members:
+			start = info.header_offset
+			ranges.append((start, offsets[bisect_right(offsets, start)] if start < offsets[-1] else self.size))
+
+		parts = [part for start, end in mergeRanges(ranges) for part in self._missing(start, end)]
+		task = progress.task("download") if progress is not None else None
+		if task is not None:
+			task.start(sum(end - start for start, end in parts))
+		if not parts:
+			return
+		with ThreadPoolExecutor(min(self.connections, len(parts)), thread_name_prefix="prefetch") as pool:
+			for _ in pool.map(lambda part: self._fetch(*part, task), parts):
+				pass
@@ -1,9 +1,7 @@
-from time import sleep
-from os import system as runsys, environ
-from sys import exit
+from procquery import getProcessQuery
 
 
-__all__ = ["getIndent", "isProcess", "Version"]
+__all__ = ["getIndent", "isProcess", "waitForProcessExit", "Version"]
 
 
 def getIndent(string: str) -> str:
@@ -20,19 +18,28 @@ def getIndent(string: str) -> str:
 def isProcess(process: str) -> bool:
 	"""Checks if the process name given is running. String must contain the name of the program to find, including extension."""
 
-	tempFile = f"{environ['TEMP']}\\ha"
+	return getProcessQuery().isRunning(process)
 
-	runsys(f'tasklist /FI "IMAGENAME eq {process}" > {tempFile}')
-	with open(tempFile) as f:
-		return process in f.read()
+
+def waitForProcessExit(process: str, timeout: float = None) -> bool:
+	"""
+	Wait until the process name given is not running. Returns `False` if it is still running after `timeout` seconds.
+	If `timeout` is `None`, it waits forever.
+	"""
+
+	return getProcessQuery().waitForExit(process, timeout)
 
 
 class Version:
 	"""Simple object for managing versions a bit easier.
 	>>> Version("1.4.5-2") < Version("1.5-6")
 	>>> True
+
+	Versions are parsed once, into a key tuple which is used for comparing and hashing them.
 	"""
 
+	__slots__ = ("_stripped", "_key")
+
 	def __init__(self, version: str, seps: tuple = (".", "-")) -> None:
 		"""
 		The string format should be something like `1.2.3` or `1.2.3-4`.
@@ -43,71 +50,65 @@ class Version:
 		after the '-' is considered as a subversion value, which is less important.
 		"""
 
-		self._seps = seps
 		self._stripped = self._strip(version)
-		self._splitted = self._split(self._stripped)
+		self._key = self._split(self._stripped, seps)
 
-	def _strip(self, string: str) -> str:
+	@staticmethod
+	def _strip(string: str) -> str:
 		"""Remove any character from string which isn't a number, or any of the separators"""
 
 		endStr = "".join(char for char in string if char.isdigit() or char in ".-")
 
 		return "0" if not endStr or ".." in endStr else endStr
 
-	def _split(self, ver: str) -> list:
-		split = ver.split(self._seps[1])
-		main = [int(hoho) for hoho in split[0].split(self._seps[0])]
+	@staticmethod
+	def _split(ver: str, seps: tuple) -> tuple[tuple[int, ...], int]:
+		main, _, sub = ver.partition(seps[1])
+		values = [int(value) for value in main.split(seps[0]) if value]
 
 		# Remove all the trailing 0's of version, since those have no value.
-		for number, item in reversed(list(enumerate(main))):
-			if item == 0:
-				main.pop(number)
-			else:
-				break
+		while values and values[-1] == 0:
+			values.pop()
 
 		# Ignore empty fields
-		sub = int(split[1]) if len(split) > 1 and split[1] != "" else 0
-		return [main, sub]
-
-	def _compare(self, first: object, second: object):
-		ver1 = first._splitted
-		ver2 = second._splitted
-
-		if ver1[0] == ver2[0]:
-			# Checking the second value
-			return ver1[1] > ver2[1]
-
-		# Checking main
-		ver2Main = ver2[0]
-		for number, item in enumerate(ver1[0]):
-			if len(ver2Main) == number or item > ver2Main[number]:
-				return True
-			elif item < ver2Main[number]:
-				return False
-			elif item == ver2Main[number]:
-				continue
-		return False
+		sub = sub.split(seps[1])[0]
+		return (tuple(values), int(sub) if sub else 0)
+
+	@property
+	def key(self) -> tuple[tuple[int, ...], int]:
+		"""The values of the version, as `((main values...), subversion)`. Versions are sorted by this key."""
+		return self._key
 
 	def __gt__(self, other) -> bool:
-		return self._compare(self, other)
+		if not isinstance(other, Version):
+			return NotImplemented
+		return self._key > other._key
 
 	def __ge__(self, other) -> bool:
-		return self.__gt__(other) or self.__eq__(other)
+		if not isinstance(other, Version):
+			return NotImplemented
+		return self._key >= other._key
 
 	def __lt__(self, other) -> bool:
-		return self._compare(other, self)
+		if not isinstance(other, Version):
+			return NotImplemented
+		return self._key < other._key
 
 	def __le__(self, other) -> bool:
-		return self.__lt__(other) or self.__eq__(other)
+		if not isinstance(other, Version):
+			return NotImplemented
+		return self._key <= other._key
 
 	def __eq__(self, other) -> bool:
-		return self._splitted == other._splitted
+		if not isinstance(other, Version):
+			return NotImplemented
+		return self._key == other._key
 
 	def __repr__(self) -> str:
 		return self._stripped
 
 	def __hash__(self) -> int:
-		return hash(str(self))
+		return hash(self._key)
 
 	def __str__(self) -> str:
 		return self._stripped
@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../benchmarks"))
+
+import pytest
+
+from fakegithub import FakeGitHub
+
+
+@pytest.fixture
+def server():
+	"""A local stand-in for GitHub, see `FakeGitHub`."""
+
+	with FakeGitHub() as server:
+		yield server
@@ -0,0 +1,64 @@
+from srctools.cmdseq import Command
+
+from cmdseqedit import InsertAfterRule, transformCmdSeq
+
+
+POSTCOMPILER = "C:/Steam/steamapps/common/Portal 2/bin/postcompiler/postcompiler.exe"
+
+
+def transform(commands: list[Command]):
+	rule = InsertAfterRule("$bsp_exe", Command(POSTCOMPILER, "--propcombine"), "postcompiler")
+	return transformCmdSeq({"Config": commands}, [rule])[0]
+
+
+def commandLine(result) -> list[tuple[str, str]]:
+	return [(str(cmd.exe).rpartition("/")[2], cmd.args) for cmd in result.commands]
+
+
+def testInsertsAfterTheMarker():
+	result = transform([Command("$bsp_exe", ""), Command("$vis_exe", "")])
+
+	assert commandLine(result) == [("$bsp_exe", ""), ("postcompiler.exe", "--propcombine"), ("$vis_exe", "")]
+	assert result.changed and result.results == ("Inserted",)
+
+
+def testInsertsAfterTheLastCommand():
+	result = transform([Command("$vis_exe", ""), Command("$BSP_EXE", "")])
+	assert commandLine(result)[-1] == ("postcompiler.exe", "--propcombine")
+
+
+def testUpdatesTheArguments():
+	result = transform([Command("$bsp_exe", ""), Command(POSTCOMPILER, "--old")])
+
+	assert commandLine(result) == [("$bsp_exe", ""), ("postcompiler.exe", "--propcombine")]
+	assert result.results == ("Updated",)
+
+
+def testLeavesPlacedCommandsAlone():
+	commands = [Command("$bsp_exe", ""), Command(POSTCOMPILER.upper(), "--PROPCOMBINE"), Command("$vis_exe", "")]
+	result = transform(commands)
+
+	assert result.commands is commands
+	assert not result.changed and result.diff == ""
+	assert result.results == ("Already present",)
+
+
+def testKeepsTheCommandAfterTheMarkerAndRemovesTheOthers():
+	result = transform([Command(POSTCOMPILER, "--old"), Command("$bsp_exe", ""), Command("$vis_exe", "")])
+
+	assert commandLine(result) == [("$bsp_exe", ""), ("postcompiler.exe", "--propcombine"), ("$vis_exe", "")]
+	assert result.changed and result.diff
+	assert result.results == ("Inserted, removed duplicates",)
+
+	result = transform(
+		[Command("$bsp_exe", ""), Command(POSTCOMPILER, "--propcombine"), Command(POSTCOMPILER, "--other")]
+	)
+	assert commandLine(result) == [("$bsp_exe", ""), ("postcompiler.exe", "--propcombine")]
+
+
+def testIgnoresConfigsWithoutTheMarker():
+	commands = [Command(POSTCOMPILER, "--old"), Command("$vis_exe", "")]
+	result = transform(commands)
+
+	assert result.commands is commands and not result.changed
+	assert result.results == ("Marker not found",)
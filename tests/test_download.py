@@ -0,0 +1,94 @@
+import hashlib
+import os
+import tracemalloc
+from http.client import HTTPException
+
+import pytest
+
+from download import downloadFile
+from network import HttpClient
+
+
+def peakDownloadMemory(server, tmp_path, size: int, connections: int) -> int:
+	"""Return the peak memory allocated while downloading a file of `size` bytes."""
+
+	data = os.urandom(size)
+	server.addFile(f"/{size}.zip", data)
+	filePath = str(tmp_path / f"{size}.zip")
+
+	tracemalloc.start()
+	try:
+		written, digest = downloadFile(HttpClient(), f"{server.url}/{size}.zip", filePath, connections, size)
+		peak = tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+	assert (written, digest) == (size, hashlib.sha256(data).hexdigest())
+	return peak
+
+
+@pytest.mark.parametrize("connections", [1, 4])
+def testPeakMemoryDoesNotGrowWithTheFile(server, tmp_path, connections):
+	# The first download also counts the allocations done once, like the imports of the client
+	peakDownloadMemory(server, tmp_path, 1024 * 1024, connections)
+
+	smallPeak = peakDownloadMemory(server, tmp_path, 2 * 1024 * 1024, connections)
+	largePeak = peakDownloadMemory(server, tmp_path, 32 * 1024 * 1024, connections)
+
+	assert largePeak < smallPeak + 1024 * 1024
+	assert largePeak < 2 * 1024 * 1024
+
+
+def interruptDownload(server, filePath: str, size: int) -> bytes:
+	"""Start downloading a new file of `size` bytes in 4 segments, and cut the second one. Returns the data."""
+
+	data = os.urandom(size)
+	server.addFile("/asset.zip", data)
+	server.injectFaults(None, "truncate")
+	with pytest.raises((OSError, HTTPException)):
+		downloadFile(HttpClient(retries=0), f"{server.url}/asset.zip", filePath, 4)
+	assert os.path.exists(filePath + ".part.json")
+	return data
+
+
+def testInterruptedDownloadIsResumed(server, tmp_path):
+	filePath = str(tmp_path / "asset.zip")
+	size = 4 * 1024 * 1024
+	data = interruptDownload(server, filePath, size)
+
+	client = HttpClient()
+	assert downloadFile(client, f"{server.url}/asset.zip", filePath, 4) == (size, hashlib.sha256(data).hexdigest())
+	assert client.bytesReceived < size
+	assert not os.path.exists(filePath + ".part") and not os.path.exists(filePath + ".part.json")
+	with open(filePath, "rb") as file:
+		assert file.read() == data
+
+
+@pytest.mark.parametrize("change", ["etag", "size", "partFile"])
+def testChangedDownloadIsStartedAgain(server, tmp_path, change):
+	filePath = str(tmp_path / "asset.zip")
+	size = 4 * 1024 * 1024
+	data = interruptDownload(server, filePath, size)
+
+	if change == "partFile":
+		with open(filePath + ".part", "r+b") as file:
+			file.truncate(size // 2)
+	else:
+		data = os.urandom(size if change == "etag" else size + 1024)
+		server.addFile("/asset.zip", data)
+
+	client = HttpClient()
+	assert downloadFile(client, f"{server.url}/asset.zip", filePath, 4) == (len(data), hashlib.sha256(data).hexdigest())
+	assert client.bytesReceived >= len(data)
+	with open(filePath, "rb") as file:
+		assert file.read() == data
+
+
+def testDigestMismatchIsRejected(server, tmp_path):
+	filePath = str(tmp_path / "asset.zip")
+	size = 4 * 1024 * 1024
+	server.addFile("/asset.zip", os.urandom(size))
+
+	with pytest.raises(ValueError, match="digest mismatch"):
+		downloadFile(HttpClient(), f"{server.url}/asset.zip", filePath, 4, size, "0" * 64)
+	assert os.listdir(tmp_path) == []
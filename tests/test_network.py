@@ -0,0 +1,170 @@
+import json
+import ssl
+from http.client import IncompleteRead
+from time import perf_counter
+
+import pytest
+
+import network
+from cache import MetadataCache
+from fakegithub import FAULTS
+from network import HttpClient, HttpError, fetchJson, fetchJsonPage, isTransient
+
+
+def addReleases(server, tags: list[str]):
+	for tag in tags:
+		server.addRelease(tag, tag.encode())
+
+
+def testFreshMetadataIsUsedWithoutRequests(server, tmp_path):
+	addReleases(server, ["2.6.0", "2.5.0"])
+	cache = MetadataCache(str(tmp_path), ttl=60)
+
+	data = fetchJson(server.releasesUrl, cache, HttpClient())
+	assert [release["tag_name"] for release in data] == ["2.6.0", "2.5.0"]
+	assert server.requests == 1
+
+	server.resetCounters()
+	assert fetchJson(server.releasesUrl, cache, HttpClient()) == data
+	# The cache is kept on disk, so it is also fresh for the next run
+	assert fetchJson(server.releasesUrl, MetadataCache(str(tmp_path), ttl=60), HttpClient()) == data
+	assert server.requests == 0
+
+
+def testStaleMetadataIsRevalidated(server, tmp_path):
+	addReleases(server, ["2.6.0", "2.5.0"])
+	cache = MetadataCache(str(tmp_path), ttl=0)
+	data = fetchJson(server.releasesUrl, cache, HttpClient())
+	fetched = cache.get(server.releasesUrl)["fetched"]
+
+	server.resetCounters()
+	assert fetchJson(server.releasesUrl, cache, HttpClient()) == data
+	# A 304 without a body
+	assert (server.requests, server.bytesSent) == (1, 0)
+	assert cache.get(server.releasesUrl)["fetched"] >= fetched
+
+
+def testChangedMetadataIsDownloadedAgain(server, tmp_path):
+	addReleases(server, ["2.5.0"])
+	cache = MetadataCache(str(tmp_path), ttl=0)
+	fetchJson(server.releasesUrl, cache, HttpClient())
+
+	addReleases(server, ["2.4.0"])
+	server.resetCounters()
+	data = fetchJson(server.releasesUrl, cache, HttpClient())
+	assert [release["tag_name"] for release in data] == ["2.5.0", "2.4.0"]
+	assert server.requests == 1 and server.bytesSent > 0
+	assert cache.get(server.releasesUrl)["data"] == data
+
+
+def testPagesKeepTheirNextLink(server, tmp_path):
+	server.perPage = 1
+	addReleases(server, ["2.6.0", "2.5.0"])
+	cache = MetadataCache(str(tmp_path), ttl=60)
+
+	first = fetchJsonPage(server.releasesUrl, cache, client=HttpClient())
+	server.resetCounters()
+	assert fetchJsonPage(server.releasesUrl, cache, client=HttpClient()) == first
+	assert first[1] is not None and server.requests == 0
+
+
+def testBrokenBodyIsResumedAfterAFailedResume(server):
+	data = bytes(range(256)) * 4096
+	server.addFile("/asset.zip", data)
+	# The body is cut in half, and the first request for the rest fails too
+	server.injectFaults("truncate", "reset", None)
+
+	with HttpClient(retries=3).open(f"{server.url}/asset.zip") as response:
+		assert response.read() == data
+	assert server.requests == 3
+
+
+@pytest.mark.parametrize(
+	"error, transient",
+	[
+		(ConnectionResetError(), True),
+		(TimeoutError(), True),
+		(IncompleteRead(b""), True),
+		(ssl.SSLEOFError(), True),
+		(HttpError("url", 503), True),
+		(HttpError("url", 404), False),
+		(ssl.SSLCertVerificationError(), False),
+		(ssl.SSLError(), False),
+		(FileNotFoundError(), False),
+		(PermissionError(), False),
+		(IsADirectoryError(), False),
+	],
+	ids=lambda value: type(value).__name__ if isinstance(value, Exception) else None,
+)
+def testTransientErrors(error, transient):
+	assert isTransient(error) == transient
+
+
+@pytest.mark.parametrize("fault", FAULTS)
+def testEveryFaultIsRetried(server, fault):
+	data = bytes(range(256)) * 1024
+	server.addRelease("2.6.0", data)
+	server.stallSeconds = 2
+	server.injectFaults(fault)
+	client = HttpClient(readTimeout=0.3, backoff=0.01)
+
+	with client.open(f"{server.url}/assets/2.6.0.zip") as response:
+		assert response.read() == data
+	assert server.requests == 2
+	assert [record.attempts for record in client.records] == [2]
+
+
+def testStalledResponseTimesOut(server):
+	server.addFile("/asset.zip", b"data")
+	server.stallSeconds = 5
+	server.injectFaults("stall")
+
+	start = perf_counter()
+	with HttpClient(readTimeout=0.3, backoff=0.01).open(f"{server.url}/asset.zip") as response:
+		assert response.read() == b"data"
+	# The stalled request is given up after the read timeout, instead of waiting for the reply
+	assert perf_counter() - start < 2
+
+
+def testRetriesGiveUpAtTheLimit(server):
+	server.addFile("/asset.zip", b"data")
+	server.injectFaults("503", "503", "503")
+
+	with pytest.raises(HttpError) as error:
+		HttpClient(retries=2, backoff=0.01).open(f"{server.url}/asset.zip")
+	assert error.value.status == 503
+	assert server.requests == 3
+
+
+@pytest.mark.parametrize("retryAfter, delay", [("3", 3.0), ("3600", 60.0), ("soon", 0.1)])
+def testRetryAfterIsHonoured(monkeypatch, retryAfter, delay):
+	delays = []
+	monkeypatch.setattr(network, "sleep", delays.append)
+
+	HttpClient(backoff=0.1).waitBeforeRetry(0, retryAfter)
+	# Without a usable header, the backoff is used, with some jitter
+	assert delay / 2 <= delays[0] <= delay
+
+
+def testGzipBodiesAreDecoded(server):
+	for number in range(50, 0, -1):
+		server.addRelease(f"2.{number}.0", b"")
+	client = HttpClient()
+
+	result = client.get(f"{server.releasesUrl}?per_page=50")
+	assert result.headers["Content-Encoding"] == "gzip"
+	assert len(json.loads(result.body)) == 50
+	# The body is counted as received, before decompressing
+	assert client.bytesReceived == int(result.headers["Content-Length"]) < len(result.body)
+
+
+def testConnectionsAreReused(server):
+	addReleases(server, ["2.6.0", "2.5.0", "2.4.0"])
+	server.perPage = 1
+	client = HttpClient()
+
+	for page in range(1, 4):
+		client.get(f"{server.releasesUrl}?page={page}")
+	assert (server.requests, server.connections, client.connections) == (3, 1, 1)
+	assert [record.reused for record in client.records] == [False, True, True]
+	assert client.summary().startswith("3 request/s over 1 connection/s (2 reused), 0 retries,")
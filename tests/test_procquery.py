@@ -0,0 +1,144 @@
+import os
+import subprocess
+import sys
+import threading
+from time import monotonic, sleep
+from types import SimpleNamespace
+
+import pytest
+
+from procquery import ProcfsProcessQuery, WindowsProcessQuery
+
+
+@pytest.fixture
+def dummy(tmp_path):
+	"""A running process with a name no other process has. Returns the `Popen` and the name."""
+
+	name = f"hainstaller-dummy-{os.getpid()}"
+	executable = tmp_path / name
+	executable.symlink_to(sys.executable)
+	process = subprocess.Popen([str(executable), "-c", "import time; time.sleep(60)"])
+	yield process, name
+	process.kill()
+	process.wait()
+
+
+def killLater(process: subprocess.Popen, seconds: float):
+	timer = threading.Timer(seconds, process.kill)
+	timer.start()
+	return timer
+
+
+@pytest.fixture(params=["pidfd", "polling"])
+def procfs(request, monkeypatch):
+	if not os.path.isdir("/proc/self"):
+		pytest.skip("there is no /proc")
+	if request.param == "polling":
+		monkeypatch.delattr(os, "pidfd_open", raising=False)
+	elif not hasattr(os, "pidfd_open"):
+		pytest.skip("pidfds aren't supported")
+	return ProcfsProcessQuery()
+
+
+def testProcfsFindsTheProcess(procfs, dummy):
+	process, name = dummy
+
+	assert (process.pid, name) in procfs.listProcesses()
+	assert procfs.findProcesses(name) == [process.pid]
+	assert procfs.isRunning(name)
+	assert not procfs.isRunning(name + "-other")
+
+
+def testProcfsWaitTimesOut(procfs, dummy):
+	start = monotonic()
+	assert not procfs.waitForExit(dummy[1], 0.3)
+	assert 0.3 <= monotonic() - start < 2
+
+
+def testProcfsWaitReturnsWhenTheProcessExits(procfs, dummy):
+	process, name = dummy
+	timer = killLater(process, 0.3)
+
+	start = monotonic()
+	assert procfs.waitForExit(name, 10)
+	assert monotonic() - start < 5
+	# The process isn't reaped yet, and zombies count as exited
+	assert not procfs.isRunning(name)
+	timer.join()
+
+
+class FakeKernel32:
+	"""The functions of `kernel32` used to wait for processes, failing like `OpenProcess` and `WaitForMultipleObjects` can."""
+
+	def __init__(self, canOpen: bool, running: int, waitFails: bool = True) -> None:
+		self.canOpen = canOpen
+		self.running = running
+		self.waitFails = waitFails
+		self.calls = 0
+		self.timeouts: list[int] = []
+
+	def OpenProcess(self, access, inherit, pid):
+		self.calls += 1
+		if self.calls > 1000:
+			raise AssertionError("the process is checked without waiting")
+		return 1 if self.canOpen else 0
+
+	def WaitForSingleObject(self, handle, timeout):
+		self.running -= 1
+		return WindowsProcessQuery._WAIT_TIMEOUT if self.running >= 0 else 0
+
+	def WaitForMultipleObjects(self, count, handles, waitAll, timeout):
+		if self.waitFails:
+			return WindowsProcessQuery._WAIT_FAILED
+
+		self.timeouts.append(timeout)
+		self.running -= 1
+		if self.running < 0:
+			return 0
+		sleep(timeout / 1000)
+		return WindowsProcessQuery._WAIT_TIMEOUT
+
+	def CloseHandle(self, handle):
+		pass
+
+
+def fakeWindowsQuery(kernel32: FakeKernel32) -> WindowsProcessQuery:
+	query = WindowsProcessQuery.__new__(WindowsProcessQuery)
+	query._kernel32 = kernel32
+	# OpenProcess fails with access denied
+	query._ctypes = SimpleNamespace(get_last_error=lambda: WindowsProcessQuery._ERROR_ACCESS_DENIED)
+	query.listProcesses = lambda: [(1234, "hammer.exe")]
+	return query
+
+
+@pytest.mark.parametrize("canOpen", [False, True], ids=["access-denied", "wait-failed"])
+def testWindowsWaitFallsBackToPolling(canOpen):
+	query = fakeWindowsQuery(FakeKernel32(canOpen, running=1000))
+
+	start = monotonic()
+	assert not query.waitForExit("hammer.exe", 0.3)
+	assert 0.3 <= monotonic() - start < 2
+
+
+def testWindowsPollingSeesTheExit():
+	query = fakeWindowsQuery(FakeKernel32(True, running=2))
+	assert query._waitPids([1234], 10)
+
+
+def testWindowsWaitsInSlices():
+	kernel32 = FakeKernel32(True, running=3, waitFails=False)
+	query = fakeWindowsQuery(kernel32)
+
+	assert query._waitPids([1234], None)
+	assert kernel32.timeouts == [250] * 4
+
+
+def testWindowsSlicedWaitTimesOut():
+	kernel32 = FakeKernel32(True, running=1000, waitFails=False)
+	query = fakeWindowsQuery(kernel32)
+
+	start = monotonic()
+	assert not query._waitPids([1234], 0.6)
+	assert 0.55 <= monotonic() - start < 2
+	assert kernel32.timeouts[:2] == [250, 250]
+	assert max(kernel32.timeouts) == 250 and sum(kernel32.timeouts) <= 600
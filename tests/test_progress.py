@@ -0,0 +1,48 @@
+import json
+from io import StringIO
+
+import pytest
+
+from output import JsonRenderer
+from progress import Progress, RateMeter
+
+
+def testRateOfASteadyCounter():
+	meter = RateMeter()
+	meter.update(0, 10.0)
+	assert meter.rate is None and meter.eta(100) is None
+
+	for second in range(1, 6):
+		meter.update(100 * second, 10.0 + second)
+	assert meter.rate == pytest.approx(100)
+	assert meter.eta(250) == pytest.approx(2.5)
+	assert meter.eta(0) == 0.0
+
+
+def testRateFollowsChangesWithTheHalfLife():
+	meter = RateMeter(halfLife=2.0)
+	for second in range(0, 21):
+		meter.update(100 * second, second)
+
+	# After one half-life at the new rate, the old one counts half
+	meter.update(2000 + 300 * 2, 22)
+	assert meter.rate == pytest.approx(200, rel=0.01)
+
+	# Samples without any time elapsed are ignored
+	meter.update(10**6, 22)
+	assert meter.rate == pytest.approx(200, rel=0.01)
+
+
+def testProgressEventsHaveThePhaseOfTheTask():
+	stream = StringIO()
+	renderer = JsonRenderer(stream)
+	progress = Progress(lambda task: renderer.progress(task, progress.fraction))
+
+	# The release is downloaded in the background while the games are still being selected
+	renderer.phase = "select"
+	progress.task("download").start(1000)
+	renderer.message("Select the games")
+
+	events = [json.loads(line) for line in stream.getvalue().splitlines()]
+	assert [(event["event"], event["phase"]) for event in events] == [("progress", "download"), ("message", "select")]
+	assert events[0]["task"] == "download" and events[0]["total"] == 1000
@@ -0,0 +1,111 @@
+import sys
+from io import BytesIO
+from os import path
+
+import pytest
+
+import shims
+
+shims.installWinreg("")
+
+import HAInstaller
+from cache import ReleaseCache
+from network import HttpClient
+from progress import Progress
+from releases import ReleaseSource, iterReleasePages
+from remotezip import RemoteFile
+from utils import Version
+
+
+# Newest first, like the API lists them
+TAGS = ["2.7.0", "2.6.1", "2.6.0", "2.5.0", "2.4.2", "2.4.0", "2.3.0"]
+
+
+@pytest.fixture
+def source(server, tmp_path, monkeypatch):
+	"""A source with two releases per page, set up for `getZipUrl()`."""
+
+	server.perPage = 2
+	for tag in TAGS:
+		server.addRelease(tag, tag.encode())
+
+	monkeypatch.setattr(sys, "argv", ["HAInstaller", "--cacheDir", str(tmp_path)])
+	HAInstaller.parseArgs()
+	monkeypatch.setattr(HAInstaller, "releaseCache", ReleaseCache(str(tmp_path)), raising=False)
+
+	server.resetCounters()
+	return ReleaseSource("fake", server.releasesUrl, f"{server.url}/srctools.vdf", client=HttpClient())
+
+
+def testPagesAreFollowed(server, source):
+	pages = list(iterReleasePages(server.releasesUrl, client=HttpClient()))
+
+	assert [[str(release.tag) for release in page] for page in pages] == [TAGS[0:2], TAGS[2:4], TAGS[4:6], TAGS[6:]]
+	release = pages[0][0]
+	assert (release.url, release.size) == (f"{server.url}/assets/2.7.0.zip", 5)
+	assert release.digest.startswith("sha256:")
+
+
+@pytest.mark.parametrize(
+	"spec, tag, requests",
+	[
+		("latest", "2.7.0", 1),
+		("2.6.0", "2.6.0", 2),
+		("<2.5", "2.4.2", 3),
+		("2.3.0", "2.3.0", 4),
+	],
+)
+def testLookupStopsAtTheFirstMatch(server, source, spec, tag, requests):
+	found = HAInstaller.getZipUrl(spec, source)
+
+	assert found[0] == Version(tag)
+	assert found[1] == f"{server.url}/assets/{tag}.zip"
+	assert server.requests == requests
+
+
+def testMissingVersionReadsAllPages(server, source):
+	with pytest.raises(HAInstaller.InstallError, match="available versions: '2.7.0'"):
+		HAInstaller.getZipUrl("3.0", source)
+	assert server.requests == 4
+
+
+class BrokenBody(BytesIO):
+	def read(self, *args):
+		raise ConnectionResetError("Connection reset by peer")
+
+
+def testInterruptedVdfDownloadIsNotCached(server, source, monkeypatch):
+	server.addFile("/srctools.vdf", b'"Srctools" {}')
+	monkeypatch.setattr(HAInstaller, "sources", [source], raising=False)
+	vdfPath = HAInstaller.releaseCache.vdfPath
+
+	with monkeypatch.context() as patch:
+		patch.setattr(source, "open", lambda url: BrokenBody())
+		with pytest.raises(ConnectionResetError):
+			HAInstaller.fetchVdf()
+	assert not path.exists(vdfPath)
+	assert not path.exists(vdfPath + ".part")
+
+	HAInstaller.fetchVdf()
+	with open(vdfPath, "rb") as file:
+		assert file.read() == b'"Srctools" {}'
+
+
+@pytest.mark.parametrize("ranges", [True, False], ids=["ranges", "no-ranges"])
+def testSparseReleaseFallsBackToAFullDownload(server, source, tmp_path, monkeypatch, ranges):
+	server.ranges = ranges
+	server.addFile("/srctools.vdf", b'"Srctools" {}')
+	monkeypatch.setattr(sys, "argv", ["HAInstaller", "--cacheDir", str(tmp_path), "--sparse"])
+	HAInstaller.parseArgs()
+	monkeypatch.setattr(HAInstaller, "sources", [source], raising=False)
+	monkeypatch.setattr(HAInstaller, "progress", Progress(), raising=False)
+
+	version, zipPath, downloaded = HAInstaller.fetchRelease()
+	assert (version, downloaded) == (Version("2.7.0"), True)
+	if ranges:
+		assert isinstance(zipPath, RemoteFile)
+		assert zipPath.read() == b"2.7.0"
+	else:
+		# The server ignored the range, so the whole release was downloaded into the cache
+		with open(zipPath, "rb") as file:
+			assert file.read() == b"2.7.0"
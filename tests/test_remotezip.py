@@ -0,0 +1,84 @@
+import os
+from io import BytesIO
+from zipfile import ZipFile
+
+import pytest
+
+from fakegithub import makeAddonsZip
+from network import HttpClient
+from remotezip import _READ_AHEAD, TAIL_SIZE, RangesNotSupported, RemoteFile, mergeRanges
+
+
+@pytest.mark.parametrize(
+	"ranges, merged",
+	[
+		([], []),
+		([(200, 300), (0, 100)], [(0, 100), (200, 300)]),
+		([(0, 100), (120, 200)], [(0, 200)]),
+		([(0, 100), (150, 200)], [(0, 100), (150, 200)]),
+		([(0, 500), (100, 200), (480, 520)], [(0, 520)]),
+		([(300, 400), (0, 100), (110, 290)], [(0, 400)]),
+	],
+)
+def testMergeRanges(ranges, merged):
+	assert mergeRanges(ranges, 50) == merged
+
+
+@pytest.fixture
+def remoteData(server) -> bytes:
+	data = os.urandom(512 * 1024)
+	server.addFile("/asset.zip", data)
+	server.resetCounters()
+	return data
+
+
+@pytest.mark.parametrize("knownSize", [True, False])
+def testOnlyTheTailIsFetchedWhenOpened(server, remoteData, knownSize):
+	remote = RemoteFile(HttpClient(), f"{server.url}/asset.zip", len(remoteData) if knownSize else None)
+
+	assert remote.size == len(remoteData)
+	assert (remote.requests, remote.bytesFetched) == (1, TAIL_SIZE)
+	remote.seek(-100, os.SEEK_END)
+	assert remote.read() == remoteData[-100:]
+	assert remote.requests == 1
+
+
+def testReadsAcrossFetchedParts(server, remoteData):
+	remote = RemoteFile(HttpClient(), f"{server.url}/asset.zip", len(remoteData))
+	tailStart = len(remoteData) - TAIL_SIZE
+
+	# A small read fetches a bit more after it
+	remote.seek(1000)
+	assert remote.read(10) == remoteData[1000:1010]
+	assert (remote.requests, remote.bytesFetched) == (2, TAIL_SIZE + _READ_AHEAD)
+
+	# From before the first part, through it and the gap after it, into the tail
+	remote.seek(0)
+	assert remote.read(tailStart + 100) == remoteData[: tailStart + 100]
+	assert remote.requests == 4
+	assert remote.bytesFetched == len(remoteData)
+	assert server.requests == 4
+
+
+def testMembersAreReadAfterPrefetching(server):
+	data = makeAddonsZip(["portal2", "tf"], ["portal2", "tf"])
+	server.addFile("/asset.zip", data)
+	remote = RemoteFile(HttpClient(), f"{server.url}/asset.zip", len(data))
+
+	with ZipFile(remote) as remoteZip, ZipFile(BytesIO(data)) as localZip:
+		members = [info for info in remoteZip.infolist() if "/portal2/" in info.filename]
+		remote.prefetchMembers(remoteZip, members)
+		requests = remote.requests
+
+		for info in members:
+			assert remoteZip.read(info) == localZip.read(info.filename)
+		assert remote.requests == requests
+		assert remote.bytesFetched < len(data)
+
+
+def testRangesNotSupported(server):
+	server.ranges = False
+	server.addFile("/asset.zip", os.urandom(256 * 1024))
+
+	with pytest.raises(RangesNotSupported):
+		RemoteFile(HttpClient(), f"{server.url}/asset.zip", 256 * 1024)